@@ -1,5 +1,33 @@
+import asyncio
+import re
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from functools import wraps
+
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from starlette.background import BackgroundTask
+from psycopg2.errors import QueryCanceled
+from psycopg2.pool import PoolError
 from pydantic import BaseModel as PydanticModel
 
+from src.galaxy.app import (
+    QueryBudgetExceeded,
+    RequestQueries,
+    request_queries,
+    run_in_db_executor,
+)
+from src.galaxy.validation.models import InvalidPageToken
+from src.galaxy.metrics import REQUEST_DURATION, REQUESTS_IN_PROGRESS, RESPONSE_BYTES
+from src.galaxy.config import (
+    get_query_budget,
+    get_statement_timeout,
+    use_fast_json_responses,
+)
+
 
 def to_camel(string: str) -> str:
     """formats underscore seperated words with camel case
@@ -16,3 +44,215 @@ class BaseModel(PydanticModel):
     class Config:
         alias_generator = to_camel
         allow_population_by_field_name = True
+
+
+def run_on_db_executor(db_identifier: str):
+    """Turns a blocking route handler into a coroutine that runs on the executor of a database section
+
+    Handlers that need psycopg2 features missing from asynchronous connections
+    ( pandas, server side cursors ) are then limited by the size of that
+    database's connection pool instead of the default threadpool.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with database_errors():
+                return await run_in_db_executor(db_identifier, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def database_errors():
+    """Turns queries cancelled by the statement timeout of their endpoint into
+    504 responses, exhausted connection pools into 503 ones and queries over
+    the budget of their endpoint or page tokens of another report into 422
+    ones"""
+    try:
+        yield
+    except (QueryBudgetExceeded, InvalidPageToken) as err:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err)
+        ) from err
+    except QueryCanceled as err:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="The report took too long to compute, narrow down the request",
+        ) from err
+    except PoolError as err:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No database connection available, try again later",
+        ) from err
+
+
+def endpoint_name(path):
+    """Returns the name of the endpoint of a request path in the
+    [STATEMENT_TIMEOUT] config section, /v1/data-quality/hashtag-reports/
+    becomes data_quality_hashtag_reports"""
+    parts = [part for part in path.split("/") if part]
+    if parts and re.fullmatch(r"v\d+|latest", parts[0]):
+        parts = parts[1:]
+    return "_".join(parts).replace("-", "_")
+
+
+# characters of a request body kept along with the queries of the request
+REQUEST_BODY_LOG_SIZE = 65536
+
+
+class CancelQueriesOnDisconnect:
+    """ASGI middleware that applies the statement timeout and query budget of the
+    endpoint to the queries of a request and cancels them if the client
+    disconnects before its response is complete"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Serves the request with the query limits of its endpoint"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = endpoint_name(scope["path"])
+        request = {"method": scope["method"], "path": scope["path"], "body": ""}
+        queries = RequestQueries(
+            get_statement_timeout(endpoint), get_query_budget(endpoint), request
+        )
+        messages = asyncio.Queue()
+        response_complete = False
+
+        async def watch_disconnect():
+            # the request body is read here and handed over to the app
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if (
+                    message["type"] == "http.request"
+                    and len(request["body"]) < REQUEST_BODY_LOG_SIZE
+                ):
+                    # kept for the slow query log
+                    body = message.get("body", b"").decode(errors="replace")
+                    request["body"] += body[:REQUEST_BODY_LOG_SIZE]
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        queries.cancel()
+                    return
+
+        async def receive_message():
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                # every later receive gets the disconnect as well
+                messages.put_nowait(message)
+            return message
+
+        async def send_message(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_complete = True
+            await send(message)
+
+        token = request_queries.set(queries)
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await self.app(scope, receive_message, send_message)
+        finally:
+            watcher.cancel()
+            queries.release()
+            request_queries.reset(token)
+
+
+class RequestMetrics:
+    """ASGI middleware recording the duration, status and response size of the
+    requests, labelled with the name of their endpoint function"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Serves the request and records its metrics"""
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        response_bytes = 0
+
+        async def send_message(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        start_time = time.monotonic()
+        in_progress = REQUESTS_IN_PROGRESS.labels(scope["method"])
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_message)
+        finally:
+            in_progress.dec()
+            # the router records the endpoint in the scope, unknown paths have none
+            endpoint = getattr(scope.get("endpoint"), "__name__", "not_found")
+            REQUEST_DURATION.labels(endpoint, scope["method"], status_code).observe(
+                time.monotonic() - start_time
+            )
+            RESPONSE_BYTES.labels(endpoint).inc(response_bytes)
+
+
+def orjson_default(value):
+    """Encodes the values orjson does not support the way FastAPI does"""
+    if isinstance(value, PydanticModel):
+        return value.dict(by_alias=True)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_response(content):
+    """Encodes content with orjson when use_fast_json_responses is set
+
+    The response then skips the validation against the response_model of the
+    endpoint, content has to be made of the models the endpoint declares.
+    Otherwise content is returned as it is for FastAPI to validate and encode.
+    """
+    if not use_fast_json_responses:
+        return content
+    return Response(
+        orjson.dumps(content, default=orjson_default), media_type="application/json"
+    )
+
+
+NEXT_PAGE_TOKEN_HEADER = "X-Next-Page-Token"
+
+
+def release_report(report, stream):
+    """Returns the background task of a streamed response that gives the
+    connection of report back once the response is over, whether stream was
+    consumed, left half way by a client that disconnected or never started"""
+
+    def release():
+        try:
+            stream.close()
+        except ValueError:
+            # the stream is reading a chunk on a worker thread, it releases
+            # the connection itself once it is dropped
+            return
+        report.close()
+
+    return BackgroundTask(release)
+
+
+def with_next_page_token(response, next_page_token):
+    """Sets the token of the next page of a paginated report on response"""
+    if next_page_token is not None:
+        response.headers[NEXT_PAGE_TOKEN_HEADER] = next_page_token
+    return response
@@ -1,4 +1,5 @@
 import base64
+from contextlib import closing
 from fastapi import Request, APIRouter, Depends
 
 from itsdangerous.url_safe import URLSafeSerializer
@@ -76,7 +77,8 @@ def callback(request: Request):
     serializer = URLSafeSerializer(config.get("OAUTH", "secret_key"))
 
     user_id = data.get("id")
-    user_role = Underpass().get_user_role(user_id)
+    with closing(Underpass()) as underpass:
+        user_role = underpass.get_user_role(user_id)
 
     user_data = {
         "id": user_id,
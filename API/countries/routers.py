@@ -1,8 +1,7 @@
-import psycopg2
-from psycopg2.extras import DictCursor
 from fastapi import APIRouter
 from fastapi_versioning import version
 from geojson_pydantic import FeatureCollection
+from src.galaxy.app import Database, get_connection_pool
 from src.galaxy.config import get_db_connection_params
 
 router = APIRouter(prefix="/countries")
@@ -12,10 +11,11 @@ router = APIRouter(prefix="/countries")
 @version(1)
 def get_countries():
     """Generates geojson boundaries of countries covered by Galaxy"""
-    db_params = get_db_connection_params('UNDERPASS')
-    with psycopg2.connect(**db_params) as conn:
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute(
+    database = Database(get_db_connection_params('UNDERPASS'),
+                        get_connection_pool('UNDERPASS'))
+    database.connect()
+    try:
+        result = database.executequery(
                 """
                 with t1 as (
                     SELECT
@@ -35,7 +35,8 @@ def get_countries():
                     json_agg(ST_ASGEOJSON(t2.*)::json))
                 FROM t2
                 """
-            )
-            result = cur.fetchall()[0][0]
+        )[0][0]
+    finally:
+        database.close_conn()
 
     return FeatureCollection(**result)
@@ -17,41 +17,52 @@
 # 1100 13th Street NW Suite 800 Washington, D.C. 20005
 # <info@hotosm.org>
 
+from contextlib import closing
 from fastapi import APIRouter
 from fastapi_versioning import version
 from src.galaxy.validation.models import DataQuality_TM_RequestParams, DataQuality_username_RequestParams, DataQualityHashtagParams, OutputType
-from src.galaxy.app import DataQuality, DataQualityHashtags
+from src.galaxy.app import DataQuality, DataQualityHashtags, prefetch_stream
 from fastapi.responses import StreamingResponse
-import io
 from datetime import datetime
+from . import release_report, run_on_db_executor, with_next_page_token
 
 router = APIRouter(prefix="/data-quality")
 
 
 @router.post("/hashtag-reports/")
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_hashtag_data_quality_report(params: DataQualityHashtagParams):
     data_quality = DataQualityHashtags(params)
-
-    results = data_quality.get_report()
+    next_page_token = data_quality.fetch_page()
 
     if params.output_type == OutputType.GEOJSON.value:
-        return results
-
-    # Set Response as streaming for CSV files.
-    csv_stream = DataQualityHashtags.to_csv_stream(results)
-
-    response = StreamingResponse(csv_stream)
+        # features are sent as they come from database.
+        geojson_stream = data_quality.get_report_as_geojson_stream()
+        return with_next_page_token(
+            StreamingResponse(prefetch_stream(geojson_stream),
+                              media_type="application/json",
+                              background=release_report(data_quality, geojson_stream)),
+            next_page_token)
+
+    # Set Response as streaming for CSV files, rows are sent as they come from database.
+    # the first chunk is read beforehand, a query cancelled by its statement
+    # timeout then gets a 504 response
+    csv_stream = data_quality.get_report_as_csv_stream()
+
+    response = StreamingResponse(prefetch_stream(csv_stream),
+                                 background=release_report(data_quality, csv_stream))
     exportname = f"DataQuality_Hashtags_{datetime.now().isoformat()}"
     response.headers["Content-Disposition"] = f"attachment; filename={exportname}.csv"
 
-    return response
+    return with_next_page_token(response, next_page_token)
 
 @router.post("/hashtag-reports-summary/")
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_hashtag_data_quality_report_summary(params: DataQualityHashtagParams):
-    data_quality = DataQualityHashtags(params)
-    csv_stream = data_quality.get_report_summary()
+    with closing(DataQualityHashtags(params)) as data_quality:
+        csv_stream = data_quality.get_report_summary()
     response = StreamingResponse(csv_stream)
     exportname = f"DataQuality_Hashtags_{datetime.now().isoformat()}"
     response.headers["Content-Disposition"] = f"attachment; filename={exportname}.csv"
@@ -59,25 +70,33 @@ def get_hashtag_data_quality_report_summary(params: DataQualityHashtagParams):
 
 @router.post("/project-reports/")
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_tasking_manager_project_data_quality_report(params: DataQuality_TM_RequestParams):
     data_quality = DataQuality(params, "TM")
+    next_page_token = data_quality.fetch_page()
 
     if params.output_type == OutputType.GEOJSON.value:
-        return data_quality.get_report()
+        geojson_stream = data_quality.get_report_as_geojson_stream()
+        return with_next_page_token(
+            StreamingResponse(prefetch_stream(geojson_stream),
+                              media_type="application/json",
+                              background=release_report(data_quality, geojson_stream)),
+            next_page_token)
 
-    stream = io.StringIO()
     exportname = f"TM_DataQuality_{datetime.now().isoformat()}"
-    data_quality.get_report_as_csv(stream)
-    response = StreamingResponse(iter([stream.getvalue()]),
-                                 media_type="text/csv"
+    csv_stream = data_quality.get_report_as_csv_stream()
+    response = StreamingResponse(prefetch_stream(csv_stream),
+                                 media_type="text/csv",
+                                 background=release_report(data_quality, csv_stream)
                                  )
     response.headers["Content-Disposition"] = "attachment; filename=" + \
         exportname + ".csv"
-    return response
+    return with_next_page_token(response, next_page_token)
 
 
 @router.post("/user-reports/")
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_user_data_quality_report(params: DataQuality_username_RequestParams):
     """Returns data quality report for a OpenStreetMap user in a given time period.
 
@@ -113,15 +132,21 @@ def get_user_data_quality_report(params: DataQuality_username_RequestParams):
     {"fromTimestamp":"2022-07-22T13:15:00.461Z","toTimestamp":"2022-07-22T14:15:00.461Z","osmUsernames":["Kshitizraj Sharma"],"issueTypes":["all"],"outputType":"geojson","hashtags":[]}
     """
     data_quality = DataQuality(params, "username")
+    next_page_token = data_quality.fetch_page()
 
     if params.output_type == OutputType.GEOJSON.value:
-        return data_quality.get_report()
-    stream = io.StringIO()
+        geojson_stream = data_quality.get_report_as_geojson_stream()
+        return with_next_page_token(
+            StreamingResponse(prefetch_stream(geojson_stream),
+                              media_type="application/json",
+                              background=release_report(data_quality, geojson_stream)),
+            next_page_token)
     exportname = f"Username_DataQuality_{datetime.now().isoformat()}"
-    data_quality.get_report_as_csv(stream)
-    response = StreamingResponse(iter([stream.getvalue()]),
-                                 media_type="text/csv"
+    csv_stream = data_quality.get_report_as_csv_stream()
+    response = StreamingResponse(prefetch_stream(csv_stream),
+                                 media_type="text/csv",
+                                 background=release_report(data_quality, csv_stream)
                                  )
     response.headers["Content-Disposition"] = "attachment; filename=" + \
         exportname + ".csv"
-    return response
+    return with_next_page_token(response, next_page_token)
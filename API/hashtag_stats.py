@@ -19,20 +19,22 @@
 
 """[Router Responsible for Organizational data API ]
 """
+from contextlib import closing
 from fastapi import APIRouter
 from fastapi_versioning import version
-from src.galaxy.app import OrganizationHashtags
+from src.galaxy.app import OrganizationHashtags, prefetch_stream
 from src.galaxy.validation.models import OrganizationHashtag, OrganizationOutputtype, OrganizationHashtagParams
 from typing import List
 from fastapi.responses import StreamingResponse
-import io
 from datetime import datetime
+from . import json_response, release_report, run_on_db_executor
 
 router = APIRouter(prefix="/hashtags")
 
 
 @router.post("/statistics/", response_model=List[OrganizationHashtag])
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_hashtag_stats(params: OrganizationHashtagParams):
     """Monitors specific OpenStreetMap hashtag statistics for
     weekly/quarterly/monthly frequency.
@@ -183,12 +185,13 @@ def get_hashtag_stats(params: OrganizationHashtagParams):
     """
     organization = OrganizationHashtags(params)
     if params.output_type == OrganizationOutputtype.JSON.value:
-        return organization.get_report()
-    stream = io.StringIO()
+        with closing(organization):
+            return json_response(organization.get_report())
     exportname = f"Hashtags_Organization_{datetime.now().isoformat()}"
-    organization.get_report_as_csv(stream)
-    response = StreamingResponse(iter([stream.getvalue()]),
-                                 media_type="text/csv"
+    csv_stream = organization.get_report_as_csv_stream()
+    response = StreamingResponse(prefetch_stream(csv_stream),
+                                 media_type="text/csv",
+                                 background=release_report(organization, csv_stream)
                                  )
     response.headers["Content-Disposition"] = "attachment; filename=" + \
         exportname + ".csv"
@@ -21,11 +21,16 @@ import time
 
 import sentry_sdk
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_versioning import VersionedFastAPI
 
-from src.galaxy.config import config
+from src.galaxy.app import close_connection_pools, response_cache
+from src.galaxy.jobs import close_report_jobs
+from src.galaxy.metrics import latest_metrics
+from src.galaxy.warmer import CacheWarmer, load_hot_reports
+from src.galaxy.config import cache_warmer_file, config
+from . import NEXT_PAGE_TOKEN_HEADER, CancelQueriesOnDisconnect, RequestMetrics
 
 # from .changesets.routers import router as changesets_router
 # from .data.routers import router as data_router
@@ -37,6 +42,7 @@ from .data_quality import router as data_quality_router
 from .hashtag_stats import router as hashtag_router
 from .mapathon import router as mapathon_router
 from .osm_users import router as osm_users_router
+from .report_jobs import router as report_jobs_router
 
 # from .test_router import router as test_router
 from .status import router as status_router
@@ -73,6 +79,7 @@ app.include_router(data_quality_router)
 app.include_router(hashtag_router)
 app.include_router(tm_router)
 app.include_router(status_router)
+app.include_router(report_jobs_router)
 
 app = VersionedFastAPI(
     app, enable_latest=True, version_format="{major}", prefix_format="/v{major}"
@@ -82,6 +89,35 @@ app = VersionedFastAPI(
 origins = ["*"]
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of the requests and queries, see src/galaxy/metrics.py"""
+    body, media_type = latest_metrics()
+    return Response(body, media_type=media_type)
+
+
+cache_warmer = None
+
+
+@app.on_event("startup")
+def start_cache_warmer():
+    """Keeps the reports of cache_warmer_file in the response cache"""
+    global cache_warmer
+    if cache_warmer_file and response_cache.maxsize > 0:
+        cache_warmer = CacheWarmer(load_hot_reports(cache_warmer_file))
+        cache_warmer.start()
+
+
+@app.on_event("shutdown")
+def shutdown_connection_pools():
+    """Stops the cache warmer and the report jobs and closes pooled database
+    connections when the API shuts down"""
+    if cache_warmer is not None:
+        cache_warmer.stop()
+    close_report_jobs()
+    close_connection_pools()
+
+
 @app.middleware("http")
 async def add_process_time_header(request, call_next):
     """Times request and knows response time and pass it to header in every request
@@ -106,5 +142,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_PAGE_TOKEN_HEADER],
 )
+app.add_middleware(CancelQueriesOnDisconnect)
+app.add_middleware(RequestMetrics)
 
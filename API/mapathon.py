@@ -19,12 +19,13 @@
 
 from fastapi import APIRouter, Depends
 from fastapi_versioning import version
-from src.galaxy.app import Mapathon
+from src.galaxy.app import AsyncMapathon
 from src.galaxy.validation.models import (
     MapathonSummary,
     MapathonRequestParams,
     MapathonDetail,
 )
+from . import database_errors, json_response
 from .auth import login_required
 
 router = APIRouter(prefix="/mapathon")
@@ -32,8 +33,8 @@ router = APIRouter(prefix="/mapathon")
 
 @router.post("/detail/", response_model=MapathonDetail)
 @version(1)
-def get_mapathon_detailed_report(params: MapathonRequestParams,
-                                 user_data=Depends(login_required)):
+async def get_mapathon_detailed_report(params: MapathonRequestParams,
+                                       user_data=Depends(login_required)):
     """End point to return detailed Mapathon statistics with a list of
     users and their contribution.
 
@@ -254,13 +255,14 @@ def get_mapathon_detailed_report(params: MapathonRequestParams,
         ]
         }
     """
-    mapathon = Mapathon(params)
-    return mapathon.get_detailed_report()
+    mapathon = AsyncMapathon(params)
+    with database_errors():
+        return json_response(await mapathon.get_detailed_report())
 
 
 @router.post("/summary/", response_model=MapathonSummary)
 @version(1)
-def get_mapathon_summary(params: MapathonRequestParams):
+async def get_mapathon_summary(params: MapathonRequestParams):
     """Returns summary of Mapathon , It doesn't require authorization
     Args:
         params (MapathonRequestParams):
@@ -353,5 +355,6 @@ def get_mapathon_summary(params: MapathonRequestParams):
         }
     """
 
-    mapathon = Mapathon(params)
-    return mapathon.get_summary()
+    mapathon = AsyncMapathon(params)
+    with database_errors():
+        return json_response(await mapathon.get_summary())
@@ -17,16 +17,20 @@
 # 1100 13th Street NW Suite 800 Washington, D.C. 20005
 # <info@hotosm.org>
 
+from contextlib import closing
 from fastapi import APIRouter
 from fastapi_versioning import version
 from typing import List
 from src.galaxy.validation.models import UsersListParams, User, UserStatsParams, UserStatistics
 from src.galaxy.app import UserStats
+from . import json_response, run_on_db_executor
+
 router = APIRouter(prefix="/osm-users")
 
 
 @router.post("/ids/", response_model=List[User])
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_user_id(params: UsersListParams):
     """Provides OpenStreetMap user id of usernames, It is possible same username can be taken by different users at different times hence this endpoint takes from and to timestamps.
 
@@ -64,11 +68,13 @@ def get_user_id(params: UsersListParams):
         [{"userId":123456,"userName":"Kshitizraj Sharma"}]
     """
 
-    return UserStats().list_users(params)
+    with closing(UserStats()) as user_stats:
+        return user_stats.list_users(params)
 
 
 @router.post("/statistics/", response_model=List[UserStatistics])
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def get_user_statistics(params: UserStatsParams):
     """Returns Statistics for specified OpenStreetMap usernames over a period of time.
 
@@ -123,9 +129,8 @@ def get_user_statistics(params: UserStatsParams):
 
         {"userId":7004124,"fromTimestamp":"2022-06-28T14:25:33.277Z","toTimestamp":"2022-07-27T14:25:33.277Z","projectIds":[123],"hashtags":[]}
     """
-    user_stats = UserStats()
-
-    if len(params.hashtags) > 0:
-        return user_stats.get_statistics_with_hashtags(params)
+    with closing(UserStats()) as user_stats:
+        if len(params.hashtags) > 0:
+            return json_response(user_stats.get_statistics_with_hashtags(params))
 
-    return user_stats.get_statistics(params)
+        return json_response(user_stats.get_statistics(params))
@@ -0,0 +1,182 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""[Router Responsible for the background jobs of long reports ]
+"""
+import os
+import re
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
+from fastapi_versioning import version
+from typing import Optional
+
+from src.galaxy.config import csv_chunk_size
+from src.galaxy.jobs import (
+    REPORT_JOB_MEDIA_TYPES,
+    data_quality_hashtags_report,
+    get_report_jobs,
+    organization_hashtags_report,
+    validators_stats_report,
+)
+from src.galaxy.tasking_manager.models import ValidatorStatsRequest
+from src.galaxy.validation.models import (
+    DataQualityHashtagParams,
+    OrganizationHashtagParams,
+    OutputType,
+    ReportJob,
+    ReportJobStatus,
+)
+
+router = APIRouter(prefix="/report-jobs")
+
+
+@router.post("/validators-stats/", response_model=ReportJob,
+             status_code=status.HTTP_202_ACCEPTED)
+@version(1)
+async def submit_validators_stats_job(request: ValidatorStatsRequest):
+    """Queues the csv of /tasking-manager/validators/ as a background job, takes
+    the same request, returns the job to poll with /report-jobs/{job_id}/"""
+    return get_report_jobs().submit(
+        "validators_stats", validators_stats_report, request
+    )
+
+
+@router.post("/data-quality-hashtag-reports/", response_model=ReportJob,
+             status_code=status.HTTP_202_ACCEPTED)
+@version(1)
+async def submit_data_quality_hashtag_reports_job(params: DataQualityHashtagParams):
+    """Queues the whole report of /data-quality/hashtag-reports/ as a background
+    job, csv or geojson as the output type asks, page fields are ignored"""
+    output_format = "geojson" if params.output_type == OutputType.GEOJSON.value else "csv"
+    return get_report_jobs().submit(
+        "data_quality_hashtag_reports", data_quality_hashtags_report, params,
+        output_format
+    )
+
+
+@router.post("/organization-hashtags/", response_model=ReportJob,
+             status_code=status.HTTP_202_ACCEPTED)
+@version(1)
+async def submit_organization_hashtags_job(params: OrganizationHashtagParams):
+    """Queues the csv of /hashtags/statistics/ as a background job"""
+    return get_report_jobs().submit(
+        "organization_hashtags", organization_hashtags_report, params
+    )
+
+
+def get_job(job_id):
+    try:
+        return get_report_jobs().get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Report job not found")
+
+
+@router.get("/{job_id}/", response_model=ReportJob)
+@version(1)
+async def get_report_job(job_id: str):
+    """Returns the status of a report job
+
+    Example Response :
+
+        {
+          "jobId": "0d8a6c5b1f7e4e63a4a5e0f8a31c7c55",
+          "report": "validators_stats",
+          "status": "succeeded",
+          "createdAt": "2022-09-05T10:12:03.120000+00:00",
+          "startedAt": "2022-09-05T10:12:03.240000+00:00",
+          "finishedAt": "2022-09-05T10:14:51.010000+00:00",
+          "size": 1827364,
+          "error": null
+        }
+    """
+    return get_job(job_id)
+
+
+def parse_byte_range(range_header, size):
+    """Returns the first and last byte of the single range of a Range header,
+    None when the whole file is to be sent, raises ValueError when the range
+    is not satisfiable"""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header or "")
+    if match is None or match.groups() == ("", ""):
+        # several ranges are not supported, the whole file is sent instead
+        return None
+    first, last = match.groups()
+    if first == "":
+        # the last bytes of the file
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if first > last or first >= size:
+        raise ValueError(range_header)
+    return first, last
+
+
+def read_file_range(path, first, last, chunk_size=None):
+    """Yields the bytes of path from first to last"""
+    chunk_size = chunk_size or csv_chunk_size
+    remaining = last - first + 1
+    with open(path, "rb") as result_file:
+        result_file.seek(first)
+        while remaining > 0:
+            chunk = result_file.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.get("/{job_id}/download/")
+@version(1)
+def download_report_job(job_id: str, range: Optional[str] = Header(None)):
+    """Sends the result of a succeeded report job, a single byte range can be
+    asked for with the Range header to resume a download"""
+    job = get_job(job_id)
+    if job["status"] != ReportJobStatus.succeeded.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report job is {job['status']}, its result is not available",
+        )
+    path = get_report_jobs().result_path(job)
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={job['report']}_{job_id}.{job['output_format']}",
+    }
+    try:
+        byte_range = parse_byte_range(range, size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    status_code = status.HTTP_200_OK
+    first, last = 0, size - 1
+    if byte_range is not None:
+        first, last = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        read_file_range(path, first, last),
+        status_code=status_code,
+        media_type=REPORT_JOB_MEDIA_TYPES[job["output_format"]],
+        headers=headers,
+    )
@@ -21,15 +21,18 @@
   Router Responsible for Data Source Update Status
 """
 
+from contextlib import closing
 from fastapi import APIRouter
 from fastapi_versioning import version
 from src.galaxy.validation.models import DataOutput, DataRecencyParams
-from src.galaxy.app import Status
+from src.galaxy.app import Status, get_connection_pool_stats, response_cache
+from . import run_on_db_executor
 router = APIRouter(prefix="/status")
 
 
 @router.post("/")
 @version(1)
+@run_on_db_executor("UNDERPASS")
 def data_recency_status(params: DataRecencyParams):
     """Gives the time lapse since the last update per data source per data output
 
@@ -59,14 +62,48 @@ def data_recency_status(params: DataRecencyParams):
         }
     """
     result = None
-    db = Status(params)
-    if (params.data_output == DataOutput.osm.value):
-        result = db.get_osm_recency()
-    elif (params.data_output == DataOutput.mapathon_statistics.value):
-        result = db.get_mapathon_statistics_recency()
-    elif (params.data_output == DataOutput.user_statistics.value):
-        result = db.get_user_statistics_recency()
-    elif (params.data_output == DataOutput.data_quality.value):
-        result = db.get_user_data_quality_recency()
+    with closing(Status(params)) as db:
+        if (params.data_output == DataOutput.osm.value):
+            result = db.get_osm_recency()
+        elif (params.data_output == DataOutput.mapathon_statistics.value):
+            result = db.get_mapathon_statistics_recency()
+        elif (params.data_output == DataOutput.user_statistics.value):
+            result = db.get_user_statistics_recency()
+        elif (params.data_output == DataOutput.data_quality.value):
+            result = db.get_user_data_quality_recency()
 
     return {"time_difference": str(result) if result else None}
+
+
+@router.get("/db-pool/")
+@version(1)
+async def database_pool_status():
+    """Returns size and wait time of the database connection pools
+
+    Returns:
+
+        {
+          "UNDERPASS": {
+            "min_size": 1, "max_size": 10, "in_use": 2, "idle": 1,
+            "borrowed": 340, "total_wait_time": 0.0021,
+            "avg_wait_time": 0.0, "max_wait_time": 0.0012
+          }
+        }
+    """
+    return get_connection_pool_stats()
+
+
+@router.get("/response-cache/")
+@version(1)
+async def response_cache_status():
+    """Returns size and hit/miss counters of the report response cache
+
+    Returns:
+
+        {
+          "size": 12, "max_size": 256, "hits": 310, "misses": 45,
+          "hit_ratio": 0.873, "invalidations": 3,
+          "watermark": "2022-09-05 10:12:03+00:00"
+        }
+    """
+    return response_cache.stats()
@@ -19,6 +19,7 @@
 
 """[Router Responsible for Organizational data API ]
 """
+from contextlib import closing
 from fastapi import APIRouter, Response
 from fastapi_versioning import version
 # from .auth import login_required
@@ -29,6 +30,7 @@ from src.galaxy.app import TaskingManager
 from fastapi.responses import StreamingResponse
 
 from datetime import datetime
+from . import release_report, run_on_db_executor
 
 
 router = APIRouter(prefix="/tasking-manager")
@@ -36,6 +38,7 @@ router = APIRouter(prefix="/tasking-manager")
 
 @router.post("/validators/")
 @version(1)
+@run_on_db_executor("TM")
 def get_validator_stats(request: ValidatorStatsRequest):
     """Endpoint returns statistics of validators reading tasking manager database
 
@@ -86,10 +89,11 @@ def get_validator_stats(request: ValidatorStatsRequest):
     Note : API returns 404 No data available if no data is found on database for the request !
 
     """
+    # the connection is released once the csv has been streamed
     tm = TaskingManager(request)
     csv_stream = tm.get_validators_stats()
     if csv_stream:
-        response = StreamingResponse(csv_stream)
+        response = StreamingResponse(csv_stream, background=release_report(tm, csv_stream))
         name = f"ValidatorStats_{datetime.now().isoformat()}"
         response.headers["Content-Disposition"] = f"attachment; filename={name}.csv"
 
@@ -99,8 +103,10 @@ def get_validator_stats(request: ValidatorStatsRequest):
 
 @router.get("/teams/")
 @version(1)
+@run_on_db_executor("TM")
 def get_teams():
-    csv_stream = TaskingManager().list_teams()
+    with closing(TaskingManager()) as tm:
+        csv_stream = tm.list_teams()
 
     response = StreamingResponse(csv_stream)
     name = f"Teams_{datetime.now().isoformat()}"
@@ -111,8 +117,10 @@ def get_teams():
 
 @router.get("/teams/individual/")
 @version(1)
+@run_on_db_executor("TM")
 def get_team_full_metadata(team_id: int = None):
-    csv_stream = TaskingManager().list_teams_metadata(team_id)
+    with closing(TaskingManager()) as tm:
+        csv_stream = tm.list_teams_metadata(team_id)
 
     response = StreamingResponse(csv_stream)
     name = f"Teams_{datetime.now().isoformat()}"
@@ -19,6 +19,7 @@
 
 """[Router Responsible for training data API ]
 """
+from contextlib import closing
 from fastapi import APIRouter
 from fastapi_versioning import version
 from src.galaxy.app import Training
@@ -30,12 +31,12 @@ router = APIRouter(prefix="/training")
 @router.get("/organisations/", response_model=List[TrainingOrganisations])
 @version(1)
 def get_organisations_list():
-    training = Training("underpass")
-    return training.get_all_organisations()
+    with closing(Training()) as training:
+        return training.get_all_organisations()
 
 
 @router.post("", response_model=List[Trainings])
 @version(1)
 def get_trainings_list(params: TrainingParams):
-    training = Training("underpass")
-    return training.get_trainingslist(params)
+    with closing(Training()) as training:
+        return training.get_trainingslist(params)
@@ -0,0 +1,46 @@
+--
+-- Tasking Manager tables and columns the query builder reads, with the types
+-- of the Tasking Manager schema
+--
+
+CREATE TABLE public.organisations (
+    id integer NOT NULL PRIMARY KEY,
+    name character varying(512) NOT NULL
+);
+
+CREATE TABLE public.users (
+    id bigint NOT NULL PRIMARY KEY,
+    username character varying,
+    mapping_level integer NOT NULL
+);
+
+CREATE TABLE public.projects (
+    id integer NOT NULL PRIMARY KEY,
+    status integer NOT NULL,
+    created timestamp without time zone NOT NULL,
+    total_tasks integer NOT NULL,
+    tasks_mapped integer NOT NULL,
+    tasks_validated integer NOT NULL,
+    organisation_id integer,
+    country character varying[]
+);
+
+CREATE TABLE public.tasks (
+    id integer NOT NULL,
+    project_id integer NOT NULL,
+    mapped_by bigint,
+    validated_by bigint,
+    PRIMARY KEY (id, project_id)
+);
+
+CREATE TABLE public.task_history (
+    id serial NOT NULL PRIMARY KEY,
+    project_id integer,
+    task_id integer NOT NULL,
+    action character varying NOT NULL,
+    action_text character varying,
+    action_date timestamp without time zone NOT NULL,
+    user_id bigint NOT NULL
+);
+
+CREATE INDEX idx_task_history_composite ON public.task_history USING btree (task_id, project_id);
@@ -0,0 +1,122 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Micro-benchmark of the fast json response path on a mapathon detail report
+
+Usage, from the repository root:
+
+    python -m benchmarks.json_response [FEATURES]
+
+Compares the encoding FastAPI does against the response_model of
+/mapathon/detail/ with the orjson path of API.json_response, on a synthetic
+report of FEATURES mapped features ( 50000 by default ). No database is
+needed.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import API
+from src.galaxy.app import Mapathon
+from src.galaxy.validation.models import (
+    MapathonDetail,
+    MappedTaskStats,
+    TimeSpentMapping,
+    TimeSpentValidating,
+    ValidatedTaskStats,
+)
+
+DEFAULT_FEATURES = 50_000
+
+
+def mapathon_detail(features, seed=0):
+    """Returns a mapathon detail report of features mapped features"""
+    rng = random.Random(seed)
+    users = range(1, features // 10 + 2)
+    mapped_features = [
+        {
+            "feature": rng.choice(["building", "highway", "landuse", "place"]),
+            "action": rng.choice(["create", "modify"]),
+            "count": rng.randint(1, 500),
+            "username": f"mapper {rng.choice(users)}",
+        }
+        for _ in range(features)
+    ]
+    contributors = [
+        {
+            "user_id": user_id,
+            "username": f"mapper {user_id}",
+            "total_buildings": rng.randint(0, 5000),
+            "editors": "JOSM,iD",
+        }
+        for user_id in users
+    ]
+    return Mapathon.detailed_report(
+        mapped_features,
+        contributors,
+        [MappedTaskStats(user_id=u, tasks_mapped=rng.randint(1, 50)) for u in users],
+        [ValidatedTaskStats(user_id=u, tasks_validated=rng.randint(1, 50)) for u in users],
+        [TimeSpentMapping(user_id=u, time_spent_mapping=rng.random() * 3600) for u in users],
+        [TimeSpentValidating(user_id=u, time_spent_validating=rng.random() * 3600) for u in users],
+    )
+
+
+def response_model_body(field, report):
+    """Body FastAPI sends for report, validated against the response_model"""
+    content = asyncio.run(serialize_response(field=field, response_content=report))
+    return JSONResponse(content).body
+
+
+def fast_json_body(report):
+    """Body sent by API.json_response with use_fast_json_responses set"""
+    API.use_fast_json_responses = True
+    return API.json_response(report).body
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(features):
+    report = mapathon_detail(features)
+    field = create_response_field("Response_detail", MapathonDetail)
+    expected, response_model = timed(response_model_body, field, report)
+    result, fast_json = timed(fast_json_body, report)
+    if json.loads(result) != json.loads(expected):
+        raise AssertionError("response bodies differ")
+    print(f"mapathon detail, {features} mapped features, {len(expected)} bytes")
+    print(f"    response_model + json: {response_model:.3f}s")
+    print(f"    orjson:                {fast_json:.3f}s")
+    print(f"    speedup:               {response_model / fast_json:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FEATURES)
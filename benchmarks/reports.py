@@ -0,0 +1,361 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Benchmark of the reports on synthetic Underpass and Tasking Manager data
+
+Usage, from the repository root:
+
+    python -m benchmarks.reports [--scales 1,10] [--repeat 5] [--seed 0]
+        [--jobs N] [--output FILE] [--baseline FILE] [--tolerance 0.25]
+
+Starts a throwaway Postgres with testing.postgresql, loads the Underpass
+schema of tests/src/fixtures/underpass.sql, the Tasking Manager tables of
+benchmarks/fixtures/tasking_manager.sql and the migrations, then at each
+scale fills them with the data of benchmarks.synthetic_data and times every
+report REPEAT times, query building included, with the response cache
+disabled. Scale 1 is 20000 changesets and validation issues, 1000 users and
+about 2000 tasking manager tasks.
+
+The timings are written as json to FILE. Given the FILE of a former run as
+baseline, the run exits with status 1 when the median time of a report at a
+scale is more than TOLERANCE above the baseline one ( and more than
+--min-delta seconds, to leave out the noise of the fastest reports ).
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+
+import testing.postgresql
+from psycopg2 import connect
+from testing.postgresql import find_program
+
+from benchmarks.synthetic_data import SCALE_ROWS, generate
+from src.galaxy.app import (
+    DataQuality,
+    DataQualityHashtags,
+    Mapathon,
+    OrganizationHashtags,
+    TaskingManager,
+    UserStats,
+    close_connection_pools,
+    response_cache,
+)
+from src.galaxy.config import config
+from src.galaxy.tasking_manager.models import ValidatorStatsRequest
+from src.galaxy.validation.models import (
+    DataQuality_TM_RequestParams,
+    DataQuality_username_RequestParams,
+    DataQualityHashtagParams,
+    MapathonRequestParams,
+    OrganizationHashtagParams,
+    UserStatsParams,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNDERPASS_SCHEMA = os.path.join(ROOT, "tests", "src", "fixtures", "underpass.sql")
+TM_SCHEMA = os.path.join(ROOT, "benchmarks", "fixtures", "tasking_manager.sql")
+UNDERPASS_MIGRATIONS = sorted(glob.glob(os.path.join(ROOT, "migrations", "*.sql")))
+TM_MIGRATIONS = sorted(glob.glob(os.path.join(ROOT, "migrations", "tm", "*.sql")))
+
+DEFAULT_SCALES = [1, 10]
+
+MAPATHON_PARAMS = {
+    "projectIds": [1, 2, 3, 4, 5],
+    "hashtags": ["mapandchathour2021"],
+    "fromTimestamp": "2021-08-10T09:00:00",
+    "toTimestamp": "2021-08-10T21:00:00",
+}
+
+
+def consume(chunks):
+    """Reads a streamed report to its end, returns its size"""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def mapathon_summary():
+    with closing(Mapathon(MapathonRequestParams(**MAPATHON_PARAMS))) as mapathon:
+        return mapathon.get_summary()
+
+
+def mapathon_detail():
+    with closing(Mapathon(MapathonRequestParams(**MAPATHON_PARAMS))) as mapathon:
+        return mapathon.get_detailed_report()
+
+
+def user_statistics():
+    params = UserStatsParams(
+        userId=1,
+        hashtags=["missingmaps"],
+        fromTimestamp="2021-08-01T00:00:00",
+        toTimestamp="2021-08-29T00:00:00",
+    )
+    with closing(UserStats()) as user_stats:
+        return user_stats.get_statistics_with_hashtags(params)
+
+
+def data_quality_hashtags():
+    params = DataQualityHashtagParams(
+        hashtags=["missingmaps"],
+        issueType=["badgeom"],
+        outputType="csv",
+        fromTimestamp="2021-08-01T00:00:00",
+        toTimestamp="2021-08-08T00:00:00",
+    )
+    return consume(DataQualityHashtags(params).get_report_as_csv_stream())
+
+
+def data_quality_project():
+    params = DataQuality_TM_RequestParams(
+        projectIds=[1, 2, 3], issueTypes=["badgeom"], outputType="csv"
+    )
+    return consume(DataQuality(params, "TM").get_report_as_csv_stream())
+
+
+def data_quality_username():
+    params = DataQuality_username_RequestParams(
+        osmUsernames=["mapper_1", "mapper_2", "mapper_3"],
+        issueTypes=["badvalue"],
+        hashtags=[],
+        outputType="csv",
+        fromTimestamp="2021-08-01T00:00:00",
+        toTimestamp="2021-08-29T00:00:00",
+    )
+    return consume(DataQuality(params, "username").get_report_as_csv_stream())
+
+
+def organization_hashtags():
+    params = OrganizationHashtagParams(
+        hashtag="missingmaps",
+        frequency="w",
+        outputType="json",
+        startDate="2021-08-01",
+        endDate="2021-08-29",
+    )
+    with closing(OrganizationHashtags(params)) as organization:
+        return organization.get_report()
+
+
+def validators_stats():
+    csv_stream = TaskingManager(ValidatorStatsRequest(year=2021)).get_validators_stats()
+    return 0 if csv_stream is None else consume(csv_stream)
+
+
+REPORTS = {
+    "mapathon_summary": mapathon_summary,
+    "mapathon_detail": mapathon_detail,
+    "user_statistics": user_statistics,
+    "data_quality_hashtags": data_quality_hashtags,
+    "data_quality_project": data_quality_project,
+    "data_quality_username": data_quality_username,
+    "organization_hashtags": organization_hashtags,
+    "validators_stats": validators_stats,
+}
+
+
+def psql(db_params, path):
+    """Runs the sql file of path, psql is needed for the COPY ... FROM stdin
+    of pg_dump files"""
+    subprocess.run(
+        [
+            find_program("psql", ["bin"]),
+            "--quiet",
+            "--set=ON_ERROR_STOP=1",
+            f"--host={db_params['host']}",
+            f"--port={db_params['port']}",
+            f"--username={db_params['user']}",
+            f"--dbname={db_params['database']}",
+            f"--file={path}",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def create_databases(postgresql):
+    """Creates the Underpass and Tasking Manager databases, returns their
+    connection parameters"""
+    underpass = postgresql.dsn()
+    tm = dict(underpass, database="tasking_manager")
+    conn = connect(**underpass)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE DATABASE tasking_manager")
+    conn.close()
+    for path in [UNDERPASS_SCHEMA, *UNDERPASS_MIGRATIONS]:
+        psql(underpass, path)
+    for path in [TM_SCHEMA, *TM_MIGRATIONS]:
+        psql(tm, path)
+    return underpass, tm
+
+
+def use_databases(underpass, tm):
+    """Points the UNDERPASS and TM sections of the API config to the
+    benchmark databases, before any connection pool is created"""
+    for section, db_params in (("UNDERPASS", underpass), ("TM", tm)):
+        if config.has_section(section):
+            config.remove_section(section)
+        config.read_dict(
+            {section: {key: str(value) for key, value in db_params.items()}}
+        )
+    # every run of a report has to reach the database
+    response_cache.maxsize = 0
+
+
+def timed(func, repeat):
+    """Returns the elapsed times of repeat calls of func, after a first call
+    that warms the caches of Postgres up"""
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(scales, repeat, seed, jobs=1):
+    """Returns the results of a benchmark run"""
+    results = []
+    with testing.postgresql.Postgresql() as postgresql:
+        underpass, tm = create_databases(postgresql)
+        use_databases(underpass, tm)
+        try:
+            for scale in scales:
+                start = time.perf_counter()
+                counts = generate(underpass, tm, scale, seed, jobs=jobs)
+                print(
+                    f"scale {scale}: {counts['UNDERPASS']['changesets']} "
+                    f"changesets loaded in {time.perf_counter() - start:.1f}s"
+                )
+                for report, func in REPORTS.items():
+                    times = timed(func, repeat)
+                    results.append(
+                        {
+                            "report": report,
+                            "scale": scale,
+                            "median": statistics.median(times),
+                            "min": min(times),
+                            "max": max(times),
+                            "times": times,
+                            "rows": counts,
+                        }
+                    )
+                    print(f"    {report:<24} {statistics.median(times):.4f}s")
+        finally:
+            close_connection_pools()
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "seed": seed,
+        "scale_rows": SCALE_ROWS,
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Returns the regressions of results against the baseline results, one
+    line for each report and scale slower than the tolerance allows"""
+    baseline_medians = {
+        (result["report"], result["scale"]): result["median"]
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in results["results"]:
+        before = baseline_medians.get((result["report"], result["scale"]))
+        if before is None:
+            continue
+        after = result["median"]
+        if after > before * (1 + tolerance) and after - before > min_delta:
+            regressions.append(
+                f"{result['report']} at scale {result['scale']}: "
+                f"{before:.4f}s -> {after:.4f}s ({after / max(before, 1e-9) - 1:+.0%})"
+            )
+    return regressions
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.reports",
+        description="Times the reports on synthetic data at several scales",
+    )
+    parser.add_argument(
+        "--scales",
+        type=lambda value: [int(scale) for scale in value.split(",")],
+        default=DEFAULT_SCALES,
+        help="comma separated scale factors, 1 is 20000 changesets",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="processes generating the synthetic changesets",
+    )
+    parser.add_argument("--output", help="json file the results are written to")
+    parser.add_argument("--baseline", help="json results of a former run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown over the baseline median that fails the run, 0.25 is 25%%",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.005,
+        help="seconds a report has to lose over its baseline to fail the run",
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    results = run(args.scales, args.repeat, args.seed, args.jobs)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(
+                results, json.load(baseline_file), args.tolerance, args.min_delta
+            )
+        if regressions:
+            print(f"Regressions over {args.tolerance:.0%} of {args.baseline}:")
+            for regression in regressions:
+                print(f"    {regression}")
+            return 1
+        print(f"No regression over {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
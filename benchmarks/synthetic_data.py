@@ -0,0 +1,663 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Fills the Underpass and Tasking Manager databases with synthetic data
+
+Usage, from the repository root:
+
+    python -m benchmarks.synthetic_data [--scale 1] [--seed 0]
+        [--start 2021-08-01] [--days 28] [--yes] [UNDERPASS] [TM]
+
+Replaces the changesets, validation and users of the UNDERPASS database and
+the organisations, users, projects, tasks and task_history of the TM
+database of config.txt with the synthetic data of a scale, the same seed
+gives the same rows. The tables are expected to exist, with the schema of
+tests/src/fixtures/underpass.sql and benchmarks/fixtures/tasking_manager.sql.
+Databases on another host than the local one are only replaced with --yes.
+
+Scale 1 is 1000 users, 20000 changesets, 20000 validation issues and 20
+projects of about 100 tasks, everything grows with the scale, so that scale
+500 is 10M changesets. Rows are written with COPY, apply the migrations once
+loaded rather than before for the fastest load.
+
+The data mimics the shape of the real one: a few mappers and projects make
+most of the changesets, hashtags are drawn from a few popular ones and a long
+tail of events, changesets are located around a few mapping hotspots,
+validation issues are points inside their changeset and each task goes
+through locks, auto unlocks, mapping, validation and invalidation.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from psycopg2 import connect
+
+from src.galaxy.config import get_db_connection_params
+
+# rows of scale 1
+SCALE_ROWS = {
+    "users": 1_000,
+    "changesets": 20_000,
+    "validation": 20_000,
+    "projects": 20,
+    "tasks": 100,  # per project, does not grow with the scale
+}
+
+# changesets generated at once, each block has a random generator of its
+# own so that the rows do not depend on the number of jobs
+BLOCK_SIZE = 50_000
+COPY_BUFFER_SIZE = 1 << 20
+
+EDITORS = {
+    "iD 2.20.2": 55,
+    "JOSM/1.5 (18303 en)": 25,
+    "RapiD 1.1.8": 10,
+    "StreetComplete 40.1": 5,
+    "Vespucci 17.0": 5,
+}
+POPULAR_HASHTAGS = {
+    "missingmaps": 30,
+    "hotosm": 15,
+    "youthmappers": 10,
+    "mapandchathour2021": 6,
+    "msf": 6,
+    "redcross": 6,
+    "mapathon": 5,
+    "osmgeoweek": 2,
+}
+# share of the hashtags drawn from the popular ones, the others are events
+POPULAR_HASHTAG_SHARE = 0.7
+EVENT_HASHTAGS = 1000
+# number of hashtags besides the project one
+HASHTAG_COUNTS = {0: 35, 1: 35, 2: 20, 3: 10}
+# share of the changesets made from the tasking manager
+PROJECT_CHANGESET_SHARE = 0.6
+# key: share of the changesets having it, parameters of its lognormal count
+ADDED_FEATURES = {
+    "building": (0.7, 2.0, 1.0),
+    "highway": (0.35, 1.0, 0.8),
+    "highway_km": (0.35, 6.0, 1.2),
+    "landuse": (0.1, 0.5, 0.7),
+    "waterway": (0.05, 0.5, 0.7),
+    "amenity": (0.05, 0.0, 0.5),
+    "place": (0.03, 0.0, 0.5),
+}
+MODIFIED_FEATURES = {
+    "building": (0.3, 1.0, 1.0),
+    "highway": (0.25, 0.5, 0.8),
+    "highway_km": (0.25, 5.0, 1.2),
+}
+# lon, lat of the places most changesets are around
+HOTSPOTS = [
+    (85.32, 27.70),  # Kathmandu
+    (36.82, -1.29),  # Nairobi
+    (32.58, 0.35),  # Kampala
+    (90.41, 23.81),  # Dhaka
+    (-77.04, -12.05),  # Lima
+    (-72.34, 18.54),  # Port-au-Prince
+    (15.27, -4.44),  # Kinshasa
+    (120.98, 14.60),  # Manila
+    (33.79, -13.96),  # Lilongwe
+    (106.85, -6.21),  # Jakarta
+]
+HOTSPOT_SPREAD = 0.5  # degrees
+OBJECT_TYPES = {"way": 75, "node": 20, "relation": 5}
+ISSUES = {
+    "badgeom": 35,
+    "badvalue": 25,
+    "incomplete": 15,
+    "notags": 10,
+    "overlaping": 8,
+    "duplicate": 7,
+}
+# share of the validation issues having two statuses
+TWO_ISSUES_SHARE = 0.15
+MAPPING_LEVELS = {1: 60, 2: 25, 3: 15}
+# status of the projects, 0 archived, 1 published and 2 draft
+PROJECT_STATUSES = {1: 60, 0: 30, 2: 10}
+COUNTRIES = ["Nepal", "Kenya", "Uganda", "Bangladesh", "Peru", "Haiti",
+             "Democratic Republic of the Congo", "Philippines", "Malawi",
+             "Indonesia"]
+# task_history action sequences
+AUTO_UNLOCK_SHARE = 0.15
+MAPPED_SHARE = 0.8
+VALIDATED_SHARE = 0.7
+INVALIDATED_SHARE = 0.15
+# share of the users validating tasks
+VALIDATORS_SHARE = 0.1
+
+# tables replaced in each database
+DATABASE_TABLES = {
+    "UNDERPASS": ["changesets", "validation", "users"],
+    "TM": ["organisations", "users", "projects", "tasks", "task_history"],
+}
+
+
+class Weighted:
+    """Population drawn from with the weights of a dict"""
+
+    def __init__(self, weights):
+        self.population = list(weights)
+        self.cum_weights = list(accumulate(weights.values()))
+        self.total = self.cum_weights[-1]
+
+    def one(self, rng):
+        return self.population[bisect(self.cum_weights, rng.random() * self.total)]
+
+
+def skewed(rng, count, exponent=3):
+    """Returns an id from 1 to count, the lowest ids being the most drawn"""
+    return 1 + int(count * rng.random() ** exponent)
+
+
+def copy_value(value):
+    """Returns value in the COPY text format, the generated strings have no
+    character needing an escape"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        return "{" + ",".join(value) + "}"
+    return str(value)
+
+
+def copy_line(*values):
+    return "\t".join([copy_value(value) for value in values]) + "\n"
+
+
+class CopyLines:
+    """File-like object of COPY text lines, read by copy_expert"""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def read(self, size=COPY_BUFFER_SIZE):
+        chunks = []
+        length = 0
+        for line in self.lines:
+            chunks.append(line)
+            length += len(line)
+            if length >= size:
+                break
+        return "".join(chunks).encode()
+
+
+def copy_lines(cursor, table, columns, lines):
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+        CopyLines(lines),
+        size=COPY_BUFFER_SIZE,
+    )
+
+
+def ordered_map(func, items, jobs=1):
+    """Yields func(item) for each item in order, computed on jobs processes
+    at most 2 * jobs items ahead of the consumer"""
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def users(rows, seed):
+    """Yields the users, the same ones in both databases"""
+    rng = random.Random(f"{seed}:users")
+    mapping_levels = Weighted(MAPPING_LEVELS)
+    for user_id in range(1, rows["users"] + 1):
+        yield copy_line(user_id, f"mapper_{user_id}", mapping_levels.one(rng))
+
+
+def timestamp(moment):
+    return moment.isoformat(sep=" ")
+
+
+def duration(seconds):
+    """Duration in the HH:MM:SS format of task_history action texts"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+
+class UnderpassData:
+    """Rows of the Underpass tables"""
+
+    def __init__(self, rows, seed, start, days):
+        self.rows = rows
+        self.seed = seed
+        self.rng = None
+        self.start = start
+        self.seconds = days * 86400
+        self.editors = Weighted(EDITORS)
+        self.popular_hashtags = Weighted(POPULAR_HASHTAGS)
+        self.hashtag_counts = Weighted(HASHTAG_COUNTS)
+        self.object_types = Weighted(OBJECT_TYPES)
+        self.issues = Weighted(ISSUES)
+        self.osm_id = None
+
+    def hashtags(self):
+        rng = self.rng
+        hashtags = []
+        if rng.random() < PROJECT_CHANGESET_SHARE:
+            project_id = skewed(rng, self.rows["projects"], 2)
+            hashtags.append(f"hotosm-project-{project_id}")
+        for _ in range(self.hashtag_counts.one(rng)):
+            if rng.random() < POPULAR_HASHTAG_SHARE:
+                hashtags.append(self.popular_hashtags.one(rng))
+            else:
+                hashtags.append(f"event{skewed(rng, EVENT_HASHTAGS, 2)}")
+        if not hashtags:
+            return "\\N"
+        return "{" + ",".join(dict.fromkeys(hashtags)) + "}"
+
+    def features(self, features):
+        """Returns the hstore text of the feature counts of a changeset"""
+        rng = self.rng
+        counts = [
+            f'"{key}"=>"{int(rng.lognormvariate(mu, sigma))}"'
+            for key, (share, mu, sigma) in features.items()
+            if rng.random() < share
+        ]
+        return ", ".join(counts) if counts else "\\N"
+
+    def changesets(self, first_id, count):
+        """Returns the COPY lines of count changesets from first_id on along
+        with the changeset id, user id, creation time and bbox of each"""
+        rng = self.rng
+        lines, changesets = [], []
+        for changeset_id in range(first_id, first_id + count):
+            created_at = self.start + timedelta(seconds=rng.random() * self.seconds)
+            closed_at = timestamp(
+                created_at + timedelta(seconds=rng.expovariate(1 / 1200))
+            )
+            created_at = timestamp(created_at)
+            user_id = skewed(rng, self.rows["users"])
+            lon, lat = rng.choice(HOTSPOTS)
+            lon += rng.gauss(0, HOTSPOT_SPREAD)
+            lat += rng.gauss(0, HOTSPOT_SPREAD)
+            half_size = 0.001 + rng.expovariate(1 / 0.01)
+            bbox = (lon - half_size, lat - half_size, lon + half_size, lat + half_size)
+            x0, y0, x1, y1 = (f"{value:.7f}" for value in bbox)
+            lines.append(
+                f"{changeset_id}\t{self.editors.one(rng)}\t{user_id}\t"
+                f"{created_at}\t{closed_at}\t{closed_at}\t"
+                f"{self.features(ADDED_FEATURES)}\t"
+                f"{self.features(MODIFIED_FEATURES)}\t{self.hashtags()}\t"
+                f"SRID=4326;MULTIPOLYGON((({x0} {y0},{x1} {y0},{x1} {y1},"
+                f"{x0} {y1},{x0} {y0})))\n"
+            )
+            changesets.append((changeset_id, user_id, created_at, bbox))
+        return lines, changesets
+
+    def validation(self, changesets, count):
+        """Yields the COPY lines of count validation issues of changesets"""
+        rng = self.rng
+        for _ in range(count):
+            changeset_id, user_id, created_at, (x0, y0, x1, y1) = rng.choice(changesets)
+            self.osm_id += 1
+            status = self.issues.one(rng)
+            if rng.random() < TWO_ISSUES_SHARE:
+                second_status = self.issues.one(rng)
+                if second_status != status:
+                    status = f"{status},{second_status}"
+            values = "{building=yes}" if rng.random() < 0.5 else "\\N"
+            yield (
+                f"{self.osm_id}\t{user_id}\t{changeset_id}\t"
+                f"{self.object_types.one(rng)}\t{rng.random() * 180:.4f}\t"
+                f"{{{status}}}\t{created_at}\t"
+                f"SRID=4326;POINT({x0 + (x1 - x0) * rng.random():.7f} "
+                f"{y0 + (y1 - y0) * rng.random():.7f})\t{values}\n"
+            )
+
+    def block(self, first_id):
+        """Returns the COPY text of the changesets of the block starting at
+        first_id and of their validation issues, along with their numbers"""
+        self.rng = random.Random(f"{self.seed}:changesets:{first_id}")
+        changesets, validation = self.rows["changesets"], self.rows["validation"]
+        count = min(BLOCK_SIZE, changesets + 1 - first_id)
+        lines, block = self.changesets(first_id, count)
+        # issues are spread evenly over the blocks
+        first_issue = validation * (first_id - 1) // changesets
+        issues = validation * (first_id - 1 + count) // changesets - first_issue
+        self.osm_id = first_issue
+        return "".join(lines), "".join(self.validation(block, issues)), count, issues
+
+    def copy(self, cursor, jobs=1):
+        """Writes the rows of every table, returns their number per table"""
+        copy_lines(
+            cursor,
+            "users",
+            ["id", "username", "mapping_level"],
+            users(self.rows, self.seed),
+        )
+        counts = {"users": self.rows["users"], "changesets": 0, "validation": 0}
+        first_ids = range(1, self.rows["changesets"] + 1, BLOCK_SIZE)
+        for changesets, validation, count, issues in ordered_map(
+            self.block, first_ids, jobs
+        ):
+            copy_lines(
+                cursor,
+                "changesets",
+                ["id", "editor", "user_id", "created_at", "closed_at",
+                 "updated_at", "added", "modified", "hashtags", "bbox"],
+                [changesets],
+            )
+            copy_lines(
+                cursor,
+                "validation",
+                ["osm_id", "user_id", "change_id", "type", "angle", "status",
+                 '"timestamp"', "location", '"values"'],
+                [validation],
+            )
+            counts["changesets"] += count
+            counts["validation"] += issues
+        return counts
+
+
+class TaskingManagerData:
+    """Rows of the Tasking Manager tables"""
+
+    def __init__(self, rows, seed, start, days):
+        self.rows = rows
+        self.seed = seed
+        self.rng = random.Random(f"{seed}:tasking_manager")
+        self.start = start.replace(tzinfo=None)
+        self.seconds = days * 86400
+        self.project_statuses = Weighted(PROJECT_STATUSES)
+        self.validators = max(1, int(rows["users"] * VALIDATORS_SHARE))
+        self.organisations = max(10, rows["projects"] // 10)
+
+    def lock(self, history, project_id, task_id, action, user_id, moment):
+        """Appends a lock of the task along with its duration, returns the
+        end of the lock"""
+        # locks expire after two hours
+        seconds = min(60 + self.rng.expovariate(1 / 1200), 7200)
+        history.append(
+            copy_line(project_id, task_id, action, duration(seconds), timestamp(moment), user_id)
+        )
+        return moment + timedelta(seconds=seconds)
+
+    def map_task(self, history, project_id, task_id, moment):
+        """Appends the mapping of a task, auto unlocked mapping attempts
+        first, returns its mapper and the end of the mapping, no mapper when
+        the task was not mapped"""
+        rng = self.rng
+        mapper = skewed(rng, self.rows["users"])
+        while rng.random() < AUTO_UNLOCK_SHARE:
+            moment = self.lock(
+                history, project_id, task_id, "AUTO_UNLOCKED_FOR_MAPPING", mapper, moment
+            )
+            moment += timedelta(seconds=rng.expovariate(1 / 3600))
+            mapper = skewed(rng, self.rows["users"])
+        if rng.random() >= MAPPED_SHARE:
+            return None, moment
+        moment = self.lock(history, project_id, task_id, "LOCKED_FOR_MAPPING", mapper, moment)
+        history.append(
+            copy_line(project_id, task_id, "STATE_CHANGE", "MAPPED", timestamp(moment), mapper)
+        )
+        return mapper, moment
+
+    def validate_task(self, history, project_id, task_id, moment, state):
+        """Appends the validation of a mapped task, returns its validator"""
+        rng = self.rng
+        validator = skewed(rng, self.validators, 2)
+        moment += timedelta(seconds=rng.expovariate(1 / 43200))
+        moment = self.lock(
+            history, project_id, task_id, "LOCKED_FOR_VALIDATION", validator, moment
+        )
+        history.append(
+            copy_line(project_id, task_id, "STATE_CHANGE", state, timestamp(moment), validator)
+        )
+        return validator, moment
+
+    def project(self, project_id, tasks, history):
+        """Appends the tasks of a project and their history, returns the
+        COPY line of the project"""
+        rng = self.rng
+        total_tasks = rng.randint(self.rows["tasks"] // 2, self.rows["tasks"] * 3 // 2)
+        tasks_mapped = tasks_validated = 0
+        for task_id in range(1, total_tasks + 1):
+            moment = self.start + timedelta(seconds=rng.random() * self.seconds)
+            mapper, moment = self.map_task(history, project_id, task_id, moment)
+            validator = None
+            validated = mapper is not None and rng.random() < VALIDATED_SHARE
+            if validated and rng.random() < INVALIDATED_SHARE:
+                _, moment = self.validate_task(
+                    history, project_id, task_id, moment, "INVALIDATED"
+                )
+                # the task stays invalidated when nobody maps it again
+                remapper, moment = self.map_task(history, project_id, task_id, moment)
+                validated = remapper is not None
+                mapper = remapper or mapper
+            if validated:
+                validator, moment = self.validate_task(
+                    history, project_id, task_id, moment, "VALIDATED"
+                )
+            tasks.append(copy_line(task_id, project_id, mapper, validator))
+            tasks_mapped += mapper is not None
+            tasks_validated += validator is not None
+        return copy_line(
+            project_id,
+            self.project_statuses.one(rng),
+            timestamp(self.start - timedelta(days=rng.random() * 180)),
+            total_tasks,
+            tasks_mapped,
+            tasks_validated,
+            1 + project_id % self.organisations,
+            [COUNTRIES[project_id % len(COUNTRIES)]],
+        )
+
+    def copy(self, cursor, jobs=1):
+        """Writes the rows of every table, returns their number per table,
+        they are generated on a single job"""
+        copy_lines(
+            cursor,
+            "organisations",
+            ["id", "name"],
+            (copy_line(i, f"Organisation {i}") for i in range(1, self.organisations + 1)),
+        )
+        copy_lines(
+            cursor,
+            "users",
+            ["id", "username", "mapping_level"],
+            users(self.rows, self.seed),
+        )
+        projects, tasks_count, history_count = [], 0, 0
+        tasks, history = [], []
+        for project_id in range(1, self.rows["projects"] + 1):
+            projects.append(self.project(project_id, tasks, history))
+            if len(history) >= BLOCK_SIZE or project_id == self.rows["projects"]:
+                copy_lines(
+                    cursor,
+                    "tasks",
+                    ["id", "project_id", "mapped_by", "validated_by"],
+                    tasks,
+                )
+                copy_lines(
+                    cursor,
+                    "task_history",
+                    ["project_id", "task_id", "action", "action_text",
+                     "action_date", "user_id"],
+                    history,
+                )
+                tasks_count += len(tasks)
+                history_count += len(history)
+                tasks, history = [], []
+        copy_lines(
+            cursor,
+            "projects",
+            ["id", "status", "created", "total_tasks", "tasks_mapped",
+             "tasks_validated", "organisation_id", "country"],
+            projects,
+        )
+        return {
+            "organisations": self.organisations,
+            "users": self.rows["users"],
+            "projects": len(projects),
+            "tasks": tasks_count,
+            "task_history": history_count,
+        }
+
+
+def scale_rows(scale):
+    """Returns the number of rows of each table at a scale"""
+    rows = {name: int(count * scale) for name, count in SCALE_ROWS.items()}
+    rows["tasks"] = SCALE_ROWS["tasks"]
+    return rows
+
+
+def fill(db_params, tables, data, jobs=1):
+    """Replaces the rows of tables with the ones of data in a single
+    transaction, then analyzes them, returns the number of rows per table"""
+    conn = connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            # COPY into a table truncated in the same transaction skips the
+            # WAL when wal_level is minimal
+            cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY")
+            counts = data.copy(cursor, jobs)
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"VACUUM ANALYZE {table}")
+        return counts
+    finally:
+        conn.close()
+
+
+def generate(underpass=None, tm=None, scale=1, seed=0, start=None, days=28, jobs=1):
+    """Fills the databases of the underpass and tm connection parameters,
+    either can be left out, changesets are generated on jobs processes,
+    returns the number of rows per table"""
+    rows = scale_rows(scale)
+    start = start or datetime(2021, 8, 1, tzinfo=timezone.utc)
+    counts = {}
+    if underpass is not None:
+        counts["UNDERPASS"] = fill(
+            underpass,
+            DATABASE_TABLES["UNDERPASS"],
+            UnderpassData(rows, seed, start, days),
+            jobs,
+        )
+    if tm is not None:
+        counts["TM"] = fill(
+            tm, DATABASE_TABLES["TM"], TaskingManagerData(rows, seed, start, days)
+        )
+    return counts
+
+
+# hosts of config.txt the synthetic data is loaded to without --yes, an
+# empty host or a directory is the unix socket of the local server
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+
+
+def is_local(db_params):
+    """Tells whether the database of db_params runs on the local host"""
+    host = str(db_params.get("host") or "")
+    return host in LOCAL_HOSTS or host.startswith("/")
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.synthetic_data",
+        description="Fills the Underpass and Tasking Manager databases of "
+        "config.txt with synthetic data",
+    )
+    parser.add_argument(
+        "databases",
+        nargs="*",
+        help="config sections of the databases to fill, UNDERPASS and TM by default",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1, help="1 is 20000 changesets"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--start",
+        type=lambda value: datetime.fromisoformat(value).replace(tzinfo=timezone.utc),
+        default=datetime(2021, 8, 1, tzinfo=timezone.utc),
+        help="first day of the changesets and task history, UTC",
+    )
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="processes generating the changesets, the rows do not depend on it",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="replace the tables of databases on another host than the local one",
+    )
+    args = parser.parse_args(args)
+    args.databases = args.databases or list(DATABASE_TABLES)
+    for section in args.databases:
+        if section not in DATABASE_TABLES:
+            parser.error(f"invalid database {section}, pick UNDERPASS or TM")
+    return args
+
+
+def main(args=None):
+    args = parse_args(args)
+    databases = {
+        section: get_db_connection_params(section) if section in args.databases else None
+        for section in DATABASE_TABLES
+    }
+    remote = [
+        f"{section} ( {db_params.get('host')} )"
+        for section, db_params in databases.items()
+        if db_params is not None and not is_local(db_params)
+    ]
+    if remote and not args.yes:
+        print(
+            f"Refusing to replace the tables of {', '.join(remote)}, not a local "
+            "database, pass --yes to fill it anyway"
+        )
+        return 1
+    start_time = time.perf_counter()
+    counts = generate(
+        *databases.values(),
+        scale=args.scale,
+        seed=args.seed,
+        start=args.start,
+        days=args.days,
+        jobs=args.jobs,
+    )
+    for section, tables in counts.items():
+        for table, count in tables.items():
+            print(f"{section:<10} {table:<14} {count:>12}")
+    print(f"Loaded in {time.perf_counter() - start_time:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Micro-benchmark of Output.to_GeoJSON against the former row-wise builder
+
+Usage, from the repository root:
+
+    python -m benchmarks.to_geojson [ROWS ...]
+
+Runs on a synthetic data quality report, no database is needed.
+"""
+import sys
+import time
+
+import numpy
+import pandas
+from geojson import Feature, FeatureCollection, Point
+
+from src.galaxy.app import Output
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+
+def data_quality_dataframe(rows, seed=0):
+    """Returns a dataframe shaped like a DataQuality report of rows issues"""
+    rng = numpy.random.default_rng(seed)
+    return pandas.DataFrame({
+        "changeset_id": rng.integers(1, 10**8, rows),
+        "osm_id": rng.integers(1, 10**10, rows),
+        "username": rng.choice(["alice", "bob", "carol", "dave"], rows),
+        "hashtags": rng.choice(["#hotosm-project-1", "#mapathon"], rows),
+        "status": rng.choice(["badgeom", "badvalue", "orphan"], rows),
+        "lat": rng.uniform(-90, 90, rows),
+        "lon": rng.uniform(-180, 180, rows),
+    })
+
+
+def row_wise_geojson(dataframe, lat_column, lng_column):
+    """Former implementation of Output.to_GeoJSON, one DataFrame.apply call
+    per row"""
+    properties = dataframe.drop([lat_column, lng_column], axis=1).to_dict(
+        "records"
+    )
+    features = dataframe.apply(
+        lambda row: Feature(
+            geometry=Point((float(row[lng_column]), float(row[lat_column]))),
+            properties=properties[row.name],
+        ),
+        axis=1,
+    ).tolist()
+    return FeatureCollection(features=features)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'row-wise':>10} {'columns':>10} {'speedup':>8}")
+    for rows in sizes:
+        output = Output(data_quality_dataframe(rows).to_dict("records"))
+        expected, row_wise = timed(
+            row_wise_geojson, output.get_dataframe(), "lat", "lon"
+        )
+        result, columns = timed(output.to_GeoJSON, "lat", "lon")
+        if result != expected:
+            raise AssertionError(f"outputs differ at {rows} rows")
+        print(
+            f"{rows:>10} {row_wise:>9.2f}s {columns:>9.2f}s "
+            f"{row_wise / columns:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(rows) for rows in sys.argv[1:]] or DEFAULT_ROWS)
@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS changesets_hashtags_idx ON changesets USING gin (hashtags);
+CREATE INDEX IF NOT EXISTS validation_status_idx ON validation USING gin (status);
@@ -0,0 +1,5 @@
+CREATE INDEX IF NOT EXISTS changesets_created_at_idx ON changesets USING btree (created_at);
+CREATE INDEX IF NOT EXISTS changesets_closed_at_idx ON changesets USING btree (closed_at);
+CREATE INDEX IF NOT EXISTS changesets_user_id_created_at_idx ON changesets USING btree (user_id, created_at);
+CREATE INDEX IF NOT EXISTS validation_change_id_idx ON validation USING btree (change_id);
+CREATE INDEX IF NOT EXISTS validation_user_id_idx ON validation USING btree (user_id);
@@ -0,0 +1,27 @@
+CREATE TABLE IF NOT EXISTS changesets_daily (
+	day DATE NOT NULL,
+	hashtags TEXT[] NOT NULL,
+	user_id BIGINT NOT NULL,
+	editor TEXT,
+	feature TEXT NOT NULL,
+	action TEXT NOT NULL,
+	count NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changesets_daily_day_idx ON changesets_daily USING btree (day);
+CREATE INDEX IF NOT EXISTS changesets_daily_hashtags_idx ON changesets_daily USING gin (hashtags);
+CREATE INDEX IF NOT EXISTS changesets_daily_user_id_day_idx ON changesets_daily USING btree (user_id, day);
+
+CREATE TABLE IF NOT EXISTS changesets_daily_users (
+	day DATE NOT NULL,
+	hashtags TEXT[] NOT NULL,
+	user_id BIGINT NOT NULL,
+	editor TEXT,
+	changesets BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changesets_daily_users_day_idx ON changesets_daily_users USING btree (day);
+CREATE INDEX IF NOT EXISTS changesets_daily_users_hashtags_idx ON changesets_daily_users USING gin (hashtags);
+
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+	name TEXT PRIMARY KEY,
+	updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
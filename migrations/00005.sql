@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS validation_change_id_osm_id_idx ON validation USING btree (change_id, osm_id);
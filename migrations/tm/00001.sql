@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS task_history_project_id_action_action_date_idx ON task_history USING btree (project_id, action, action_date);
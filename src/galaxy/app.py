@@ -17,46 +17,106 @@
 # 1100 13th Street NW Suite 800 Washington, D.C. 20005
 # <info@hotosm.org>
 """Main page contains class for database mapathon and funtion for error printing  """
+import asyncio
+import queue
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from contextvars import ContextVar, copy_context
 from csv import DictWriter
+from csv import writer as csv_writer
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from functools import partial
+from itertools import chain
+from uuid import uuid4
 from io import StringIO
+from json import dumps as json_dumps
 from json import loads as json_loads
 
 import pandas
-from geojson import Feature, FeatureCollection, Point
+from geojson import Feature, FeatureCollection
 from psycopg2 import OperationalError, connect, sql
+from psycopg2.extensions import (
+    POLL_OK,
+    POLL_READ,
+    POLL_WRITE,
+    TRANSACTION_STATUS_IDLE,
+)
 from psycopg2.extras import DictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
-from .config import get_db_connection_params
+from .config import get_db_connection_params, get_db_pool_params
+from .metrics import observe_connect, observe_query
+from .slow_queries import log_slow_query
 from .config import logger as logging
+from .config import (
+    csv_chunk_size,
+    over_budget_queries,
+    report_page_size,
+    response_cache_size,
+    response_cache_timestamp_precision,
+    response_cache_watermark_interval,
+    slow_query_slots,
+    slow_query_wait,
+    statement_timeouts,
+    stream_itersize,
+    use_copy_csv_export,
+    use_daily_rollups,
+)
 from .query_builder.builder import (
+    DATA_QUALITY_PAGE_KEY,
+    DATA_QUALITY_USERNAME_PAGE_KEY,
+    MAPATHON_DETAIL_PAGE_KEY,
+    check_daily_rollup_watermark,
     check_last_updated_changesets,
     check_last_updated_validation,
+    create_changeset_query_rollup,
     create_changeset_query_underpass,
+    create_copy_csv_query,
+    create_explain_query,
+    create_statement_timeout_query,
+    create_key_range_query,
+    create_keyset_page_query,
     create_user_tasks_mapped_and_validated_query,
     create_user_time_spent_mapping_and_validating_query,
+    create_user_tm_stats_query,
+    create_users_contributions_query_rollup,
     create_users_contributions_query_underpass,
     create_UserStats_get_statistics_query,
     create_userstats_get_statistics_with_hashtags_query,
+    create_userstats_get_statistics_with_hashtags_rollup_query,
+    decode_page_key,
+    generate_daily_rollup_refresh_queries,
+    generate_daily_rollup_watermarks_query,
     generate_data_quality_hashtag_reports,
+    generate_data_quality_hashtag_reports_csv,
     generate_data_quality_hashtag_reports_summary,
     generate_data_quality_TM_query,
     generate_data_quality_username_query,
     generate_filter_training_query,
     generate_list_teams_metadata,
+    generate_mapathon_summary_rollup_query,
     generate_mapathon_summary_underpass_query,
     generate_organization_hashtag_reports,
     generate_tm_teams_list,
     generate_tm_validators_stats_query,
     generate_training_organisations_query,
     generate_training_query,
+    get_changesets_watermark_query,
+    get_whole_day_window,
+    query_name,
 )
 from .validation.models import (
+    encode_page_token,
     DataQuality_TM_RequestParams,
     DataQuality_username_RequestParams,
     DataQualityHashtagParams,
     DataRecencyParams,
-    List,
     MapathonContributor,
     MapathonDetail,
     MapathonRequestParams,
@@ -112,20 +172,753 @@ def check_for_json(result_str):
         return False, None
 
 
+def stream_csv(rows, fieldnames=None, chunk_size=None):
+    """Yields csv text of dict like rows in chunks of about chunk_size characters,
+    header is taken from the keys of the first row unless fieldnames are given"""
+    chunk_size = chunk_size or csv_chunk_size
+    stream = StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = DictWriter(
+                stream, fieldnames=fieldnames or list(row.keys()), extrasaction="ignore"
+            )
+            writer.writeheader()
+        writer.writerow(row)
+        if stream.tell() >= chunk_size:
+            yield stream.getvalue()
+            stream.seek(0)
+            stream.truncate(0)
+    if stream.tell() > 0:
+        yield stream.getvalue()
+
+
+def copy_csv_to_file(cur, query, filelocation):
+    """Writes the result of query as csv to filelocation with COPY ... TO STDOUT"""
+    with open(filelocation, "wb") as csv_file:
+        cur.copy_expert(create_copy_csv_query(query), csv_file)
+    return "CSV: Generated at : " + str(filelocation)
+
+
+def json_default(value):
+    """Encodes the database values json does not support the way API responses do"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stream_geojson(features, chunk_size=None):
+    """Yields a GeoJSON FeatureCollection of dict features in chunks of about
+    chunk_size characters, features are encoded one at a time as they come"""
+    chunk_size = chunk_size or csv_chunk_size
+    stream = StringIO()
+    stream.write('{"type": "FeatureCollection", "features": [')
+    separator = ""
+    for feature in features:
+        stream.write(separator)
+        stream.write(json_dumps(feature, default=json_default))
+        separator = ", "
+        if stream.tell() >= chunk_size:
+            yield stream.getvalue()
+            stream.seek(0)
+            stream.truncate(0)
+    stream.write("]}")
+    yield stream.getvalue()
+
+
+def point_features(rows, lat_column, lng_column):
+    """Maps rows to GeoJSON point features, every other column is a property"""
+    for row in rows:
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(row[lng_column]), float(row[lat_column])],
+            },
+            "properties": {
+                key: value
+                for key, value in row.items()
+                if key not in (lat_column, lng_column)
+            },
+        }
+
+
+def prefetch_stream(stream):
+    """Runs stream up to its first chunk so that the errors of its query are
+    raised before a response starts, returns an iterator over every chunk"""
+    try:
+        first_chunk = next(stream)
+    except StopIteration:
+        return iter(())
+    return chain((first_chunk,), stream)
+
+
+def stream_text(text, chunk_size=None):
+    """Yields text in chunks of chunk_size characters"""
+    chunk_size = chunk_size or csv_chunk_size
+    for start in range(0, len(text), chunk_size):
+        yield text[start : start + chunk_size]
+
+
+class BaseConnectionPool:
+    """Keeps size and wait time figures shared by the sync and asyncio connection pools"""
+
+    def __init__(self, minconn, maxconn, timeout, name=None):
+        self.name = name
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.borrowed = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_borrow(self, wait_time):
+        """Counts a borrowed connection and the time spent waiting for it"""
+        with self._lock:
+            self.in_use += 1
+            self.borrowed += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def record_return(self):
+        """Counts a returned connection"""
+        with self._lock:
+            self.in_use -= 1
+
+    def idle_count(self):
+        """Number of open connections waiting to be borrowed"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Returns size and wait time figures of the pool"""
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "idle": self.idle_count(),
+                "borrowed": self.borrowed,
+                "total_wait_time": round(self.total_wait_time, 4),
+                "avg_wait_time": round(self.total_wait_time / self.borrowed, 4)
+                if self.borrowed
+                else 0.0,
+                "max_wait_time": round(self.max_wait_time, 4),
+            }
+
+
+class ConnectionPool(BaseConnectionPool):
+    """Process wide pool of psycopg2 connections for one database section.
+
+    Wraps psycopg2's ThreadedConnectionPool so that a caller waits up to
+    ``timeout`` seconds for a connection to be returned instead of failing as
+    soon as all ``maxconn`` connections are borrowed.
+    """
+
+    def __init__(self, db_params, minconn=5, maxconn=10, timeout=30, name=None):
+        super().__init__(minconn, maxconn, timeout, name)
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **db_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self):
+        """Borrows a connection, waiting for a free one if the pool is exhausted"""
+        start_time = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(
+                f"No database connection available after {self.timeout} sec"
+            )
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        self.record_borrow(time.monotonic() - start_time)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Returns a borrowed connection, open transactions are rolled back by psycopg2"""
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self.record_return()
+            self._slots.release()
+
+    def idle_count(self):
+        """Number of open connections waiting to be borrowed"""
+        return len(self._pool._pool)
+
+    def closeall(self):
+        """Closes every connection of the pool"""
+        self._pool.closeall()
+
+
+async def wait_async_connection(conn):
+    """Waits until an asynchronous psycopg2 connection has finished its current operation without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == POLL_OK:
+            return
+        ready = loop.create_future()
+        fileno = conn.fileno()
+        if state == POLL_READ:
+            loop.add_reader(fileno, ready.set_result, None)
+            remove = loop.remove_reader
+        elif state == POLL_WRITE:
+            loop.add_writer(fileno, ready.set_result, None)
+            remove = loop.remove_writer
+        else:
+            raise OperationalError(f"Unexpected poll state {state}")
+        try:
+            await ready
+        finally:
+            remove(fileno)
+
+
+class AsyncConnectionPool(BaseConnectionPool):
+    """Asyncio counterpart of ConnectionPool holding psycopg2 asynchronous connections.
+
+    Connections are opened on demand, at most ``minconn`` of them are kept open
+    once returned, same as psycopg2's pools.
+    """
+
+    def __init__(self, db_params, minconn=5, maxconn=10, timeout=30, name=None):
+        super().__init__(minconn, maxconn, timeout, name)
+        self.db_params = db_params
+        self._idle = []
+        self._slots = asyncio.Semaphore(maxconn)
+
+    async def getconn(self):
+        """Borrows a connection, waiting for a free one if the pool is exhausted"""
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolError(
+                f"No database connection available after {self.timeout} sec"
+            )
+        try:
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = connect(**self.db_params, async_=True)
+                await wait_async_connection(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.record_borrow(time.monotonic() - start_time)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Returns a borrowed connection, it is closed if a query is still running on it"""
+        try:
+            if (
+                close
+                or conn.closed
+                or conn.info.transaction_status != TRANSACTION_STATUS_IDLE
+                or len(self._idle) >= self.minconn
+            ):
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+        finally:
+            self.record_return()
+            self._slots.release()
+
+    def idle_count(self):
+        """Number of open connections waiting to be borrowed"""
+        return len(self._idle)
+
+    def closeall(self):
+        """Closes every idle connection of the pool"""
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+_connection_pools = {}
+_async_connection_pools = {}
+_db_executors = {}
+_connection_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_identifier):
+    """Returns the process wide connection pool of a database section ( UNDERPASS, TM ), creates it on first use"""
+    with _connection_pools_lock:
+        pool = _connection_pools.get(db_identifier)
+        if pool is None:
+            pool = ConnectionPool(
+                get_db_connection_params(db_identifier),
+                **get_db_pool_params(db_identifier),
+                name=db_identifier,
+            )
+            _connection_pools[db_identifier] = pool
+        return pool
+
+
+def get_async_connection_pool(db_identifier):
+    """Returns the asyncio connection pool of a database section, creates it on first use inside the running event loop"""
+    with _connection_pools_lock:
+        pool = _async_connection_pools.get(db_identifier)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                get_db_connection_params(db_identifier),
+                **get_db_pool_params(db_identifier),
+                name=db_identifier,
+            )
+            _async_connection_pools[db_identifier] = pool
+        return pool
+
+
+def get_connection_pool_stats():
+    """Returns stats of every connection pool created so far"""
+    with _connection_pools_lock:
+        stats = {name: pool.stats() for name, pool in _connection_pools.items()}
+        stats.update(
+            {
+                f"{name}_ASYNC": pool.stats()
+                for name, pool in _async_connection_pools.items()
+            }
+        )
+        return stats
+
+
+def get_db_executor(db_identifier):
+    """Returns the thread pool that runs blocking queries of a database section.
+
+    It has as many workers as the section's connection pool has connections,
+    so blocking reports are limited by the database pool rather than by the
+    event loop's default executor.
+    """
+    with _connection_pools_lock:
+        executor = _db_executors.get(db_identifier)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=get_db_pool_params(db_identifier)["maxconn"],
+                thread_name_prefix=f"galaxy-{db_identifier.lower()}",
+            )
+            _db_executors[db_identifier] = executor
+        return executor
+
+
+async def run_in_db_executor(db_identifier, func, *args, **kwargs):
+    """Runs a blocking function on the database section's executor and awaits its result"""
+    loop = asyncio.get_running_loop()
+    # the request's queries are looked up from the worker thread
+    context = copy_context()
+    return await loop.run_in_executor(
+        get_db_executor(db_identifier), partial(context.run, func, *args, **kwargs)
+    )
+
+
+def close_connection_pools():
+    """Closes all connection pools and database executors, called on API shutdown"""
+    with _connection_pools_lock:
+        executors = list(_db_executors.values())
+        pools = [*_connection_pools.values(), *_async_connection_pools.values()]
+        _db_executors.clear()
+        _connection_pools.clear()
+        _async_connection_pools.clear()
+    # running reports still borrow connections, let them finish first
+    for executor in executors:
+        executor.shutdown(wait=True)
+    for pool in pools:
+        pool.closeall()
+    logging.debug("Database connection pools closed")
+
+
+# over budget queries of every request run on one of these slots when
+# over_budget_queries is queue
+_slow_query_slots = threading.BoundedSemaphore(slow_query_slots)
+
+
+class RequestQueries:
+    """Database connections borrowed while an API request is served along with
+    the statement timeout and query budget of its endpoint, queries running on
+    them are cancelled when the client disconnects"""
+
+    def __init__(self, statement_timeout=None, query_budget=(None, None), request=None):
+        self.statement_timeout = statement_timeout
+        self.query_budget = query_budget
+        # method, path and body of the request, for the slow query log
+        self.request = request
+        self.cancelled = False
+        self.slow_query_slot = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def add(self, conn):
+        """Called once conn is borrowed for the request"""
+        with self._lock:
+            self._connections.add(conn)
+
+    def discard(self, conn):
+        """Called before conn goes back to its pool, so that it is never
+        cancelled on behalf of another request"""
+        with self._lock:
+            self._connections.discard(conn)
+
+    def cancel(self):
+        """Asks postgres to cancel the queries running on the request's
+        connections, same as pg_cancel_backend"""
+        with self._lock:
+            self.cancelled = True
+            for conn in self._connections:
+                try:
+                    conn.cancel()
+                except Exception as ex:
+                    logging.error(ex)
+            if self._connections:
+                logging.info(
+                    "Client disconnected, %s running queries cancelled",
+                    len(self._connections),
+                )
+
+    def acquire_slow_query_slot(self):
+        """Waits for one of the slots over budget queries run on, a request
+        keeps it until it is released whatever its number of such queries"""
+        with self._lock:
+            if self.slow_query_slot:
+                return
+        if not _slow_query_slots.acquire(timeout=slow_query_wait):
+            raise PoolError(
+                f"No slot for expensive reports available after {slow_query_wait} sec"
+            )
+        with self._lock:
+            self.slow_query_slot = True
+
+    def release(self):
+        """Called once the request has been served"""
+        with self._lock:
+            if self.slow_query_slot:
+                self.slow_query_slot = False
+                _slow_query_slots.release()
+
+
+# set by the API for the request being served, None otherwise
+request_queries = ContextVar("request_queries", default=None)
+
+
+def record_query(database, query, name, start_time, rows=None, error=None):
+    """Records a query of database that started at start_time, a
+    time.monotonic() value, in the query metrics and the slow query log, error
+    is the exception the query failed with"""
+    duration = time.monotonic() - start_time
+    observe_query(name, database.name, duration, rows)
+    queries = request_queries.get()
+    log_slow_query(
+        query,
+        name,
+        database.name,
+        database.db_params,
+        duration,
+        rows,
+        queries.request if queries is not None else None,
+        error,
+    )
+
+
+def get_request_statement_timeout():
+    """Returns the statement timeout of the request being served, None outside
+    of requests or when its endpoint has none"""
+    queries = request_queries.get()
+    return queries.statement_timeout if queries is not None else None
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when the planner estimates a report query costs more than its
+    endpoint allows"""
+
+
+def plan_estimates(plan):
+    """Returns the total cost of an EXPLAIN (FORMAT JSON) plan and the rows its
+    scans are estimated to read"""
+    root = plan[0]["Plan"]
+    scanned_rows = 0
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"].endswith("Scan"):
+            scanned_rows += node["Plan Rows"]
+        nodes.extend(node.get("Plans", []))
+    return root["Total Cost"], scanned_rows
+
+
+def query_budget_excess(plan, query_budget):
+    """Returns why the plan of a query goes over query_budget, a tuple of the
+    largest cost and rows scanned, None when it does not"""
+    max_cost, max_rows = query_budget
+    cost, scanned_rows = plan_estimates(plan)
+    if max_rows is not None and scanned_rows > max_rows:
+        return (
+            f"The report is estimated to scan about {int(scanned_rows):,} rows, "
+            f"more than the {int(max_rows):,} allowed"
+        )
+    if max_cost is not None and cost > max_cost:
+        return (
+            f"The report is estimated to cost {int(cost):,}, "
+            f"more than the {int(max_cost):,} allowed"
+        )
+    return None
+
+
+def get_request_query_budget():
+    """Returns the query budget of the request being served, None outside of
+    requests or when its endpoint has none"""
+    queries = request_queries.get()
+    if queries is None or queries.query_budget == (None, None):
+        return None
+    return queries.query_budget
+
+
+def over_query_budget(plan):
+    """Rejects a query whose plan goes over the budget of the request being
+    served, returns whether it has to run on a slow query slot instead"""
+    excess = query_budget_excess(plan, request_queries.get().query_budget)
+    if excess is None:
+        return False
+    logging.info(excess)
+    if over_budget_queries == "queue":
+        return True
+    raise QueryBudgetExceeded(
+        f"{excess}, narrow down the time range, the hashtags or the projects"
+    )
+
+
+def check_query_budget(database, query):
+    """Pre-flight of a report query, its plan is estimated with EXPLAIN and
+    compared to the query budget of the endpoint being served"""
+    if get_request_query_budget() is None:
+        return
+    plan = database.executequery(create_explain_query(query))[0][0]
+    if over_query_budget(plan):
+        request_queries.get().acquire_slow_query_slot()
+
+
+async def check_query_budget_async(database, query):
+    """Asyncio counterpart of check_query_budget"""
+    if get_request_query_budget() is None:
+        return
+    plan = (await database.executequery(create_explain_query(query)))[0][0]
+    if over_query_budget(plan):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, request_queries.get().acquire_slow_query_slot)
+
+
+class ResponseCache:
+    """Least recently used cache of reports keyed by their canonical request
+    parameters. Every entry is dropped once the changesets watermark moves,
+    the watermark is read again at most every watermark_interval seconds"""
+
+    def __init__(self, maxsize=256, timestamp_precision=1, watermark_interval=10):
+        self.maxsize = maxsize
+        self.timestamp_precision = timedelta(seconds=max(timestamp_precision, 1))
+        self.watermark_interval = watermark_interval
+        self.watermark = None
+        self.watermark_checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def canonical_value(self, value):
+        """Returns value in a json serializable form where equivalent request
+        parameters are equal, list items are sorted and deduplicated and
+        timestamps are floored to timestamp_precision in UTC"""
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return (value - (value - datetime.min) % self.timestamp_precision).isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, (list, tuple, set)) and all(
+            isinstance(v, (str, int)) for v in value
+        ):
+            return sorted(set(value), key=lambda v: (str(type(v)), v))
+        return value
+
+    def key(self, name, params):
+        """Returns the cache key of report name for the pydantic params"""
+        canonical_params = {
+            field: self.canonical_value(value) for field, value in params.dict().items()
+        }
+        return f"{name}:{json_dumps(canonical_params, sort_keys=True, default=str)}"
+
+    def __contains__(self, key):
+        """Whether key is cached, without counting a hit or a miss"""
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """Returns whether key is cached and its report"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, report, watermark):
+        """Caches a report computed at watermark, unless it moved meanwhile"""
+        with self._lock:
+            if watermark != self.watermark:
+                return
+            self._entries[key] = report
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def watermark_expired(self):
+        """Returns whether the watermark has to be read again"""
+        return (
+            self.watermark_checked_at is None
+            or time.monotonic() - self.watermark_checked_at >= self.watermark_interval
+        )
+
+    def update_watermark(self, watermark):
+        """Records the changesets watermark, cached reports are dropped when it moved"""
+        with self._lock:
+            self.watermark_checked_at = time.monotonic()
+            if watermark != self.watermark:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.watermark = watermark
+
+    def stats(self):
+        """Returns size and hit/miss counters of the cache"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "invalidations": self.invalidations,
+                "watermark": str(self.watermark) if self.watermark else None,
+            }
+
+
+response_cache = ResponseCache(
+    response_cache_size,
+    response_cache_timestamp_precision,
+    response_cache_watermark_interval,
+)
+
+
+def cached_report(name, params, database, func, *args):
+    """Returns report name for params from the response cache, func(*args)
+    computes it on a miss. database reads the changesets watermark"""
+    if response_cache.maxsize <= 0:
+        return func(*args)
+    if response_cache.watermark_expired():
+        result = database.executequery(get_changesets_watermark_query())
+        response_cache.update_watermark(result[0]["updated_at"])
+    key = response_cache.key(name, params)
+    hit, report = response_cache.get(key)
+    if hit:
+        return report
+    watermark = response_cache.watermark
+    report = func(*args)
+    response_cache.set(key, report, watermark)
+    return report
+
+
+async def cached_report_async(name, params, func, *args):
+    """Asyncio counterpart of cached_report, the watermark is read on a pooled
+    asyncio connection and func(*args) is awaited on a miss"""
+    if response_cache.maxsize <= 0:
+        return await func(*args)
+    if response_cache.watermark_expired():
+        result = await execute_async_query(
+            "UNDERPASS", get_changesets_watermark_query()
+        )
+        response_cache.update_watermark(result[0]["updated_at"])
+    key = response_cache.key(name, params)
+    hit, report = response_cache.get(key)
+    if hit:
+        return report
+    watermark = response_cache.watermark
+    report = await func(*args)
+    response_cache.set(key, report, watermark)
+    return report
+
+
+class CopyInterrupted(Exception):
+    """Raised on the thread running a COPY once the stream it feeds has been closed"""
+
+
+class QueueWriter:
+    """File like object COPY writes to, the data is put on queue in chunks of about chunk_size bytes until stopped is set"""
+
+    def __init__(self, chunks, stopped, chunk_size):
+        self.chunks = chunks
+        self.stopped = stopped
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.size = 0
+
+    def put(self, item):
+        """Puts item on the queue, raises CopyInterrupted once stopped is set"""
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise CopyInterrupted()
+
+    def write(self, data):
+        """Buffers the data COPY writes, a chunk is put once chunk_size is reached"""
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Puts the buffered data as a chunk"""
+        if self.buffer:
+            self.put(b"".join(self.buffer))
+            self.buffer, self.size = [], 0
+
+
 class Database:
     """Database class is used to connect with your database , run query  and get result from it . It has all tests and validation inside class"""
 
-    def __init__(self, db_params):
-        """Database class constructor"""
+    def __init__(self, db_params, pool=None):
+        """Database class constructor, connections are borrowed from pool when it is supplied"""
 
         self.db_params = db_params
+        self.pool = pool
+        # database label of the query metrics
+        self.name = getattr(pool, "name", None) or db_params.get("database", "other")
+        self.conn = None
+        self.cur = None
+        self.queries = None
 
     def connect(self):
         """Database class instance method used to connect to database parameters with error printing"""
 
         try:
-            self.conn = connect(**self.db_params)
+            start_time = time.monotonic()
+            if self.pool is not None:
+                self.conn = self.pool.getconn()
+            else:
+                self.conn = connect(**self.db_params)
+            observe_connect(self.name, start_time)
             self.cur = self.conn.cursor(cursor_factory=DictCursor)
+            self.queries = request_queries.get()
+            if self.queries is not None:
+                self.queries.add(self.conn)
             logging.debug("Database connection has been Successful...")
             return self.conn, self.cur
         except OperationalError as err:
@@ -144,17 +937,25 @@ class Database:
                 if query is not None:
                     # catch exception for invalid SQL statement
 
+                    logging.debug("Query sent to Database")
+                    start_time = time.monotonic()
                     try:
-                        logging.debug("Query sent to Database")
+                        self.set_statement_timeout(self.cursor)
                         self.cursor.execute(query)
                         try:
                             result = self.cursor.fetchall()
                             logging.debug("Result fetched from Database")
+                            record_query(
+                                self, query, query_name(query), start_time, len(result)
+                            )
                             return result
                         except Exception as ex:
                             logging.error(ex)
+                            record_query(self, query, query_name(query), start_time)
                             return self.cursor.statusmessage
                     except Exception as err:
+                        # failed and cancelled queries are timed too
+                        record_query(self, query, query_name(query), start_time, error=err)
                         print_psycopg2_exception(err)
                 else:
                     raise ValueError("Query is Null")
@@ -170,6 +971,107 @@ class Database:
             print("Oops ! You forget to have connection first")
             raise err
 
+    def set_statement_timeout(self, cursor):
+        """Limits the queries of the current transaction to the statement
+        timeout of the request being served"""
+        statement_timeout = get_request_statement_timeout()
+        if statement_timeout is not None:
+            cursor.execute(create_statement_timeout_query(statement_timeout, local=True))
+
+    def executequery_stream(self, query, itersize=None):
+        """Executes query on a named server side cursor and lazily yields its rows, fetching itersize rows per round trip"""
+        if self.conn is None:
+            raise ValueError("Database is not connected")
+        if query is None:
+            raise ValueError("Query is Null")
+        name = query_name(query)
+        if isinstance(query, bytes):
+            query = query.decode()
+        conn = self.conn
+        # named cursors are declared as DECLARE ... CURSOR FOR query
+        cursor = conn.cursor(name=f"galaxy_{uuid4().hex}", cursor_factory=DictCursor)
+        cursor.itersize = itersize or stream_itersize
+        start_time = time.monotonic()
+        rows = 0
+        try:
+            try:
+                logging.debug("Query sent to Database as server side cursor")
+                self.set_statement_timeout(self.cur)
+                cursor.execute(query.strip().rstrip(";"))
+            except Exception as err:
+                print_psycopg2_exception(err)
+            for row in cursor:
+                rows += 1
+                yield row
+        finally:
+            record_query(self, query, name, start_time, rows)
+            if not conn.closed:
+                cursor.close()
+
+    def copy_csv_stream(self, query, chunk_size=None):
+        """Streams the result of query as csv with a header line in chunks of about chunk_size bytes, postgres writes the csv itself with COPY ... TO STDOUT and rows are never turned into python objects, closing the stream early cancels the COPY"""
+        if self.conn is None:
+            raise ValueError("Database is not connected")
+        if query is None:
+            raise ValueError("Query is Null")
+        name = query_name(query)
+        if isinstance(query, bytes):
+            query = query.decode()
+        chunk_size = chunk_size or csv_chunk_size
+        conn = self.conn
+        statement_timeout = get_request_statement_timeout()
+        # copy_expert only returns once the whole result has been written, it
+        # runs on its own thread and hands the chunks over through a short queue
+        chunks = queue.Queue(maxsize=2)
+        stopped = threading.Event()
+
+        def copy():
+            writer = QueueWriter(chunks, stopped, chunk_size)
+            try:
+                with conn.cursor() as cursor:
+                    if statement_timeout is not None:
+                        cursor.execute(
+                            create_statement_timeout_query(statement_timeout, local=True)
+                        )
+                    logging.debug("Query sent to Database as COPY TO STDOUT")
+                    cursor.copy_expert(create_copy_csv_query(query), writer)
+                writer.flush()
+                writer.put(None)
+            except CopyInterrupted:
+                pass
+            except Exception as err:
+                try:
+                    writer.put(err)
+                except CopyInterrupted:
+                    pass
+
+        copy_thread = threading.Thread(target=copy, daemon=True)
+        start_time = time.monotonic()
+        copy_thread.start()
+        copied = False
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    copied = True
+                    break
+                if isinstance(chunk, Exception):
+                    copied = True
+                    raise chunk
+                yield chunk
+        finally:
+            stopped.set()
+            if not copied:
+                # the stream was closed early, the COPY would otherwise run to
+                # its end on the server before the thread can be joined
+                conn.cancel()
+            copy_thread.join()
+            # rows are written by postgres, they are not counted
+            record_query(self, query, name, start_time)
+            if not conn.closed:
+                # an interrupted COPY leaves the transaction aborted
+                conn.rollback()
+
     def close_conn(self):
         """function for clossing connection to avoid memory leaks"""
 
@@ -178,27 +1080,216 @@ class Database:
             if self.conn is not None:
                 if self.cur is not None:
                     self.cur.close()
+                if self.queries is not None:
+                    self.queries.discard(self.conn)
+                if self.pool is not None:
+                    self.pool.putconn(self.conn)
+                    logging.debug("Database Connection returned to pool")
+                else:
                     self.conn.close()
                     logging.debug("Database Connection closed")
+                self.conn, self.cur = None, None
         except Exception as err:
             raise err
 
 
+def extract_project_ids(params):
+    """Returns tasking manager project ids of the request, including the ones given as hotosm-project-* hashtags"""
+    test_hashtag = "hotosm-project-"
+    ids = []
+
+    if len(params.project_ids) > 0:
+        ids.extend(params.project_ids)
+
+    if len(params.hashtags) > 0:
+        for hashtag in params.hashtags:
+            if test_hashtag in hashtag:
+                if len(hashtag[15:]) > 0:
+                    ids.append(hashtag[15:])
+    return ids
+
+
+class AsyncDatabase:
+    """Asyncio counterpart of Database, queries are sent on psycopg2 asynchronous connections so the event loop keeps serving other requests while they run"""
+
+    def __init__(self, db_params, pool=None):
+        """AsyncDatabase class constructor, connections are borrowed from pool when it is supplied"""
+
+        self.db_params = db_params
+        self.pool = pool
+        # database label of the query metrics
+        self.name = getattr(pool, "name", None) or db_params.get("database", "other")
+        self.conn = None
+        self.cur = None
+        self.queries = None
+
+    async def connect(self):
+        """Connects to the database with error printing"""
+
+        try:
+            start_time = time.monotonic()
+            if self.pool is not None:
+                self.conn = await self.pool.getconn()
+            else:
+                self.conn = connect(**self.db_params, async_=True)
+                await wait_async_connection(self.conn)
+            observe_connect(self.name, start_time)
+            self.cur = self.conn.cursor(cursor_factory=DictCursor)
+            self.queries = request_queries.get()
+            if self.queries is not None:
+                self.queries.add(self.conn)
+            logging.debug("Async database connection has been Successful...")
+            return self.conn, self.cur
+        except OperationalError as err:
+            print_psycopg2_exception(err)
+
+    async def executequery(self, query):
+        """Function to execute query after connection"""
+        if self.conn is None:
+            raise ValueError("Database is not connected")
+        if query is None:
+            raise ValueError("Query is Null")
+        name = query_name(query)
+        report_query = query
+        if statement_timeouts:
+            # asynchronous connections are in autocommit mode, the timeout is
+            # set for the session on every query so that pooled connections
+            # never keep the one of a former request
+            if isinstance(query, bytes):
+                query = query.decode()
+            statement_timeout = get_request_statement_timeout()
+            query = f"{create_statement_timeout_query(statement_timeout)}; {query}"
+        logging.debug("Query sent to Database")
+        start_time = time.monotonic()
+        try:
+            self.cur.execute(query)
+            await wait_async_connection(self.conn)
+        except Exception as err:
+            record_query(self, report_query, name, start_time, error=err)
+            print_psycopg2_exception(err)
+        if self.cur.description is None:
+            record_query(self, report_query, name, start_time)
+            return self.cur.statusmessage
+        result = self.cur.fetchall()
+        logging.debug("Result fetched from Database")
+        record_query(self, report_query, name, start_time, len(result))
+        return result
+
+    def close_conn(self):
+        """Returns the connection to the pool or closes it"""
+        if self.conn is not None:
+            if self.cur is not None:
+                self.cur.close()
+            if self.queries is not None:
+                self.queries.discard(self.conn)
+            if self.pool is not None:
+                self.pool.putconn(self.conn)
+            else:
+                self.conn.close()
+            self.conn, self.cur = None, None
+
+
+def get_daily_rollup_window(database, from_timestamp, to_timestamp):
+    """Returns the first and last day the daily rollups can answer a request
+    with, None when they are disabled, the window does not align to whole days
+    or the rollups were not refreshed past its end"""
+    window = get_whole_day_window(from_timestamp, to_timestamp)
+    if not use_daily_rollups or window is None:
+        return None
+    result = database.executequery(
+        check_daily_rollup_watermark(database.cur, to_timestamp)
+    )
+    if not result or not result[0]["fresh"]:
+        return None
+    return window
+
+
+async def get_daily_rollup_window_async(database, from_timestamp, to_timestamp):
+    """Asyncio counterpart of get_daily_rollup_window"""
+    window = get_whole_day_window(from_timestamp, to_timestamp)
+    if not use_daily_rollups or window is None:
+        return None
+    result = await database.executequery(
+        check_daily_rollup_watermark(database.cur, to_timestamp)
+    )
+    if not result or not result[0]["fresh"]:
+        return None
+    return window
+
+
+def get_page_size(params):
+    """Returns the rows per page of a paginated report, None when params do not ask for pages"""
+    if params.page_size is None and params.page_token is None:
+        return None
+    return min(params.page_size or report_page_size, report_page_size)
+
+
+def split_page(rows, key_columns, page_size):
+    """Returns the rows of a page fetched with create_keyset_page_query along
+    with the token of the next page, None on the last page"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_page_token([rows[-1][column] for column in key_columns])
+
+
+def fetch_report_page(database, query, key_columns, params):
+    """Runs the page of query params ask for, with keyset pagination on
+    key_columns, returns its rows and the token of the next page or None, None
+    when params do not ask for pages"""
+    page_size = get_page_size(params)
+    if page_size is None:
+        return None, None
+    after = decode_page_key(params.page_token, key_columns)
+    page_query = create_keyset_page_query(
+        query, key_columns, after, page_size, database.cur
+    )
+    return split_page(database.executequery(page_query), key_columns, page_size)
+
+
+async def fetch_report_page_async(database, query, key_columns, params):
+    """Asyncio counterpart of fetch_report_page"""
+    page_size = get_page_size(params)
+    if page_size is None:
+        return None, None
+    after = decode_page_key(params.page_token, key_columns)
+    page_query = create_keyset_page_query(
+        query, key_columns, after, page_size, database.cur
+    )
+    return split_page(await database.executequery(page_query), key_columns, page_size)
+
+
 class Underpass:
     """This class connects to underpass database and responsible for all the underpass related functionality"""
 
     def __init__(self, parameters=None):
-        self.database = Database(get_db_connection_params("UNDERPASS"))
+        self.database = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
         # self.database = Database(dict(config.items("UNDERPASS")))
         self.con, self.cur = self.database.connect()
         self.params = parameters
 
+    def close(self):
+        """Returns the underpass connection to the pool"""
+        self.database.close_conn()
+
+    def get_mapathon_summary_queries(self):
+        """Returns summary and contributors queries of the mapathon summary report"""
+        window = get_daily_rollup_window(
+            self.database, self.params.from_timestamp, self.params.to_timestamp
+        )
+        if window is not None:
+            return generate_mapathon_summary_rollup_query(self.params, self.cur, *window)
+        return generate_mapathon_summary_underpass_query(self.params, self.cur)
+
     def get_mapathon_summary_result(self):
         """Get summary result"""
         (
             osm_history_query,
             total_contributor_query,
-        ) = generate_mapathon_summary_underpass_query(self.params, self.cur)
+        ) = self.get_mapathon_summary_queries()
+        check_query_budget(self.database, osm_history_query)
         # print(osm_history_query)
         osm_history_result = self.database.executequery(osm_history_query)
         total_contributors_result = self.database.executequery(total_contributor_query)
@@ -236,18 +1327,66 @@ class Underpass:
 
         return user_role
 
-    def get_mapathon_detailed_result(self):
-        """Functions that returns detailed reports  for mapathon results_dicts"""
-        changeset_query, _, _ = create_changeset_query_underpass(
-            self.params, self.con, self.cur
+    def get_mapathon_detailed_queries(self):
+        """Returns changeset and contributors queries of the mapathon detailed report"""
+        window = get_daily_rollup_window(
+            self.database, self.params.from_timestamp, self.params.to_timestamp
         )
+        return Underpass.mapathon_detailed_queries(
+            self.params, self.con, self.cur, window
+        )
+
+    @staticmethod
+    def mapathon_detailed_queries(params, con, cur, window=None):
+        """Builds changeset and contributors queries of the mapathon detailed
+        report, from the daily rollups when a window of days is given"""
+        if window is not None:
+            changeset_query = create_changeset_query_rollup(params, cur, *window)
+            contributors_query = create_users_contributions_query_rollup(
+                params, cur, *window
+            )
+            return changeset_query, contributors_query
+        changeset_query, _, _ = create_changeset_query_underpass(params, con, cur)
         contributors_query = create_users_contributions_query_underpass(
-            self.params, self.con, self.cur
+            params, con, cur
         )
+        return changeset_query, contributors_query
+
+    def get_mapathon_detailed_result(self):
+        """Functions that returns detailed reports  for mapathon results_dicts"""
+        changeset_query, contributors_query = self.get_mapathon_detailed_queries()
+        check_query_budget(self.database, changeset_query)
         changesets = self.database.executequery(changeset_query)
         contributors = self.database.executequery(contributors_query)
         return changesets, contributors
 
+    def get_mapathon_detailed_page(self):
+        """Returns the changesets and contributors of the page of contributors
+        the parameters ask for, along with the token of the next page"""
+        changeset_query, contributors_query = self.get_mapathon_detailed_queries()
+        check_query_budget(self.database, contributors_query)
+        contributors, next_page_token = fetch_report_page(
+            self.database, contributors_query, MAPATHON_DETAIL_PAGE_KEY, self.params
+        )
+        changesets = []
+        if contributors:
+            changesets = self.database.executequery(
+                Underpass.mapathon_page_changesets_query(changeset_query, contributors, self.cur)
+            )
+        return changesets, contributors, next_page_token
+
+    @staticmethod
+    def mapathon_page_changesets_query(changeset_query, contributors, cur):
+        """Restricts changeset_query to the users of a page of contributors"""
+        (key_column,) = MAPATHON_DETAIL_PAGE_KEY
+        return create_key_range_query(
+            changeset_query,
+            key_column,
+            contributors[0][key_column],
+            contributors[-1][key_column],
+            cur,
+        )
+
     def get_osm_last_updated(self):
         """OSM synchronisation"""
         status_query = check_last_updated_changesets()
@@ -273,28 +1412,123 @@ class Underpass:
         return result[0][0]
 
 
+async def execute_async_query(db_identifier, query):
+    """Runs a query on its own connection borrowed from the asyncio pool of a database section, so that several of them can be awaited together"""
+    database = AsyncDatabase(
+        get_db_connection_params(db_identifier),
+        get_async_connection_pool(db_identifier),
+    )
+    await database.connect()
+    try:
+        return await database.executequery(query)
+    finally:
+        database.close_conn()
+
+
+class AsyncUnderpass:
+    """Asyncio counterpart of Underpass, borrows its connection for the duration of an ``async with`` block"""
+
+    def __init__(self, parameters=None):
+        self.database = AsyncDatabase(
+            get_db_connection_params("UNDERPASS"),
+            get_async_connection_pool("UNDERPASS"),
+        )
+        self.params = parameters
+
+    async def __aenter__(self):
+        self.con, self.cur = await self.database.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Returns the underpass connection to the pool"""
+        self.database.close_conn()
+
+    async def get_mapathon_summary_queries(self):
+        """Returns summary and contributors queries of the mapathon summary report"""
+        window = await get_daily_rollup_window_async(
+            self.database, self.params.from_timestamp, self.params.to_timestamp
+        )
+        if window is not None:
+            return generate_mapathon_summary_rollup_query(self.params, self.cur, *window)
+        return generate_mapathon_summary_underpass_query(self.params, self.cur)
+
+    async def get_mapathon_summary_result(self):
+        """Get summary result"""
+        (
+            osm_history_query,
+            total_contributor_query,
+        ) = await self.get_mapathon_summary_queries()
+        await check_query_budget_async(self.database, osm_history_query)
+        osm_history_result = await self.database.executequery(osm_history_query)
+        total_contributors_result = await self.database.executequery(
+            total_contributor_query
+        )
+        return osm_history_result, total_contributors_result
+
+    async def get_mapathon_detailed_queries(self):
+        """Returns changeset and contributors queries of the mapathon detailed report"""
+        window = await get_daily_rollup_window_async(
+            self.database, self.params.from_timestamp, self.params.to_timestamp
+        )
+        return Underpass.mapathon_detailed_queries(
+            self.params, self.con, self.cur, window
+        )
+
+    async def get_mapathon_detailed_result(self):
+        """Functions that returns detailed reports  for mapathon results_dicts"""
+        changeset_query, contributors_query = await self.get_mapathon_detailed_queries()
+        await check_query_budget_async(self.database, changeset_query)
+        changesets = await self.database.executequery(changeset_query)
+        contributors = await self.database.executequery(contributors_query)
+        return changesets, contributors
+
+    async def get_mapathon_detailed_page(self):
+        """Asyncio counterpart of Underpass.get_mapathon_detailed_page"""
+        changeset_query, contributors_query = await self.get_mapathon_detailed_queries()
+        await check_query_budget_async(self.database, contributors_query)
+        contributors, next_page_token = await fetch_report_page_async(
+            self.database, contributors_query, MAPATHON_DETAIL_PAGE_KEY, self.params
+        )
+        changesets = []
+        if contributors:
+            changesets = await self.database.executequery(
+                Underpass.mapathon_page_changesets_query(changeset_query, contributors, self.cur)
+            )
+        return changesets, contributors, next_page_token
+
+
 class TaskingManager:
     """This class connects to the Tasking Manager database and is responsible for all the TM related functionality."""
 
+    # index and column levels of the validators statistics pivot
+    VALIDATORS_STATS_INDEX = ["username", "user_id", "mapping_level"]
+    VALIDATORS_STATS_COLUMNS = [
+        "project_id",
+        "country",
+        "organisation_name",
+        "project_status",
+        "total_tasks",
+        "tasks_mapped",
+        "tasks_validated",
+    ]
+
     def __init__(self, parameters=None):
-        self.database = Database(get_db_connection_params("TM"))
+        self.database = Database(
+            get_db_connection_params("TM"), get_connection_pool("TM")
+        )
         self.con, self.cur = self.database.connect()
         self.params = parameters
 
+    def close(self):
+        """Returns the tasking manager connection to the pool"""
+        self.database.close_conn()
+
     def extract_project_ids(self):
         """Functions that returns project ids"""
-        test_hashtag = "hotosm-project-"
-        ids = []
-
-        if len(self.params.project_ids) > 0:
-            ids.extend(self.params.project_ids)
-
-        if len(self.params.hashtags) > 0:
-            for hashtag in self.params.hashtags:
-                if test_hashtag in hashtag:
-                    if len(hashtag[15:]) > 0:
-                        ids.append(hashtag[15:])
-        return ids
+        return extract_project_ids(self.params)
 
     def get_tasks_mapped_and_validated_per_user(self):
         """Function reutrns task mapped and validated from TM database"""
@@ -330,65 +1564,165 @@ class TaskingManager:
             return time_spent_mapping_result, time_spent_validating_result
         return [], []
 
+    def get_user_stats(self):
+        """Returns tasks mapped, tasks validated and time spent mapping and
+        validating per user, read from task_history in a single query"""
+        project_ids = self.extract_project_ids()
+        if len(project_ids) > 0:
+            query = create_user_tm_stats_query(
+                project_ids, self.params.from_timestamp, self.params.to_timestamp
+            )
+            return TaskingManager.user_stats(self.database.executequery(query))
+        return [], [], [], []
+
+    @staticmethod
+    def user_stats(results):
+        """Splits the rows of create_user_tm_stats_query into tasks mapped,
+        tasks validated, time spent mapping and time spent validating stats,
+        users only appear in the lists they have activity for, locks without
+        a duration count as 0 seconds"""
+        (
+            tasks_mapped_stats,
+            tasks_validated_stats,
+            time_mapping_stats,
+            time_validating_stats,
+        ) = ([], [], [], [])
+        for r in results:
+            if r["tasks_mapped"] > 0:
+                tasks_mapped_stats.append(
+                    MappedTaskStats.from_row(r)
+                )
+            if r["tasks_validated"] > 0:
+                tasks_validated_stats.append(
+                    ValidatedTaskStats.from_row(r)
+                )
+            if r["mapping_locks"] > 0:
+                time_mapping_stats.append(
+                    TimeSpentMapping.from_row(
+                        {
+                            "user_id": r["user_id"],
+                            "time_spent_mapping": r["time_spent_mapping"].total_seconds()
+                            if r["time_spent_mapping"]
+                            else 0.0,
+                        }
+                    )
+                )
+            if r["validating_locks"] > 0:
+                time_validating_stats.append(
+                    TimeSpentValidating.from_row(
+                        {
+                            "user_id": r["user_id"],
+                            "time_spent_validating": r[
+                                "time_spent_validating"
+                            ].total_seconds()
+                            if r["time_spent_validating"]
+                            else 0.0,
+                        }
+                    )
+                )
+        return (
+            tasks_mapped_stats,
+            tasks_validated_stats,
+            time_mapping_stats,
+            time_validating_stats,
+        )
+
     def get_validators_stats(self):
-        """Generate a list of validators for the TM
+        """Streams the validators statistics as csv, one column per project
+        and one line per validator along with the Total margins, the
+        connection is released once the stream is consumed
 
         Returns:
-            [type]: [description]
+            [generator]: csv chunks, None when no data is found
         """
-        query = generate_tm_validators_stats_query(self.cur, self.params)
-        print(query)
-        result = [dict(r) for r in self.database.executequery(query)]
-        if result:
-            indexes = ["user_id", "username", "mapping_level"]
-            columns = [
-                "project_id",
-                "country",
-                "organisation_name",
-                "project_status",
-                "total_tasks",
-                "tasks_mapped",
-                "tasks_validated",
-            ]
+        try:
+            query = generate_tm_validators_stats_query(self.cur, self.params)
+            check_query_budget(self.database, query)
+            rows = self.database.executequery_stream(query)
+            first_row = next(rows, None)
+        except Exception:
+            self.close()
+            raise
+        # without any cell, the grand total is the only row
+        if first_row is None or first_row["total_column"]:
+            rows.close()
+            self.close()
+            return None
+        return self.stream_validators_stats(chain([first_row], rows))
+
+    def stream_validators_stats(self, rows):
+        """Streams the validators_stats_csv chunks of rows and releases the
+        connection once they are sent or the stream is closed"""
+        try:
+            yield from TaskingManager.validators_stats_csv(rows)
+        finally:
+            self.close()
 
-            df = pandas.DataFrame(result)
-            out = (
-                pandas.pivot_table(
-                    df,
-                    values="cnt",
-                    index=indexes,
-                    columns=columns,
-                    aggfunc="sum",
-                    margins=True,
-                    margins_name="Total",
-                    fill_value=0,
-                )
-                .swaplevel(0, 1)
-                .sort_values(by="username", ascending=True)
-                .reset_index()
-            )
-            print(out)
+    @staticmethod
+    def validators_stats_csv(rows, chunk_size=None):
+        """Lays the rows of generate_tm_validators_stats_query out as csv text
+        chunks, the Total row comes first and gives the project columns, the
+        cells of a validator are then held until its Total"""
+        chunk_size = chunk_size or csv_chunk_size
+        stream = StringIO()
+        writer = csv_writer(stream, lineterminator="\n")
+        rows = iter(rows)
 
-            stream = StringIO()
-            out.to_csv(stream)
+        def column(row):
+            return tuple(row[level] for level in TaskingManager.VALIDATORS_STATS_COLUMNS)
 
-            return iter(stream.getvalue())
-        return None
+        columns, totals, grand_total = {}, [], 0
+        row = next(rows, None)
+        while row is not None and row["total_row"]:
+            if row["total_column"]:
+                grand_total = row["cnt"]
+            else:
+                columns[column(row)] = len(totals)
+                totals.append(row["cnt"])
+            row = next(rows, None)
+
+        # one header line per column level, the first one names the index
+        for level, name in enumerate(TaskingManager.VALIDATORS_STATS_COLUMNS):
+            index = TaskingManager.VALIDATORS_STATS_INDEX if level == 0 else [""] * 3
+            writer.writerow(
+                [
+                    name,
+                    *index,
+                    *(key[level] for key in columns),
+                    "Total" if level == 0 else "",
+                ]
+            )
+        writer.writerow([0, "", "Total", "", *totals, grand_total])
+
+        line, cells = 1, [0] * len(columns)
+        while row is not None:
+            if row["total_column"]:
+                writer.writerow(
+                    [
+                        line,
+                        row["username"],
+                        row["user_id"],
+                        row["mapping_level"],
+                        *cells,
+                        row["cnt"],
+                    ]
+                )
+                line, cells = line + 1, [0] * len(columns)
+                if stream.tell() >= chunk_size:
+                    yield stream.getvalue()
+                    stream.seek(0)
+                    stream.truncate(0)
+            else:
+                cells[columns[column(row)]] = row["cnt"]
+            row = next(rows, None)
+        yield stream.getvalue()
 
     def list_teams(self):
         """Functions    that    returns     teams in tasking manager"""
         query = generate_tm_teams_list()
         results_dicts = [dict(r) for r in self.database.executequery(query)]
 
-        stream = StringIO()
-
-        csv_keys: List[str] = list(results_dicts[0].keys())
-        writer = DictWriter(stream, fieldnames=csv_keys)
-        writer.writeheader()
-
-        [writer.writerow(row) for row in results_dicts]
-
-        return iter(stream.getvalue())
+        return stream_csv(results_dicts)
 
     def list_teams_metadata(self, team_id):
         """Functions   that    returns teams metadata for a given team"""
@@ -400,15 +1734,75 @@ class TaskingManager:
             for r in results_dicts
         ]
 
-        stream = StringIO()
+        return stream_csv(results_dicts)
+
 
-        csv_keys: List[str] = list(results_dicts[0].keys())
-        writer = DictWriter(stream, fieldnames=csv_keys)
-        writer.writeheader()
+class AsyncTaskingManager:
+    """Asyncio counterpart of TaskingManager, borrows its connection for the duration of an ``async with`` block"""
+
+    def __init__(self, parameters=None):
+        self.database = AsyncDatabase(
+            get_db_connection_params("TM"), get_async_connection_pool("TM")
+        )
+        self.params = parameters
+
+    async def __aenter__(self):
+        self.con, self.cur = await self.database.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Returns the tasking manager connection to the pool"""
+        self.database.close_conn()
+
+    async def get_tasks_mapped_and_validated_per_user(self):
+        """Function reutrns task mapped and validated from TM database"""
+        project_ids = extract_project_ids(self.params)
+        if len(project_ids) > 0:
+            (
+                tasks_mapped_query,
+                tasks_validated_query,
+            ) = create_user_tasks_mapped_and_validated_query(
+                project_ids, self.params.from_timestamp, self.params.to_timestamp
+            )
+            tasks_mapped_result = await self.database.executequery(tasks_mapped_query)
+            tasks_validated_result = await self.database.executequery(
+                tasks_validated_query
+            )
+            return tasks_mapped_result, tasks_validated_result
+        return [], []
 
-        [writer.writerow(row) for row in results_dicts]
+    async def get_time_spent_mapping_and_validating_per_user(self):
+        """Functions that returns time spent in the mapping per user."""
+        project_ids = extract_project_ids(self.params)
+        if len(project_ids) > 0:
+            (
+                time_spent_mapping_query,
+                time_spent_validating_query,
+            ) = create_user_time_spent_mapping_and_validating_query(
+                project_ids, self.params.from_timestamp, self.params.to_timestamp
+            )
+            time_spent_mapping_result = await self.database.executequery(
+                time_spent_mapping_query
+            )
+            time_spent_validating_result = await self.database.executequery(
+                time_spent_validating_query
+            )
+            return time_spent_mapping_result, time_spent_validating_result
+        return [], []
 
-        return iter(stream.getvalue())
+    async def get_user_stats(self):
+        """Returns tasks mapped, tasks validated and time spent mapping and
+        validating per user, read from task_history in a single query"""
+        project_ids = extract_project_ids(self.params)
+        if len(project_ids) > 0:
+            query = create_user_tm_stats_query(
+                project_ids, self.params.from_timestamp, self.params.to_timestamp
+            )
+            return TaskingManager.user_stats(await self.database.executequery(query))
+        return [], [], [], []
 
 
 class Mapathon:
@@ -424,83 +1818,199 @@ class Mapathon:
 
         self.database = Underpass(self.params)
 
+    def close(self):
+        """Releases the database connection"""
+        self.database.close()
+
     # Mapathon class instance method
     def get_summary(self):
         """Function to get summary of your mapathon event"""
+        return cached_report(
+            "mapathon_summary", self.params, self.database.database, self._get_summary
+        )
+
+    def _get_summary(self):
         (
             osm_history_result,
             total_contributors,
         ) = self.database.get_mapathon_summary_result()
-        mapped_features = [MappedFeature(**r) for r in osm_history_result]
-        report = MapathonSummary(
-            total_contributors=total_contributors[0].get("contributors_count", "None"),
-            mapped_features=mapped_features,
-        )
-        return report
+        return Mapathon.summary_report(osm_history_result, total_contributors)
 
     def get_detailed_report(self):
         """Function to get detail report of your mapathon event. It includes individual user contribution"""
-        (
+        return cached_report(
+            "mapathon_detail",
+            self.params,
+            self.database.database,
+            self._get_detailed_report,
+        )
+
+    def _get_detailed_report(self):
+        next_page_token = None
+        if get_page_size(self.params) is None:
+            (
+                osm_history_result,
+                total_contributors,
+            ) = self.database.get_mapathon_detailed_result()
+        else:
+            (
+                osm_history_result,
+                total_contributors,
+                next_page_token,
+            ) = self.database.get_mapathon_detailed_page()
+
+        # tasking manager stats are not paginated, they come with the first page
+        tm_user_stats = ([], [], [], [])
+        if self.params.page_token is None:
+            with closing(TaskingManager(self.params)) as tm:
+                tm_user_stats = tm.get_user_stats()
+
+        return Mapathon.detailed_report(
             osm_history_result,
             total_contributors,
-        ) = self.database.get_mapathon_detailed_result()
-        mapped_features = [MappedFeatureWithUser(**r) for r in osm_history_result]
-        contributors = [MapathonContributor(**r) for r in total_contributors]
+            *tm_user_stats,
+            next_page_token=next_page_token,
+        )
 
-        tm = TaskingManager(self.params)
-        (
-            tasks_mapped_results,
-            tasks_validated_results,
-        ) = tm.get_tasks_mapped_and_validated_per_user()
-        (
-            time_mapping_results,
-            time_validating_results,
-        ) = tm.get_time_spent_mapping_and_validating_per_user()
-        (
-            tasks_mapped_stats,
-            tasks_validated_stats,
-            time_mapping_stats,
-            time_validating_stats,
-        ) = ([], [], [], [])
-        if len(tasks_mapped_results) > 0:
-            for r in tasks_mapped_results:
-                r[1] = r[1] if r[1] > 0 else 0
-            tasks_mapped_stats = [MappedTaskStats(**r) for r in tasks_mapped_results]
-        if len(tasks_validated_results) > 0:
-            for r in tasks_validated_results:
-                r[1] = r[1] if r[1] > 0 else 0
-            tasks_validated_stats = [
-                ValidatedTaskStats(**r) for r in tasks_validated_results
-            ]
-        if len(time_mapping_results) > 0:
-            for t in time_mapping_results:
-                t[1] = t[1].total_seconds() if t[1] else 0.0
-            time_mapping_stats = [TimeSpentMapping(**r) for r in time_mapping_results]
-        if len(time_validating_results) > 0:
-            for t in time_validating_results:
-                t[1] = t[1].total_seconds() if t[1] else 0.0
-            time_validating_stats = [
-                TimeSpentValidating(**r) for r in time_validating_results
-            ]
+    @staticmethod
+    def summary_report(osm_history_result, total_contributors):
+        """Builds the summary report out of underpass query results"""
+        mapped_features = [MappedFeature.from_row(r) for r in osm_history_result]
+        # lists of models built from rows are not validated again either
+        report = MapathonSummary.from_row(
+            {
+                "total_contributors": total_contributors[0].get(
+                    "contributors_count", "None"
+                ),
+                "mapped_features": mapped_features,
+            }
+        )
+        return report
+
+    @staticmethod
+    def detailed_report(
+        osm_history_result,
+        total_contributors,
+        tasks_mapped_stats,
+        tasks_validated_stats,
+        time_mapping_stats,
+        time_validating_stats,
+        next_page_token=None,
+    ):
+        """Builds the detailed report out of underpass query results and tasking manager stats"""
+        mapped_features = [MappedFeatureWithUser.from_row(r) for r in osm_history_result]
+        contributors = [MapathonContributor.from_row(r) for r in total_contributors]
 
         tm_stats = [
-            TMUserStats(
-                tasks_mapped=tasks_mapped_stats,
-                tasks_validated=tasks_validated_stats,
-                time_spent_mapping=time_mapping_stats,
-                time_spent_validating=time_validating_stats,
+            TMUserStats.from_row(
+                {
+                    "tasks_mapped": tasks_mapped_stats,
+                    "tasks_validated": tasks_validated_stats,
+                    "time_spent_mapping": time_mapping_stats,
+                    "time_spent_validating": time_validating_stats,
+                }
             )
         ]
 
-        report = MapathonDetail(
-            contributors=contributors,
-            mapped_features=mapped_features,
-            tm_stats=tm_stats,
+        report = MapathonDetail.from_row(
+            {
+                "contributors": contributors,
+                "mapped_features": mapped_features,
+                "tm_stats": tm_stats,
+                "next_page_token": next_page_token,
+            }
         )
-        # print(Output(osm_history_query,self.con).to_list())
         return report
 
 
+class AsyncMapathon:
+    """Asyncio counterpart of Mapathon, reports are awaited while queries run on pooled async connections"""
+
+    def __init__(self, parameters):
+        # parameter validation using pydantic model
+        if type(parameters) is MapathonRequestParams:
+            self.params = parameters
+        else:
+            self.params = MapathonRequestParams(**parameters)
+
+    async def get_summary(self):
+        """Function to get summary of your mapathon event"""
+        return await cached_report_async(
+            "mapathon_summary", self.params, self._get_summary
+        )
+
+    async def _get_summary(self):
+        async with AsyncUnderpass(self.params) as underpass:
+            (
+                osm_history_result,
+                total_contributors,
+            ) = await underpass.get_mapathon_summary_result()
+        return Mapathon.summary_report(osm_history_result, total_contributors)
+
+    async def get_detailed_report(self):
+        """Function to get detail report of your mapathon event. It includes individual user contribution
+
+        Underpass and tasking manager queries are independent, they run at the
+        same time on separate pooled connections so the report takes as long
+        as the slowest of them.
+        """
+        return await cached_report_async(
+            "mapathon_detail", self.params, self._get_detailed_report
+        )
+
+    async def _get_detailed_report(self):
+        tm_queries = []
+        project_ids = extract_project_ids(self.params)
+        # tasking manager stats are not paginated, they come with the first page
+        if len(project_ids) > 0 and self.params.page_token is None:
+            tm_queries = [
+                create_user_tm_stats_query(
+                    project_ids, self.params.from_timestamp, self.params.to_timestamp
+                )
+            ]
+
+        if get_page_size(self.params) is not None:
+            # the changesets of a page depend on its contributors, only the
+            # tasking manager stats run alongside
+            async def get_page():
+                async with AsyncUnderpass(self.params) as underpass:
+                    return await underpass.get_mapathon_detailed_page()
+
+            (
+                (osm_history_result, total_contributors, next_page_token),
+                *tm_results,
+            ) = await asyncio.gather(
+                get_page(),
+                *[execute_async_query("TM", query) for query in tm_queries],
+            )
+        else:
+            async with AsyncUnderpass(self.params) as underpass:
+                (
+                    changeset_query,
+                    contributors_query,
+                ) = await underpass.get_mapathon_detailed_queries()
+                await check_query_budget_async(underpass.database, changeset_query)
+
+            next_page_token = None
+            (
+                osm_history_result,
+                total_contributors,
+                *tm_results,
+            ) = await asyncio.gather(
+                execute_async_query("UNDERPASS", changeset_query),
+                execute_async_query("UNDERPASS", contributors_query),
+                *[execute_async_query("TM", query) for query in tm_queries],
+            )
+        tm_user_stats = TaskingManager.user_stats(tm_results[0] if tm_results else [])
+
+        return Mapathon.detailed_report(
+            osm_history_result,
+            total_contributors,
+            *tm_user_stats,
+            next_page_token=next_page_token,
+        )
+
+
 class Output:
     """Class to convert sql query result to specific output format. It uses Pandas Dataframe
 
@@ -573,19 +2083,32 @@ class Output:
 
     def to_GeoJSON(self, lat_column, lng_column):
         """to_Geojson converts pandas dataframe to geojson , Currently supports only Point Geometry and hence takes parameter of lat and lng ( You need to specify lat lng column )"""
-        # print(self.dataframe)
-        # columns used for constructing geojson object
-        properties = self.dataframe.drop([lat_column, lng_column], axis=1).to_dict(
-            "records"
-        )
-
-        features = self.dataframe.apply(
-            lambda row: Feature(
-                geometry=Point((float(row[lng_column]), float(row[lat_column]))),
-                properties=properties[row.name],
-            ),
-            axis=1,
+        # columns are pulled out once and zipped, the features are built as
+        # plain dicts in one pass without a geojson object per row
+        lngs = self.dataframe[lng_column].to_numpy(dtype=float).tolist()
+        lats = self.dataframe[lat_column].to_numpy(dtype=float).tolist()
+        property_columns = self.dataframe.columns.drop(
+            [lat_column, lng_column]
         ).tolist()
+        if property_columns:
+            properties = zip(
+                *(self.dataframe[column].tolist() for column in property_columns)
+            )
+        else:
+            properties = [()] * len(lngs)
+
+        # coordinates are rounded to 6 decimals as geojson.Point does
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [round(lng, 6), round(lat, 6)],
+                },
+                "properties": dict(zip(property_columns, values)),
+            }
+            for lng, lat, values in zip(lngs, lats, properties)
+        ]
 
         # whole geojson object
         feature_collection = FeatureCollection(features=features)
@@ -594,9 +2117,15 @@ class Output:
 
 class UserStats:
     def __init__(self):
-        self.db = Database(get_db_connection_params("UNDERPASS"))
+        self.db = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
         self.con, self.cur = self.db.connect()
 
+    def close(self):
+        """Releases the database connection"""
+        self.db.close_conn()
+
     def list_users(self, params):
         """returns a list of users in the database"""
         user_names_str = ",".join(["%s" for n in range(len(params.user_names))])
@@ -614,32 +2143,56 @@ class UserStats:
 
         result = self.db.executequery(list_users_query)
 
-        users_list = [User(**r) for r in result]
+        users_list = [User.from_row(r) for r in result]
 
         return users_list
 
     def get_statistics(self, params):
         """Returns statistics for the current user"""
+        return cached_report(
+            "user_statistics", params, self.db, self._get_statistics, params
+        )
+
+    def _get_statistics(self, params):
         query = create_UserStats_get_statistics_query(params, self.con, self.cur)
+        check_query_budget(self.db, query)
         result = self.db.executequery(query)
         final_result = []
         for r in result:
             clean_result = dict_none_clean(dict(r))
             final_result.append(clean_result)
-        summary = [UserStatistics(**r) for r in final_result]
+        summary = [UserStatistics.from_row(r) for r in final_result]
         return summary
 
     def get_statistics_with_hashtags(self, params):
         """ "Returns user statistics for user with hashtags"""
-        query = create_userstats_get_statistics_with_hashtags_query(
-            params, self.con, self.cur
+        return cached_report(
+            "user_statistics_with_hashtags",
+            params,
+            self.db,
+            self._get_statistics_with_hashtags,
+            params,
         )
+
+    def _get_statistics_with_hashtags(self, params):
+        window = get_daily_rollup_window(
+            self.db, params.from_timestamp, params.to_timestamp
+        )
+        if window is not None:
+            query = create_userstats_get_statistics_with_hashtags_rollup_query(
+                params, self.cur, *window
+            )
+        else:
+            query = create_userstats_get_statistics_with_hashtags_query(
+                params, self.con, self.cur
+            )
+        check_query_budget(self.db, query)
         result = self.db.executequery(query)
         final_result = []
         for r in result:
             clean_result = dict_none_clean(dict(r))
             final_result.append(clean_result)
-        summary = [UserStatistics(**r) for r in final_result]
+        summary = [UserStatistics.from_row(r) for r in final_result]
         return summary
 
 
@@ -655,16 +2208,43 @@ def dict_none_clean(to_clean):
 
 class DataQualityHashtags:
     def __init__(self, params: DataQualityHashtagParams):
-        self.db = Database(get_db_connection_params("UNDERPASS"))
+        self.db = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
         # self.db = Database(dict(config.items("UNDERPASS")))
         self.con, self.cur = self.db.connect()
         self.params = params
+        self.page_rows = None
+
+    def close(self):
+        """Releases the database connection"""
+        self.db.close_conn()
+
+    def fetch_page(self):
+        """Runs the page of the report asked for with page_size and page_token,
+        the report streams then send its rows, returns the token of the next
+        page, None on the last page or when the report is not paginated"""
+        try:
+            query = generate_data_quality_hashtag_reports(self.cur, self.params)
+            check_query_budget(self.db, query)
+            self.page_rows, next_page_token = fetch_report_page(
+                self.db, query, DATA_QUALITY_PAGE_KEY, self.params
+            )
+        except Exception:
+            self.close()
+            raise
+        return next_page_token
+
+    def report_rows(self, query):
+        """Rows of the fetched page, or of query read from a server side cursor"""
+        if self.page_rows is not None:
+            return iter(self.page_rows)
+        check_query_budget(self.db, query)
+        return self.db.executequery_stream(query)
 
     @staticmethod
     def to_csv_stream(results):
         """Responsible for csv writing"""
-        stream = StringIO()
-
         features = results.get("features")
 
         if len(features) == 0:
@@ -673,27 +2253,34 @@ class DataQualityHashtags:
         properties_keys = list(features[0].get("properties").keys())
         csv_keys = [*properties_keys, "latitude", "longitude"]
 
-        writer = DictWriter(stream, fieldnames=csv_keys)
-        writer.writeheader()
+        def rows():
+            for item in features:
+                longitude, latitude = item.get("geometry").get("coordinates")
+                yield {
+                    **item.get("properties"),
+                    "latitude": latitude,
+                    "longitude": longitude,
+                }
 
-        for item in features:
-            longitude, latitude = item.get("geometry").get("coordinates")
-            row = {
-                **item.get("properties"),
-                "latitude": latitude,
-                "longitude": longitude,
-            }
-
-            writer.writerow(row)
-
-        return iter(stream.getvalue())
+        return stream_csv(rows(), fieldnames=csv_keys)
 
     @staticmethod
     def to_geojson(results):
         """Responseible for geojson writing"""
-        features = []
+        features = [
+            Feature(**geojson_feature)
+            for geojson_feature in DataQualityHashtags.to_geojson_features(results)
+        ]
+
+        feature_collection = FeatureCollection(features=features)
+
+        return feature_collection
+
+    @staticmethod
+    def to_geojson_features(results):
+        """Maps report rows to the geojson features written by to_geojson"""
         for row in results:
-            geojson_feature = {
+            yield {
                 "type": "Feature",
                 "geometry": {"type": "Point", "coordinates": [row["lat"], row["lon"]]},
                 "properties": {
@@ -703,30 +2290,60 @@ class DataQualityHashtags:
                     "issue_type": row["issues"].split(","),
                 },
             }
-            features.append(Feature(**geojson_feature))
-
-        feature_collection = FeatureCollection(features=features)
 
-        return feature_collection
+    @staticmethod
+    def to_csv_rows(results):
+        """Maps report rows to the csv columns written by to_csv_stream"""
+        for row in results:
+            yield {
+                "created_at": row["created_at"],
+                "changeset_id": row["changeset_id"],
+                "osm_id": row["osm_id"],
+                "issue_type": row["issues"].split(","),
+                "latitude": row["lon"],
+                "longitude": row["lat"],
+            }
 
     def get_report(self):
         """Function that returns data quality report"""
         query = generate_data_quality_hashtag_reports(self.cur, self.params)
-        results = self.db.executequery(query)
+        check_query_budget(self.db, query)
+        results = self.db.executequery_stream(query)
         feature_collection = DataQualityHashtags.to_geojson(results)
 
         return feature_collection
 
+    def get_report_as_geojson_stream(self):
+        """Streams data quality report as a geojson feature collection straight from a server side cursor, the connection is released once the stream is consumed"""
+        query = generate_data_quality_hashtag_reports(self.cur, self.params)
+        try:
+            yield from stream_geojson(
+                DataQualityHashtags.to_geojson_features(self.report_rows(query))
+            )
+        finally:
+            self.close()
+
+    def get_report_as_csv_stream(self):
+        """Streams data quality report as csv rows straight from a server side cursor, the connection is released once the stream is consumed"""
+        query = generate_data_quality_hashtag_reports(self.cur, self.params)
+        try:
+            if use_copy_csv_export and self.page_rows is None:
+                check_query_budget(self.db, query)
+                yield from self.db.copy_csv_stream(
+                    generate_data_quality_hashtag_reports_csv(query)
+                )
+            else:
+                yield from stream_csv(
+                    DataQualityHashtags.to_csv_rows(self.report_rows(query))
+                )
+        finally:
+            self.close()
+
     def get_report_summary(self):
         """Function that returns data quality report summary"""
         query = generate_data_quality_hashtag_reports_summary(self.cur, self.params)
         result = [dict(r) for r in self.db.executequery(query)]
-        if result:
-            df = pandas.DataFrame(result).set_index("value")
-            stream = StringIO()
-            df.to_csv(stream)
-            return iter(stream.getvalue())
-        return iter("")
+        return stream_csv(result)
 
 
 class DataQuality:
@@ -739,7 +2356,9 @@ class DataQuality:
     """
 
     def __init__(self, parameters, inputtype):
-        self.db = Database(get_db_connection_params("UNDERPASS"))
+        self.db = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
         # self.db = Database(dict(config.items("UNDERPASS")))
         self.con, self.cur = self.db.connect()
         self.inputtype = inputtype
@@ -756,13 +2375,49 @@ class DataQuality:
                 self.params = DataQuality_username_RequestParams(**parameters)
         else:
             raise ValueError("Input Type Must be in ['TM','username']")
+        self.page_rows = None
+
+    def close(self):
+        """Releases the database connection"""
+        self.db.close_conn()
+
+    def get_query(self):
+        """Returns the data quality query of the input type"""
+        if self.inputtype == "TM":
+            return generate_data_quality_TM_query(self.params, self.cur)
+        return generate_data_quality_username_query(self.params, self.cur)
+
+    def get_page_key(self):
+        """Returns the sort key the report of the input type is paginated on"""
+        if self.inputtype == "TM":
+            return DATA_QUALITY_PAGE_KEY
+        return DATA_QUALITY_USERNAME_PAGE_KEY
+
+    def fetch_page(self):
+        """Runs the page of the report asked for with page_size and page_token,
+        the report streams then send its rows, returns the token of the next
+        page, None on the last page or when the report is not paginated"""
+        try:
+            query = self.get_query()
+            check_query_budget(self.db, query)
+            self.page_rows, next_page_token = fetch_report_page(
+                self.db, query, self.get_page_key(), self.params
+            )
+        except Exception:
+            self.close()
+            raise
+        return next_page_token
+
+    def report_rows(self, query):
+        """Rows of the fetched page, or of query read from a server side cursor"""
+        if self.page_rows is not None:
+            return iter(self.page_rows)
+        check_query_budget(self.db, query)
+        return self.db.executequery_stream(query)
 
     def get_report(self):
         """Functions that returns data_quality Report"""
-        if self.inputtype == "TM":
-            query = generate_data_quality_TM_query(self.params)
-        elif self.inputtype == "username":
-            query = generate_data_quality_username_query(self.params, self.cur)
+        query = self.get_query()
         try:
             result = Output(query, self.con).to_GeoJSON("lat", "lng")
             return result
@@ -770,14 +2425,35 @@ class DataQuality:
             return err
         # print(result)
 
+    def get_report_as_geojson_stream(self):
+        """Streams data_quality Report as a geojson feature collection from a server side cursor, the connection is released once the stream is consumed"""
+        query = self.get_query()
+        try:
+            yield from stream_geojson(
+                point_features(self.report_rows(query), "lat", "lng")
+            )
+        finally:
+            self.close()
+
+    def get_report_as_csv_stream(self):
+        """Streams data_quality Report as csv rows from a server side cursor, the connection is released once the stream is consumed"""
+        query = self.get_query()
+        try:
+            if use_copy_csv_export and self.page_rows is None:
+                check_query_budget(self.db, query)
+                yield from self.db.copy_csv_stream(query)
+            else:
+                yield from stream_csv(self.report_rows(query))
+        finally:
+            self.close()
+
     def get_report_as_csv(self, filelocation):
         """Functions that returns data_quality Report as CSV Format , requires file path where csv is meant to be generated"""
 
-        if self.inputtype == "TM":
-            query = generate_data_quality_TM_query(self.params)
-        elif self.inputtype == "username":
-            query = generate_data_quality_username_query(self.params, self.cur)
+        query = self.get_query()
         try:
+            if use_copy_csv_export:
+                return copy_csv_to_file(self.cur, query, filelocation)
             result = Output(query, self.con).to_CSV(filelocation)
             return result
         except Exception as err:
@@ -790,6 +2466,10 @@ class Training:
     def __init__(self):
         self.database = Underpass()
 
+    def close(self):
+        """Releases the database connection"""
+        self.database.close()
+
     def get_all_organisations(self):
         """[Generates result for all list of available organisations within the database.]
 
@@ -797,14 +2477,14 @@ class Training:
             [type]: [List of Training Organisations ( id, name )]
         """
         query_result = self.database.all_training_organisations()
-        Training_organisations_list = [TrainingOrganisations(**r) for r in query_result]
+        Training_organisations_list = [TrainingOrganisations.from_row(r) for r in query_result]
         # print(Training_organisations_list)
         return Training_organisations_list
 
     def get_trainingslist(self, params: TrainingParams):
         """Returns  Training lists"""
         query_result = self.database.training_list(params)
-        Trainings_list = [Trainings(**r) for r in query_result]
+        Trainings_list = [Trainings.from_row(r) for r in query_result]
         # print(Trainings_list)
         return Trainings_list
 
@@ -813,21 +2493,45 @@ class OrganizationHashtags:
     """[Class responsible for Organization Hashtag data API]"""
 
     def __init__(self, params: OrganizationHashtagParams):
-        self.db = Database(get_db_connection_params("UNDERPASS"))
+        self.db = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
         self.con, self.cur = self.db.connect()
         self.params = params
         self.query = generate_organization_hashtag_reports(self.cur, self.params)
 
+    def close(self):
+        """Releases the database connection"""
+        self.db.close_conn()
+
     def get_report(self):
         """Functions    that returns report of hashtags"""
-        print(self.query)
+        return cached_report(
+            "organization_hashtags", self.params, self.db, self._get_report
+        )
+
+    def _get_report(self):
+        check_query_budget(self.db, self.query)
         query_result = self.db.executequery(self.query)
-        results = [OrganizationHashtag(**r) for r in query_result]
+        results = [OrganizationHashtag.from_row(r) for r in query_result]
         return results
 
+    def get_report_as_csv_stream(self):
+        """Streams csv report from a server side cursor, the connection is released once the stream is consumed"""
+        try:
+            check_query_budget(self.db, self.query)
+            if use_copy_csv_export:
+                yield from self.db.copy_csv_stream(self.query)
+            else:
+                yield from stream_csv(self.db.executequery_stream(self.query))
+        finally:
+            self.close()
+
     def get_report_as_csv(self, filelocation):
         """Returns as csv report"""
         try:
+            if use_copy_csv_export:
+                return copy_csv_to_file(self.cur, self.query, filelocation)
             result = Output(self.query, self.con).to_CSV(filelocation)
             return result
         except Exception as err:
@@ -847,6 +2551,10 @@ class Status:
 
         self.database = Underpass(self.params)
 
+    def close(self):
+        """Releases the database connection"""
+        self.database.close()
+
     def get_osm_recency(self):
         """Returns OSM Recency"""
         # checks either that method is supported by the database supplied or not without making call to database class if yes will make a call else it will return None
@@ -879,3 +2587,35 @@ class Status:
             if getattr(self.database, "get_user_data_quality_last_updated", None)
             else None
         )
+
+
+class DailyRollup:
+    """Keeps the daily changeset rollups read by the mapathon and user statistics reports up to date"""
+
+    def __init__(self):
+        self.database = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
+        self.con, self.cur = self.database.connect()
+
+    def close(self):
+        """Releases the database connection"""
+        self.database.close_conn()
+
+    def refresh(self):
+        """Recomputes the rollups of every day having changesets updated since
+        the last refresh in a single transaction and moves the watermark
+        forward. Returns the new watermark, None when nothing was updated"""
+        with self.con:
+            self.cur.execute(generate_daily_rollup_watermarks_query(self.cur))
+            from_updated_at, to_updated_at = self.cur.fetchone()
+            if to_updated_at is None or (
+                from_updated_at is not None and to_updated_at <= from_updated_at
+            ):
+                return None
+            for query in generate_daily_rollup_refresh_queries(
+                self.cur, from_updated_at, to_updated_at
+            ):
+                self.cur.execute(query)
+            logging.debug("Daily rollups refreshed up to %s", to_updated_at)
+        return to_updated_at
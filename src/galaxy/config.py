@@ -50,6 +50,116 @@ logger = logging.getLogger('galaxy')
 
 shp_limit = int(config.get('API_CONFIG', 'shp_limit', fallback=4096))
 
+# rows fetched per round trip when reports are streamed from server side cursors
+stream_itersize = int(config.get('API_CONFIG', 'stream_itersize', fallback=2000))
+
+# size in bytes of the chunks streamed csv and geojson reports are sent in
+csv_chunk_size = int(config.get('API_CONFIG', 'csv_chunk_size', fallback=65536))
+
+# csv reports are exported by postgres with COPY ... TO STDOUT and sent as they
+# are, values keep the postgres text format
+use_copy_csv_export = config.getboolean('API_CONFIG', 'use_copy_csv_export', fallback=False)
+
+# large json reports are encoded with orjson from the models galaxy built
+# instead of being validated again against the response model of their endpoint
+use_fast_json_responses = config.getboolean('API_CONFIG', 'use_fast_json_responses', fallback=False)
+
+# largest page of the data quality and mapathon detail reports when clients
+# ask for them in pages
+report_page_size = int(config.get('API_CONFIG', 'report_page_size', fallback=10000))
+
+# read mapathon and user statistics from the daily rollups of migrations/00004.sql
+# when the request window aligns to whole days, they are kept up to date with
+# python -m src.galaxy.rollup
+use_daily_rollups = config.getboolean('API_CONFIG', 'use_daily_rollups', fallback=False)
+
+# mapathon, user statistics and organization hashtag reports kept in memory,
+# until the changesets watermark moves, 0 ( the default ) disables the cache
+response_cache_size = int(config.get('API_CONFIG', 'response_cache_size', fallback=0))
+# requests whose timestamps fall in the same bucket of that many seconds share
+# a cached report
+response_cache_timestamp_precision = int(config.get(
+    'API_CONFIG', 'response_cache_timestamp_precision', fallback=1))
+# seconds between two reads of the changesets watermark
+response_cache_watermark_interval = float(config.get(
+    'API_CONFIG', 'response_cache_watermark_interval', fallback=10))
+
+# json list of the reports the cache warmer keeps in the response cache, see
+# src/galaxy/warmer.py, it reads the changesets watermark every
+# cache_warmer_interval seconds
+cache_warmer_file = config.get('API_CONFIG', 'cache_warmer_file', fallback=None)
+cache_warmer_interval = float(config.get(
+    'API_CONFIG', 'cache_warmer_interval', fallback=response_cache_watermark_interval))
+
+# queries running longer than slow_query_threshold seconds are written to the
+# slow query log, 0 disables it, see src/galaxy/slow_queries.py
+slow_query_threshold = float(config.get('API_CONFIG', 'slow_query_threshold', fallback=0))
+slow_query_log_file = config.get('API_CONFIG', 'slow_query_log_file', fallback='slow_queries.log')
+slow_query_log_max_bytes = int(config.get(
+    'API_CONFIG', 'slow_query_log_max_bytes', fallback=10 * 1024 * 1024))
+slow_query_log_backups = int(config.get('API_CONFIG', 'slow_query_log_backups', fallback=5))
+# share of the slow queries whose EXPLAIN (ANALYZE, BUFFERS) plan is captured
+slow_query_explain_rate = float(config.get('API_CONFIG', 'slow_query_explain_rate', fallback=0.1))
+slow_query_explain_timeout = float(config.get(
+    'API_CONFIG', 'slow_query_explain_timeout', fallback=300))
+
+# long reports run as background jobs, on report_job_workers threads, their
+# results are written to report_job_dir and removed report_job_ttl hours after
+# they finished
+report_job_dir = config.get('API_CONFIG', 'report_job_dir', fallback='report_jobs')
+report_job_workers = int(config.get('API_CONFIG', 'report_job_workers', fallback=2))
+report_job_ttl = float(config.get('API_CONFIG', 'report_job_ttl', fallback=24))
+
+# seconds a query of an endpoint may run before postgres cancels it, keyed in
+# the [STATEMENT_TIMEOUT] section by the endpoint path without its version
+# ( data_quality_hashtag_reports for /v1/data-quality/hashtag-reports/ ),
+# default applies to the endpoints without a key of their own
+statement_timeouts = {
+    key: float(value) for key, value in config.items('STATEMENT_TIMEOUT')
+} if config.has_section('STATEMENT_TIMEOUT') else {}
+
+
+def get_statement_timeout(endpoint: str):
+    """Returns the statement timeout in seconds of an endpoint, None when it
+    has none"""
+    return statement_timeouts.get(endpoint, statement_timeouts.get('default')) or None
+
+
+# largest planner estimates a report query of an endpoint may reach, keyed in
+# the [QUERY_BUDGET] section by the endpoint name followed by _cost for the
+# total cost or _rows for the rows scanned, default_cost and default_rows
+# apply to the endpoints without keys of their own
+query_budgets = {
+    key: float(value) for key, value in config.items('QUERY_BUDGET')
+} if config.has_section('QUERY_BUDGET') else {}
+
+# reject answers over budget requests with an error, queue runs them once one
+# of slow_query_slots is free, waiting up to slow_query_wait seconds for it
+over_budget_queries = config.get('API_CONFIG', 'over_budget_queries', fallback='reject')
+slow_query_slots = int(config.get('API_CONFIG', 'slow_query_slots', fallback=2))
+slow_query_wait = float(config.get('API_CONFIG', 'slow_query_wait', fallback=60))
+
+if over_budget_queries not in ('reject', 'queue'):
+    logging.error(
+        "over_budget_queries config is not supported , Supported values are : reject,queue , Defaulting to :reject")
+    over_budget_queries = 'reject'
+
+
+def get_query_budget(endpoint: str):
+    """Returns the largest cost and rows scanned estimates allowed for the
+    queries of an endpoint, None for the limits it has none of"""
+    return tuple(
+        query_budgets.get(f"{endpoint}_{estimate}",
+                          query_budgets.get(f"default_{estimate}")) or None
+        for estimate in ('cost', 'rows')
+    )
+
+
+# keys of a database section that configure its connection pool rather than
+# the psycopg2 connection itself
+DB_POOL_OPTIONS = ('pool_min_size', 'pool_max_size', 'pool_timeout')
+
+
 def get_db_connection_params(dbIdentifier: str) -> dict:
     """Return a python dict that can be passed to psycopg2 connections
     to authenticate to Postgres Databases
@@ -69,9 +179,30 @@ def get_db_connection_params(dbIdentifier: str) -> dict:
             f"Invalid dbIdentifier. Pick one of {ALLOWED_SECTION_NAMES}")
         return None
     try:
-        connection_params = dict(config.items(dbIdentifier))
+        connection_params = {
+            key: value for key, value in config.items(dbIdentifier)
+            if key not in DB_POOL_OPTIONS}
         return connection_params
     except Exception as ex:
         logging.error(
             f"""Can't find DB credentials on config :{dbIdentifier}""")
         raise ex
+
+
+def get_db_pool_params(dbIdentifier: str) -> dict:
+    """Return the connection pool settings of a database section
+
+    Params: dbIdentifier: Section name of the INI config file containing
+            database connection parameters
+
+    Returns: pool_params (dict): minconn (connections kept open between
+             requests), maxconn and timeout (seconds to wait for a free
+             connection) used to build the pool.
+    """
+    maxconn = config.getint(dbIdentifier, 'pool_max_size', fallback=10)
+    minconn = config.getint(dbIdentifier, 'pool_min_size', fallback=5)
+    return {
+        'minconn': min(minconn, maxconn),
+        'maxconn': maxconn,
+        'timeout': config.getfloat(dbIdentifier, 'pool_timeout', fallback=30),
+    }
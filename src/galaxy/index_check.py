@@ -0,0 +1,125 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Checks a live database for the indexes declared in migrations/
+
+Usage, from the repository root:
+
+    python -m src.galaxy.index_check [UNDERPASS] [TM]
+
+Prints the CREATE INDEX statement of every missing index and exits with
+status 1 when any is missing.
+"""
+import os
+import re
+import sys
+
+from psycopg2 import connect
+
+from .config import get_db_connection_params
+
+MIGRATIONS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "migrations")
+
+# migrations of each database, tasking manager ones live in their own folder
+MIGRATIONS_DIRS = {
+    "UNDERPASS": MIGRATIONS_PATH,
+    "TM": os.path.join(MIGRATIONS_PATH, "tm"),
+}
+
+CREATE_INDEX_PATTERN = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+"
+    r"ON\s+(?:ONLY\s+)?([\w.]+)\s+(?:USING\s+(\w+)\s*)?\(([^)]*)\)[^;]*;",
+    re.IGNORECASE)
+
+EXISTING_INDEXES_QUERY = """
+    SELECT am.amname AS method,
+        ARRAY(
+            SELECT pg_get_indexdef(i.indexrelid, k, true)
+            FROM generate_series(1, i.indnatts) k
+            ORDER BY k
+        ) AS columns
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE i.indrelid = to_regclass(%s) AND i.indisvalid;
+"""
+
+
+def declared_indexes(migrations_dir):
+    """Returns the indexes created by the .sql files of migrations_dir, in
+    migration order, as dicts of name, table, method, columns and statement"""
+    indexes = []
+    for filename in sorted(os.listdir(migrations_dir)):
+        if not filename.endswith(".sql"):
+            continue
+        with open(os.path.join(migrations_dir, filename)) as migration:
+            for match in CREATE_INDEX_PATTERN.finditer(migration.read()):
+                name, table, method, columns = match.groups()
+                indexes.append({
+                    "name": name,
+                    "table": table,
+                    "method": (method or "btree").lower(),
+                    "columns": [c.strip() for c in columns.split(",")],
+                    "statement": match.group(0),
+                })
+    return indexes
+
+
+def find_missing_indexes(cur, indexes):
+    """Returns the indexes that have no equivalent on the database of cur.
+
+    Names are not compared, an index is found when an existing one on the
+    same table uses the same method and starts with the same columns.
+    """
+    missing = []
+    for index in indexes:
+        cur.execute(EXISTING_INDEXES_QUERY, (index["table"],))
+        found = any(
+            method == index["method"]
+            and columns[:len(index["columns"])] == index["columns"]
+            for method, columns in cur.fetchall())
+        if not found:
+            missing.append(index)
+    return missing
+
+
+def main(db_identifiers):
+    """Checks every database of db_identifiers, returns the exit status"""
+    status = 0
+    for db_identifier in db_identifiers:
+        con = connect(**get_db_connection_params(db_identifier))
+        try:
+            with con.cursor() as cur:
+                missing = find_missing_indexes(
+                    cur, declared_indexes(MIGRATIONS_DIRS[db_identifier]))
+        finally:
+            con.close()
+        if missing:
+            status = 1
+            print(f"{db_identifier}: {len(missing)} missing index(es)")
+            for index in missing:
+                print(f"    {index['statement']}")
+        else:
+            print(f"{db_identifier}: all indexes present")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:] or list(MIGRATIONS_DIRS)))
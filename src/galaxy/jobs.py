@@ -0,0 +1,255 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Background jobs for the reports too long to be computed while a client
+waits for them
+
+A job is submitted with the report class method that streams it, it is queued
+on a bounded pool of worker threads and its result is written to the result
+store, a directory of report_job_dir. The state of every job is kept there as
+json next to its result, so that any API process can answer its status and
+serve its result, whatever process computed it.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+
+from .app import (
+    DataQualityHashtags,
+    OrganizationHashtags,
+    RequestQueries,
+    TaskingManager,
+    request_queries,
+)
+from .config import (
+    get_statement_timeout,
+    report_job_dir,
+    report_job_ttl,
+    report_job_workers,
+)
+from .config import logger as logging
+from .validation.models import OutputType, ReportJobStatus
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# media type of the results of each output format
+REPORT_JOB_MEDIA_TYPES = {"csv": "text/csv", "geojson": "application/json"}
+
+
+class NoReportData(Exception):
+    """Raised by a report job whose report has no data"""
+
+
+def validators_stats_report(params):
+    """Streams the validators statistics csv of TaskingManager"""
+    csv_stream = TaskingManager(params).get_validators_stats()
+    if csv_stream is None:
+        raise NoReportData("No Data Found")
+    return csv_stream
+
+
+def data_quality_hashtags_report(params):
+    """Streams the whole data quality hashtag report, page fields are ignored"""
+    params = params.copy(update={"page_size": None, "page_token": None})
+    data_quality = DataQualityHashtags(params)
+    if params.output_type == OutputType.GEOJSON.value:
+        return data_quality.get_report_as_geojson_stream()
+    return data_quality.get_report_as_csv_stream()
+
+
+def organization_hashtags_report(params):
+    """Streams the organization hashtag statistics as csv"""
+    return OrganizationHashtags(params).get_report_as_csv_stream()
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ReportJobs:
+    """Queue of report jobs run on at most ``workers`` threads, whose states
+    and results are kept in ``directory`` for ``ttl`` hours once finished"""
+
+    def __init__(self, directory, workers=2, ttl=24):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="report-job"
+        )
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def path(self, job_id, extension):
+        """Path of a file of a job in the result store, job ids other than the
+        ones submit returns raise KeyError"""
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            raise KeyError(job_id)
+        return os.path.join(self.directory, f"{job_id}.{extension}")
+
+    def save(self, job):
+        """Writes the state of job, replacing the former one at once"""
+        path = self.path(job["job_id"], "json")
+        with open(f"{path}.tmp", "w") as job_file:
+            json.dump(job, job_file)
+        os.replace(f"{path}.tmp", path)
+
+    def get(self, job_id):
+        """Returns the state of a job, KeyError when it does not exist"""
+        try:
+            with open(self.path(job_id, "json")) as job_file:
+                return json.load(job_file)
+        except FileNotFoundError:
+            raise KeyError(job_id)
+
+    def result_path(self, job):
+        """Path of the result of a succeeded job"""
+        return self.path(job["job_id"], job["output_format"])
+
+    def submit(self, report, func, params, output_format="csv"):
+        """Queues the job of a report, func is called with params on a worker
+        thread and returns the chunks of its result, returns the state of the
+        job"""
+        self.remove_expired()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "report": report,
+            "output_format": output_format,
+            "status": ReportJobStatus.queued.value,
+            "created_at": utc_now(),
+            "started_at": None,
+            "finished_at": None,
+            "size": None,
+            "error": None,
+        }
+        self.save(job)
+        with self._lock:
+            self._futures[job["job_id"]] = self.executor.submit(
+                self.run, job, func, params
+            )
+        logging.info("Report job %s of %s queued", job["job_id"], report)
+        return job
+
+    def run(self, job, func, params):
+        """Runs a job on a worker thread, the job does not belong to the request
+        that submitted it, it goes on when its client disconnects"""
+        token = request_queries.set(
+            RequestQueries(get_statement_timeout("report_jobs"))
+        )
+        result_path = self.result_path(job)
+        try:
+            job.update(status=ReportJobStatus.running.value, started_at=utc_now())
+            self.save(job)
+            size = 0
+            with open(f"{result_path}.part", "wb") as result_file, closing(
+                func(params)
+            ) as chunks:
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    result_file.write(chunk)
+                    size += len(chunk)
+            os.replace(f"{result_path}.part", result_path)
+            job.update(status=ReportJobStatus.succeeded.value, size=size)
+        except Exception as ex:
+            logging.error("Report job %s failed: %s", job["job_id"], ex)
+            if os.path.exists(f"{result_path}.part"):
+                os.remove(f"{result_path}.part")
+            job.update(status=ReportJobStatus.failed.value, error=str(ex))
+        finally:
+            request_queries.reset(token)
+            job["finished_at"] = utc_now()
+            self.save(job)
+            with self._lock:
+                self._futures.pop(job["job_id"], None)
+
+    def remove_expired(self):
+        """Removes the states and results of the jobs finished more than ttl
+        hours ago"""
+        expiry = time.time() - self.ttl * 3600
+        for name in os.listdir(self.directory):
+            job_id, _, extension = name.partition(".")
+            if extension != "json" or not JOB_ID_PATTERN.fullmatch(job_id):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) > expiry:
+                    continue
+                job = self.get(job_id)
+                if job["finished_at"] is None:
+                    continue
+                for job_file in (job["output_format"], "json"):
+                    if os.path.exists(self.path(job_id, job_file)):
+                        os.remove(self.path(job_id, job_file))
+            except (KeyError, FileNotFoundError, ValueError):
+                # another process removed it meanwhile
+                continue
+
+    def close(self):
+        """Stops the workers, the queued jobs are cancelled and recorded as
+        failed, the running ones are left to record their own state"""
+        with self._lock:
+            futures = dict(self._futures)
+        # a running job can't be cancelled, run records its state once done
+        cancelled = [
+            job_id for job_id, future in futures.items() if future.cancel()
+        ]
+        self.executor.shutdown(wait=False)
+        for job_id in cancelled:
+            try:
+                job = self.get(job_id)
+            except KeyError:
+                continue
+            if job["finished_at"] is None:
+                job.update(
+                    status=ReportJobStatus.failed.value,
+                    error="The API shut down before the report was done",
+                    finished_at=utc_now(),
+                )
+                self.save(job)
+
+
+_report_jobs = None
+_report_jobs_lock = threading.Lock()
+
+
+def get_report_jobs():
+    """Returns the report job queue of the process, created on first use"""
+    global _report_jobs
+    with _report_jobs_lock:
+        if _report_jobs is None:
+            _report_jobs = ReportJobs(
+                report_job_dir, report_job_workers, report_job_ttl
+            )
+        return _report_jobs
+
+
+def close_report_jobs():
+    """Stops the report job queue, called on API shutdown"""
+    global _report_jobs
+    with _report_jobs_lock:
+        report_jobs, _report_jobs = _report_jobs, None
+    if report_jobs is not None:
+        report_jobs.close()
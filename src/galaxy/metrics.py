@@ -0,0 +1,103 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Prometheus metrics of the API requests and of the queries they run
+
+Queries are labelled with the name of the query builder function that
+generated them and the database section ( UNDERPASS, TM ) they ran on. With
+several API worker processes, point PROMETHEUS_MULTIPROC_DIR to an empty
+directory so that /metrics adds the figures of every process up.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+
+# seconds, reports range from a few milliseconds to several minutes
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+    float("inf"),
+)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000, float("inf"))
+
+REQUEST_DURATION = Histogram(
+    "galaxy_request_duration_seconds",
+    "Time spent serving API requests, until their response is sent",
+    ["endpoint", "method", "status"],
+    buckets=DURATION_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "galaxy_requests_in_progress",
+    "API requests being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+RESPONSE_BYTES = Counter(
+    "galaxy_response_bytes",
+    "Bytes of response bodies sent",
+    ["endpoint"],
+)
+QUERY_DURATION = Histogram(
+    "galaxy_query_duration_seconds",
+    "Time spent running queries, until the last row of streamed ones is read",
+    ["query", "database"],
+    buckets=DURATION_BUCKETS,
+)
+QUERY_ROWS = Histogram(
+    "galaxy_query_rows",
+    "Rows returned by queries",
+    ["query", "database"],
+    buckets=ROWS_BUCKETS,
+)
+DB_CONNECT_DURATION = Histogram(
+    "galaxy_db_connect_seconds",
+    "Time spent getting a database connection, from its pool or a new one",
+    ["database"],
+    buckets=DURATION_BUCKETS,
+)
+
+
+def observe_query(name, database, duration, rows=None):
+    """Records a query that ran for duration seconds"""
+    QUERY_DURATION.labels(name, database).observe(duration)
+    if rows is not None:
+        QUERY_ROWS.labels(name, database).observe(rows)
+
+
+def observe_connect(database, start_time):
+    DB_CONNECT_DURATION.labels(database).observe(time.monotonic() - start_time)
+
+
+def latest_metrics():
+    """Returns the metrics in the Prometheus text format along with its media
+    type"""
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
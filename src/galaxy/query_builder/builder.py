@@ -18,9 +18,63 @@
 # <info@hotosm.org>
 
 from psycopg2 import sql
+from functools import wraps
 from json import dumps
-from ..validation.models import Frequency
+from datetime import datetime, time, timedelta, timezone
+from ..config import use_daily_rollups
+from ..validation.models import Frequency, decode_page_token
 HSTORE_COLUMN = "tags"
+# name of the changesets.updated_at watermark of the daily rollups
+DAILY_ROLLUP_WATERMARK = "changesets_daily"
+# sort keys data quality and mapathon detail reports are paginated on
+DATA_QUALITY_PAGE_KEY = ["changeset_id", "osm_id"]
+# the user report has a row per issue and asked username
+DATA_QUALITY_USERNAME_PAGE_KEY = ["changeset_id", "osm_id", "username"]
+MAPATHON_DETAIL_PAGE_KEY = ["user_id"]
+# types of the values of the sort key columns in page tokens
+PAGE_KEY_TYPES = {
+    "changeset_id": int, "osm_id": int, "user_id": int, "username": str}
+
+
+class NamedQuery(str):
+    """Query text along with the name of the builder function it comes from,
+    queries are timed under that name"""
+    name = None
+
+
+class NamedBytesQuery(bytes):
+    """NamedQuery of the queries built with cursor.mogrify"""
+    name = None
+
+
+def name_query(query, name):
+    '''returns query named name, values other than query text are returned as
+    they are'''
+    if isinstance(query, str):
+        query = NamedQuery(query)
+    elif isinstance(query, bytes):
+        query = NamedBytesQuery(query)
+    else:
+        return query
+    query.name = name
+    return query
+
+
+def query_name(query):
+    '''returns the name of the builder function of query, other for queries
+    built elsewhere'''
+    return getattr(query, "name", None) or "other"
+
+
+def named_query(func):
+    '''names the queries func returns, alone or in a tuple or list, after it'''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if isinstance(result, (tuple, list)):
+            return type(result)(name_query(query, func.__name__) for query in result)
+        return name_query(result, func.__name__)
+    return wrapper
 
 
 def create_hashtag_filter_query(project_ids, hashtags, cur, conn, prefix=False):
@@ -78,15 +132,21 @@ def create_hashtag_filter_query(project_ids, hashtags, cur, conn, prefix=False):
 
 
 def create_timestamp_filter_query(column_name, from_timestamp, to_timestamp, cur, prefix=False):
-    '''returns timestamp filter query '''
+    '''returns timestamp filter query, with use_daily_rollups set a window of
+    whole days leaves its closing midnight out as the daily rollups do ( see
+    get_whole_day_window ) '''
 
     timestamp_column = column_name
+    if use_daily_rollups and get_whole_day_window(from_timestamp, to_timestamp) is not None:
+        timestamp_filter = "{timestamp_column} >= %s AND {timestamp_column} < %s"
+    else:
+        timestamp_filter = "{timestamp_column} between %s AND %s"
     # Subquery to filter changesets matching hashtag and dates.
     if prefix:
-        timestamp_filter = sql.SQL("c.{timestamp_column} between %s AND %s").format(
+        timestamp_filter = sql.SQL(timestamp_filter.replace("{", "c.{")).format(
             timestamp_column=sql.Identifier(timestamp_column))
     else:
-        timestamp_filter = sql.SQL("{timestamp_column} between %s AND %s").format(
+        timestamp_filter = sql.SQL(timestamp_filter).format(
             timestamp_column=sql.Identifier(timestamp_column))
     timestamp_filter = cur.mogrify(timestamp_filter,
                                    (from_timestamp, to_timestamp)).decode()
@@ -110,9 +170,10 @@ def create_changeset_query(params, conn, cur):
 
     return changeset_query, hashtag_filter, timestamp_filter
 
+@named_query
 def create_userstats_get_statistics_with_hashtags_query(params, con, cur):
 
-    filter_hashtags = create_hashtagfilter_underpass(params.hashtags, "hashtags")
+    filter_hashtags = create_hashtagfilter_underpass(params.hashtags, "hashtags", cur)
     timestamp_filter = create_timestamp_filter_query(
         "created_at", params.from_timestamp, params.to_timestamp, cur, prefix=True)
     query = f"""
@@ -130,6 +191,7 @@ def create_userstats_get_statistics_with_hashtags_query(params, con, cur):
     """
     return query
 
+@named_query
 def create_UserStats_get_statistics_query(params, con, cur):
     query = """
     SELECT
@@ -176,6 +238,7 @@ def create_users_contributions_query(params, changeset_query):
     return query
 
 
+@named_query
 def create_user_tasks_mapped_and_validated_query(project_ids, from_timestamp, to_timestamp):
     tm_project_ids = ",".join([str(p) for p in project_ids])
 
@@ -198,6 +261,7 @@ def create_user_tasks_mapped_and_validated_query(project_ids, from_timestamp, to
     return mapped_query, validated_query
 
 
+@named_query
 def create_user_time_spent_mapping_and_validating_query(project_ids, from_timestamp, to_timestamp):
     tm_project_ids = ",".join([str(p) for p in project_ids])
 
@@ -223,6 +287,40 @@ def create_user_time_spent_mapping_and_validating_query(project_ids, from_timest
     return time_spent_mapping_query, time_spent_validating_query
 
 
+@named_query
+def create_user_tm_stats_query(project_ids, from_timestamp, to_timestamp):
+    '''returns tasks mapped, tasks validated and time spent mapping and
+    validating per user, computed in a single scan of task_history, the lock
+    counts tell the users whose locks have no duration'''
+    tm_project_ids = ",".join([str(p) for p in project_ids])
+
+    query = f"""
+        SELECT user_id,
+            COUNT(task_id) FILTER (WHERE action_text = 'MAPPED') AS tasks_mapped,
+            COUNT(task_id) FILTER (WHERE action_text = 'VALIDATED') AS tasks_validated,
+            SUM(CAST(TO_TIMESTAMP(action_text, 'HH24:MI:SS') AS TIME)) FILTER (
+                WHERE action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING')
+            ) AS time_spent_mapping,
+            SUM(CAST(TO_TIMESTAMP(action_text, 'HH24:MI:SS') AS TIME)) FILTER (
+                WHERE action = 'LOCKED_FOR_VALIDATION'
+            ) AS time_spent_validating,
+            COUNT(*) FILTER (
+                WHERE action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING')
+            ) AS mapping_locks,
+            COUNT(*) FILTER (
+                WHERE action = 'LOCKED_FOR_VALIDATION'
+            ) AS validating_locks
+        FROM public.task_history
+        WHERE action_date BETWEEN '{from_timestamp}' AND '{to_timestamp}'
+            AND project_id IN ({tm_project_ids})
+            AND (action_text IN ('MAPPED', 'VALIDATED')
+            OR action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION'))
+        GROUP BY user_id;
+    """
+    return query
+
+
+@named_query
 def generate_data_quality_hashtag_reports(cur, params):
     if params.hashtags is not None and len(params.hashtags) > 0:
         filter_hashtags = ", ".join(["%s"] * len(params.hashtags))
@@ -263,6 +361,79 @@ def generate_data_quality_hashtag_reports(cur, params):
 
     return query
 
+def generate_data_quality_hashtag_reports_csv(query):
+    '''returns the data quality hashtag report query with the columns of its csv export'''
+    report_query = query.strip().rstrip(";")
+    return name_query(f"""
+        SELECT created_at,
+            changeset_id,
+            osm_id,
+            STRING_TO_ARRAY(issues, ',') AS issue_type,
+            lon AS latitude,
+            lat AS longitude
+            FROM ({report_query}) AS report
+    """, query_name(query))
+
+
+def create_copy_csv_query(query):
+    '''wraps query in a COPY that sends its result as csv with a header line'''
+    return f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH CSV HEADER"
+
+
+def create_statement_timeout_query(timeout, local=False):
+    '''returns the SET of statement_timeout to timeout seconds, back to the
+    database default when timeout is None, local limits it to the current
+    transaction'''
+    scope = "LOCAL " if local else ""
+    value = "DEFAULT" if timeout is None else f"{max(int(timeout * 1000), 1)}"
+    return f"SET {scope}statement_timeout TO {value}"
+
+
+def create_explain_query(query):
+    '''returns the EXPLAIN of query, the plan postgres estimates for it as json
+    without running it'''
+    if isinstance(query, bytes):
+        query = query.decode()
+    return name_query(
+        f"EXPLAIN (FORMAT JSON) {query.strip().rstrip(';')}", "explain")
+
+
+def decode_page_key(token, key_columns):
+    '''returns the key values of the page token, None for no token, raises
+    InvalidPageToken when they do not match the types of key_columns'''
+    return decode_page_token(
+        token, [PAGE_KEY_TYPES[column] for column in key_columns])
+
+
+def create_keyset_page_query(query, key_columns, after, page_size, cur):
+    '''returns the page of query that follows the key values after ( None for
+    the first page ) in the order of key_columns, one row more than page_size
+    is asked for to know whether another page follows, after comes from
+    decode_page_key'''
+    keys = ", ".join(key_columns)
+    keyset_filter = ""
+    if after is not None:
+        keyset_filter = cur.mogrify(
+            sql.SQL(f"WHERE ({keys}) > %s"), (tuple(after),)).decode()
+    return name_query(f"""
+        SELECT * FROM ({query.strip().rstrip(';')}) AS report
+        {keyset_filter}
+        ORDER BY {keys}
+        LIMIT {int(page_size) + 1}
+    """, query_name(query))
+
+
+def create_key_range_query(query, key_column, first, last, cur):
+    '''returns the rows of query whose key_column lies between first and last'''
+    key_range_filter = cur.mogrify(
+        sql.SQL(f"WHERE {key_column} BETWEEN %s AND %s"), (first, last)).decode()
+    return name_query(f"""
+        SELECT * FROM ({query.strip().rstrip(';')}) AS report
+        {key_range_filter}
+    """, query_name(query))
+
+
+@named_query
 def generate_data_quality_hashtag_reports_summary(cur, params):
     if params.hashtags is not None and len(params.hashtags) > 0:
         filter_hashtags = ", ".join(["%s"] * len(params.hashtags))
@@ -308,28 +479,36 @@ def generate_data_quality_hashtag_reports_summary(cur, params):
     """
     return query
 
-def create_hashtagfilter_underpass(hashtags, columnname, project_ids = []):
-    """Generates hashtag filter query on the basis of list of hastags."""
+# postgres type of the array a filter column is compared to, text[] for the rest
+ARRAY_FILTER_TYPES = {"status": "status[]"}
+
+
+def create_hashtagfilter_underpass(hashtags, columnname, cur, project_ids = []):
+    """Generates hashtag filter query on the basis of list of hastags.
+
+    Array columns are filtered with a single overlap (&&) predicate so the
+    GIN index on the column can be used, scalar columns with = ANY. The
+    values are bound as a typed array through cur.mogrify.
+    """
     
     hashtag_filter_values = [
         *[f"hotosm-project-{i}" if project_ids is not None else '' for i in project_ids],
         *[f"{i}" for i in hashtags],
     ]
+    if len(hashtag_filter_values) == 0:
+        return ""
 
-    hashtag_filters = []
-    for i in hashtag_filter_values:
-        if columnname =="username":
-            hashtag_filters.append(f"""'{i}'={columnname}""")
-        else:
-            hashtag_filters.append(f"""'{i}'=ANY({columnname})""")
-
-    join_query = " OR ".join(hashtag_filters)
-    returnquery = f"""{join_query}"""
+    array_type = ARRAY_FILTER_TYPES.get(columnname, "text[]")
+    if columnname =="username":
+        returnquery = f"""{columnname} = ANY(%s::{array_type})"""
+    else:
+        returnquery = f"""{columnname} && %s::{array_type}"""
 
-    return returnquery
+    return cur.mogrify(returnquery, (hashtag_filter_values,)).decode()
 
 
-def generate_data_quality_TM_query(params):
+@named_query
+def generate_data_quality_TM_query(params, cur):
     '''returns data quality TM query with filters and parameteres provided'''
     # print(params)
     hashtag_add_on = "hotosm-project-"
@@ -344,8 +523,8 @@ def generate_data_quality_TM_query(params):
     for p in params.project_ids:
         change_ids.append(hashtag_add_on + str(p))
 
-    hashtagfilter = create_hashtagfilter_underpass(change_ids, "hashtags")
-    status_filter = create_hashtagfilter_underpass(issue_types, "status")
+    hashtagfilter = create_hashtagfilter_underpass(change_ids, "hashtags", cur)
+    status_filter = create_hashtagfilter_underpass(issue_types, "status", cur)
     '''Geojson output query for pydantic model'''
     # query1 = """
     #     select '{ "type": "Feature","properties": {   "Osm_id": ' || osm_id ||',"Changeset_id":  ' || change_id ||',"Changeset_timestamp": "' || timestamp ||'","Issue_type": "' || cast(status as text) ||'"},"geometry": ' || ST_AsGeoJSON(location)||'}'
@@ -378,6 +557,7 @@ def generate_data_quality_TM_query(params):
     return query
 
 
+@named_query
 def generate_data_quality_username_query(params, cur):
     '''returns data quality username query with filters and parameteres provided'''
     # print(params)
@@ -392,8 +572,7 @@ def generate_data_quality_username_query(params, cur):
         issue_type_filter = ""
 
     if params.hashtags is not None and len(params.hashtags) > 0:
-        hashtag_filt = create_hashtagfilter_underpass(
-            params.hashtags, "hashtags")
+        hashtag_filt = create_hashtagfilter_underpass(params.hashtags, "hashtags", cur)
         filter_hashtags = f""" and {hashtag_filt}"""
     else:
         filter_hashtags = ""
@@ -401,7 +580,7 @@ def generate_data_quality_username_query(params, cur):
     for p in params.osm_usernames:
         osm_usernames.append(p)
 
-    username_filter = create_hashtagfilter_underpass(osm_usernames, "username")
+    username_filter = create_hashtagfilter_underpass(osm_usernames, "username", cur)
 
     query = f"""with t1 as (
         select
@@ -457,6 +636,7 @@ def generate_data_quality_username_query(params, cur):
     return query
 
 
+@named_query
 def generate_mapathon_summary_underpass_query(params, cur):
     """Generates mapathon query from underpass"""
     projectid_hashtag_add_on = "hotosm-project-"
@@ -464,11 +644,11 @@ def generate_mapathon_summary_underpass_query(params, cur):
     for p in params.project_ids:
         change_ids.append(projectid_hashtag_add_on + str(p))
 
-    projectidfilter = create_hashtagfilter_underpass(change_ids, "hashtags")
+    projectidfilter = create_hashtagfilter_underpass(change_ids, "hashtags", cur)
     hashtags = []
     for p in params.hashtags:
         hashtags.append(str(p))
-    hashtagfilter = create_hashtagfilter_underpass(hashtags, "hashtags")
+    hashtagfilter = create_hashtagfilter_underpass(hashtags, "hashtags", cur)
     timestamp_filter = create_timestamp_filter_query(
         "created_at", params.from_timestamp, params.to_timestamp, cur)
 
@@ -507,10 +687,11 @@ def generate_mapathon_summary_underpass_query(params, cur):
 
 
 
+@named_query
 def create_changeset_query_underpass(params, conn, cur):
     '''returns the changeset query from Underpass'''
 
-    hashtag_filter=create_hashtagfilter_underpass(params.hashtags, "hashtags", params.project_ids)
+    hashtag_filter=create_hashtagfilter_underpass(params.hashtags, "hashtags", cur, params.project_ids)
     timestamp_filter=create_timestamp_filter_query("created_at",params.from_timestamp, params.to_timestamp,cur)
 
     changeset_query = f"""
@@ -534,10 +715,11 @@ def create_changeset_query_underpass(params, conn, cur):
     """
     return changeset_query, hashtag_filter, timestamp_filter
 
+@named_query
 def create_users_contributions_query_underpass(params, conn, cur):
     '''returns the changeset query from Underpass'''
 
-    hashtag_filter=create_hashtagfilter_underpass(params.hashtags, "hashtags", params.project_ids)
+    hashtag_filter=create_hashtagfilter_underpass(params.hashtags, "hashtags", cur, params.project_ids)
     timestamp_filter=create_timestamp_filter_query("created_at",params.from_timestamp, params.to_timestamp,cur)
 
     contributors_query = f"""
@@ -560,6 +742,205 @@ def create_users_contributions_query_underpass(params, conn, cur):
     return contributors_query
 
 
+def get_whole_day_window(from_timestamp, to_timestamp):
+    '''returns the first and last day of a window starting and ending at
+    midnight UTC, naive timestamps are taken as UTC. With use_daily_rollups
+    set, such a window is half open, its closing midnight belongs to the next
+    day, on the daily rollups as on the changesets they fall back to
+    ( create_timestamp_filter_query ), otherwise the changesets keep their
+    inclusive window. Returns None when the window does not align to whole
+    days'''
+    days = []
+    for timestamp in (from_timestamp, to_timestamp):
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.combine(timestamp, time(0))
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if timestamp.time() != time(0):
+            return None
+        days.append(timestamp.date())
+    from_day, to_day = days
+    if to_day <= from_day:
+        return None
+    return from_day, to_day - timedelta(days=1)
+
+
+@named_query
+def check_daily_rollup_watermark(cur, to_timestamp):
+    '''returns query telling whether the daily rollups were refreshed past to_timestamp'''
+    query = sql.SQL(
+        """SELECT updated_at >= %s AS "fresh" FROM public.rollup_watermarks WHERE name = %s;""")
+    return cur.mogrify(query, (to_timestamp, DAILY_ROLLUP_WATERMARK)).decode()
+
+
+@named_query
+def generate_daily_rollup_watermarks_query(cur):
+    '''returns query locking the daily rollups for a refresh and reading the
+    watermark they were last refreshed to and the latest changesets update'''
+    query = sql.SQL("""LOCK TABLE public.rollup_watermarks IN EXCLUSIVE MODE;
+        SELECT (SELECT updated_at FROM public.rollup_watermarks WHERE name = %s) AS "from_updated_at",
+        (SELECT MAX(updated_at) FROM public.changesets) AS "to_updated_at";""")
+    return cur.mogrify(query, (DAILY_ROLLUP_WATERMARK,)).decode()
+
+
+@named_query
+def generate_daily_rollup_refresh_queries(cur, from_updated_at, to_updated_at):
+    '''returns the queries recomputing the daily rollups of every day having
+    changesets updated after from_updated_at and up to to_updated_at, they are
+    meant to run in a single transaction'''
+    if from_updated_at is None:
+        updated_filter = cur.mogrify(
+            sql.SQL("updated_at <= %s"), (to_updated_at,)).decode()
+    else:
+        updated_filter = cur.mogrify(sql.SQL("updated_at > %s AND updated_at <= %s"),
+                                     (from_updated_at, to_updated_at)).decode()
+
+    days_query = f"""
+        CREATE TEMPORARY TABLE daily_rollup_days ON COMMIT DROP AS
+        SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date AS day
+        FROM public.changesets
+        WHERE {updated_filter};
+    """
+    changesets_of_days = """
+        FROM daily_rollup_days d
+        JOIN public.changesets c
+            ON c.created_at >= d.day::timestamp AT TIME ZONE 'UTC'
+            AND c.created_at < (d.day + 1)::timestamp AT TIME ZONE 'UTC'"""
+    delete_features_query = """
+        DELETE FROM public.changesets_daily r USING daily_rollup_days d WHERE r.day = d.day;
+    """
+    delete_users_query = """
+        DELETE FROM public.changesets_daily_users r USING daily_rollup_days d WHERE r.day = d.day;
+    """
+    insert_features_query = f"""
+        INSERT INTO public.changesets_daily (day, hashtags, user_id, editor, feature, action, count)
+        SELECT d.day, c.hashtags, c.user_id, c.editor, f.feature, f.action, sum(f.count)
+        {changesets_of_days}
+        CROSS JOIN LATERAL (
+            SELECT key AS feature, value::numeric AS count, 'create'::text AS action FROM each(c.added)
+            UNION ALL
+            SELECT key, value::numeric, 'modify'::text FROM each(c.modified)
+        ) f
+        WHERE cardinality(c.hashtags) > 0
+        GROUP BY d.day, c.hashtags, c.user_id, c.editor, f.feature, f.action;
+    """
+    insert_users_query = f"""
+        INSERT INTO public.changesets_daily_users (day, hashtags, user_id, editor, changesets)
+        SELECT d.day, c.hashtags, c.user_id, c.editor, count(c.id)
+        {changesets_of_days}
+        WHERE cardinality(c.hashtags) > 0
+        GROUP BY d.day, c.hashtags, c.user_id, c.editor;
+    """
+    watermark_query = cur.mogrify(sql.SQL("""
+        INSERT INTO public.rollup_watermarks (name, updated_at) VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET updated_at = EXCLUDED.updated_at;
+    """), (DAILY_ROLLUP_WATERMARK, to_updated_at)).decode()
+
+    return [
+        days_query,
+        delete_features_query,
+        delete_users_query,
+        insert_features_query,
+        insert_users_query,
+        watermark_query,
+    ]
+
+
+def create_day_filter_query(column_name, from_day, to_day, cur):
+    '''returns day filter query of the daily rollups'''
+    return cur.mogrify(sql.SQL("{day_column} BETWEEN %s AND %s").format(
+        day_column=sql.SQL(column_name)), (from_day, to_day)).decode()
+
+
+@named_query
+def generate_mapathon_summary_rollup_query(params, cur, from_day, to_day):
+    """Generates mapathon summary queries from the daily rollups"""
+    hashtag_filter = create_hashtagfilter_underpass(params.hashtags, "hashtags", cur, params.project_ids)
+    day_filter = create_day_filter_query("day", from_day, to_day, cur)
+
+    summary_query = f"""select feature, action, sum(count) as count
+        from changesets_daily
+        where ({day_filter}) AND ({hashtag_filter})
+        group by feature, action
+        order by count desc """
+    total_contributor_query = f"""select COUNT(distinct user_id) as contributors_count
+        from changesets_daily_users
+        where ({day_filter}) AND ({hashtag_filter})
+        """
+    return summary_query, total_contributor_query
+
+
+@named_query
+def create_changeset_query_rollup(params, cur, from_day, to_day):
+    '''returns the changeset query of the mapathon detailed report from the daily rollups'''
+    hashtag_filter = create_hashtagfilter_underpass(params.hashtags, "r.hashtags", cur, params.project_ids)
+    day_filter = create_day_filter_query("r.day", from_day, to_day, cur)
+
+    changeset_query = f"""
+        select feature, action, sum(count) as count, username, user_id, array_agg(distinct(editor)) as editors
+        from changesets_daily r
+        join users u
+        on u.id = r.user_id
+        where {hashtag_filter}
+        and {day_filter}
+        group by feature, action, username, user_id
+    """
+    return changeset_query
+
+
+@named_query
+def create_users_contributions_query_rollup(params, cur, from_day, to_day):
+    '''returns the contributors query of the mapathon detailed report from the daily rollups'''
+    hashtag_filter = create_hashtagfilter_underpass(params.hashtags, "hashtags", cur, params.project_ids)
+    day_filter = create_day_filter_query("day", from_day, to_day, cur)
+
+    contributors_query = f"""
+        with t1 as (
+            select user_id, string_agg(distinct editor, ',') as editors
+            from changesets_daily_users
+            where {hashtag_filter}
+            and {day_filter}
+            group by user_id
+        ), t2 as (
+            select user_id, sum(count) as total_buildings
+            from changesets_daily
+            where feature = 'building'
+            and {hashtag_filter}
+            and {day_filter}
+            group by user_id
+        )
+        select t1.user_id, u.username, coalesce(t2.total_buildings, 0) as total_buildings, t1.editors
+        from t1
+        join users u
+        on u.id = t1.user_id
+        left join t2
+        on t2.user_id = t1.user_id
+    """
+    return contributors_query
+
+
+@named_query
+def create_userstats_get_statistics_with_hashtags_rollup_query(params, cur, from_day, to_day):
+    '''returns the user statistics with hashtags query from the daily rollups'''
+    filter_hashtags = create_hashtagfilter_underpass(params.hashtags, "hashtags", cur)
+    day_filter = create_day_filter_query("day", from_day, to_day, cur)
+    query = f"""
+    SELECT
+    sum(count) FILTER (WHERE feature = 'building' AND action = 'create') AS added_buildings,
+    sum(count) FILTER (WHERE feature = 'building' AND action = 'modify') AS modified_buildings,
+    sum(count) FILTER (WHERE feature = 'highway' AND action = 'create') AS added_highway,
+    sum(count) FILTER (WHERE feature = 'highway' AND action = 'modify') AS modified_highway,
+    sum(count) FILTER (WHERE feature = 'highway_km' AND action = 'create') AS added_highway_km,
+    sum(count) FILTER (WHERE feature = 'highway_km' AND action = 'modify') AS modified_highway_km
+    FROM changesets_daily
+    WHERE {day_filter}
+    AND user_id = {params.user_id}
+    AND {filter_hashtags};
+    """
+    return query
+
+
+@named_query
 def generate_training_organisations_query():
     """Generates query for listing out all the organisations listed in training table from underpass
     """
@@ -605,6 +986,7 @@ def generate_filter_training_query(params):
     return filter_query
 
 
+@named_query
 def generate_training_query(filter_query):
     base_query = """select * from training """
     if filter_query:
@@ -612,6 +994,7 @@ def generate_training_query(filter_query):
     return base_query
 
 
+@named_query
 def generate_organization_hashtag_reports(cur, params):
     if params.frequency == "w":
         frequency = "week"
@@ -649,6 +1032,7 @@ def generate_organization_hashtag_reports(cur, params):
     return query
 
 
+@named_query
 def generate_tm_validators_stats_query(cur, params):
     stmt = """with t0 as (
         select
@@ -682,6 +1066,9 @@ def generate_tm_validators_stats_query(cur, params):
     if params.country:
         country_subset = f""" and '{params.country}' ~~* any(country)"""
 
+    # validated tasks of every user and project cell, summed per user ( Total
+    # column ), per project ( Total row ) and overall, rows missing one of the
+    # keys are left out
     query = f"""{sub_query}{status_subset}{organisation_subset}{country_subset}
         order by p_id
             )
@@ -704,42 +1091,85 @@ def generate_tm_validators_stats_query(cur, params):
             order by
                 project_id
                 )
+        ,t2 as (
+            select
+                coalesce(t1.user_id, 0) as user_id,
+                coalesce(u.username, 'N/A') as username,
+                case
+                    when u.mapping_level = 1
+                                    then 'BEGINNER'
+                    when u.mapping_level = 2
+                                    then 'INTERMEDIATE'
+                    when u.mapping_level = 3 then 'ADVANCED'
+                end  mapping_level,
+                p.p_id as project_id,
+                coalesce(t1.cnt, 0) as cnt,
+                p.status as project_status,
+                coalesce(o.name,'N/A') as organisation_name,
+                p.total_tasks,
+                p.tasks_mapped,
+                p.tasks_validated,
+                unnest(p.country) as country
+            from
+                t0 as p
+            left join t1
+                on
+                t1.project_id = p.p_id
+            left join users as u
+                on
+                u.id = t1.user_id
+            left join organisations as o
+                on
+                o.id = p.organisation_id
+            )
         select
-            coalesce(t1.user_id, 0) as user_id,
-            coalesce(u.username, 'N/A') as username,
-            case
-                when u.mapping_level = 1
-                                then 'BEGINNER'
-                when u.mapping_level = 2
-                                then 'INTERMEDIATE'
-                when u.mapping_level = 3 then 'ADVANCED'
-            end  mapping_level,
-            p.p_id as project_id,
-            coalesce(t1.cnt, 0) as cnt,
-            p.status as project_status,
-            coalesce(o.name,'N/A') as organisation_name,
-            p.total_tasks,
-            p.tasks_mapped,
-            p.tasks_validated,
-            unnest(p.country) as country
+            user_id,
+            username,
+            mapping_level,
+            project_id,
+            country,
+            organisation_name,
+            project_status,
+            total_tasks,
+            tasks_mapped,
+            tasks_validated,
+            sum(cnt) as cnt,
+            grouping(user_id, username, mapping_level) > 0 as total_row,
+            grouping(project_id) > 0 as total_column
         from
-            t0 as p
-        left join t1
-            on
-            t1.project_id = p.p_id
-        left join users as u
-            on
-            u.id = t1.user_id
-        left join organisations as o
-            on
-            o.id = p.organisation_id
+            t2
+        where
+            mapping_level is not null
+            and country is not null
+            and project_status is not null
+            and total_tasks is not null
+            and tasks_mapped is not null
+            and tasks_validated is not null
+        group by grouping sets (
+            (user_id, username, mapping_level, project_id, country, organisation_name,
+                project_status, total_tasks, tasks_mapped, tasks_validated),
+            (user_id, username, mapping_level),
+            (project_id, country, organisation_name, project_status, total_tasks,
+                tasks_mapped, tasks_validated),
+            ()
+            )
         order by
-            u.username,
-            t1.project_id"""
+            total_row desc,
+            username collate "C",
+            user_id,
+            total_column,
+            project_id,
+            country collate "C",
+            organisation_name collate "C",
+            project_status collate "C",
+            total_tasks,
+            tasks_mapped,
+            tasks_validated"""
 
     return query
 
 
+@named_query
 def generate_tm_teams_list():
     query = """with vt AS (SELECT distinct team_id as id from project_teams where role = 1 order by id),
             mu AS (SELECT tm.team_id, ARRAY_AGG(users.username) AS managers from team_members AS tm, vt, users WHERE users.id = tm.user_id AND tm.team_id = vt.id AND tm.function = 1 GROUP BY tm.team_id),
@@ -749,6 +1179,7 @@ def generate_tm_teams_list():
     return query
 
 
+@named_query
 def generate_list_teams_metadata(team_id):
     sub_query = ""
     if team_id:
@@ -771,10 +1202,19 @@ def generate_list_teams_metadata(team_id):
 
     return query
 
+@named_query
 def check_last_updated_changesets():
     query = """SELECT (NOW() - MAX(updated_at)) AS "last_updated" FROM public.changesets;"""
     return query
 
+
+@named_query
+def get_changesets_watermark_query():
+    query = """SELECT MAX(updated_at) AS "updated_at" FROM public.changesets;"""
+    return query
+
+
+@named_query
 def check_last_updated_validation():
     query = """SELECT (NOW() - MAX(timestamp)) AS "last_updated" FROM public.validation;"""
     return query
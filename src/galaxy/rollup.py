@@ -0,0 +1,48 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Refreshes the daily changeset rollups of migrations/00004.sql
+
+Usage, from the repository root, typically from cron every few minutes:
+
+    python -m src.galaxy.rollup
+
+Only the days having changesets updated since the previous run are
+recomputed, the first run builds the rollups of every day.
+"""
+from contextlib import closing
+
+from .app import DailyRollup, close_connection_pools
+
+
+def main():
+    """Refreshes the rollups once"""
+    try:
+        with closing(DailyRollup()) as rollup:
+            watermark = rollup.refresh()
+    finally:
+        close_connection_pools()
+    if watermark is None:
+        print("Daily rollups are up to date")
+    else:
+        print(f"Daily rollups refreshed up to {watermark}")
+
+
+if __name__ == "__main__":
+    main()
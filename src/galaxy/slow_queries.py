@@ -0,0 +1,139 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Slow query log
+
+Queries running longer than slow_query_threshold seconds are written to
+slow_query_log_file, one json record per line with the rendered SQL, the
+request that ran it, its duration and, for a slow_query_explain_rate sample
+of them, the EXPLAIN (ANALYZE, BUFFERS) plan of the query. Plans are captured
+afterwards on a connection of their own, in a read only transaction, so that
+the request is not slowed down by them. The file is rotated once it reaches
+slow_query_log_max_bytes, slow_query_log_backups former files are kept.
+Records can be queried with jq, e.g. the 10 slowest ones:
+
+    jq -s 'sort_by(-.duration) | .[:10]' slow_queries.log
+"""
+import json
+import logging as std_logging
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from psycopg2 import connect
+
+from .config import logger as logging
+from .config import (
+    slow_query_explain_rate,
+    slow_query_explain_timeout,
+    slow_query_log_backups,
+    slow_query_log_file,
+    slow_query_log_max_bytes,
+    slow_query_threshold,
+)
+
+# only plain reads are run again by EXPLAIN ANALYZE
+EXPLAINABLE_QUERY = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+_slow_query_log = None
+# plans are captured one at a time, whatever the number of slow queries
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+
+def get_slow_query_log():
+    """Returns the logger of the slow query log file, created on first use"""
+    global _slow_query_log
+    if _slow_query_log is None:
+        handler = RotatingFileHandler(
+            slow_query_log_file,
+            maxBytes=slow_query_log_max_bytes,
+            backupCount=slow_query_log_backups,
+        )
+        handler.setFormatter(std_logging.Formatter("%(message)s"))
+        slow_query_log = std_logging.getLogger("galaxy.slow_queries")
+        slow_query_log.addHandler(handler)
+        slow_query_log.setLevel(std_logging.INFO)
+        slow_query_log.propagate = False
+        _slow_query_log = slow_query_log
+    return _slow_query_log
+
+
+def write_record(record):
+    get_slow_query_log().info(json.dumps(record, default=str))
+
+
+def explain_analyze(db_params, query):
+    """Returns the EXPLAIN (ANALYZE, BUFFERS) plan of query, run again in a
+    read only transaction that is rolled back"""
+    conn = connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute(
+                f"SET LOCAL statement_timeout TO {int(slow_query_explain_timeout * 1000)}"
+            )
+            cursor.execute(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query.strip().rstrip(';')}"
+            )
+            return cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def write_record_with_plan(record, db_params, query):
+    try:
+        record["plan"] = explain_analyze(db_params, query)
+    except Exception as ex:
+        record["plan_error"] = str(ex)
+    write_record(record)
+
+
+def log_slow_query(
+    query, name, database, db_params, duration, rows=None, request=None, error=None
+):
+    """Records a query that ran for duration seconds when it is slower than
+    slow_query_threshold, error is the exception it failed with"""
+    if slow_query_threshold <= 0 or duration < slow_query_threshold:
+        return
+    if isinstance(query, bytes):
+        query = query.decode()
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "query": name,
+        "database": database,
+        "duration": round(duration, 4),
+        "rows": rows,
+        "request": request,
+        "sql": query,
+    }
+    if error is not None:
+        record["error"] = type(error).__name__
+    logging.info("Slow query %s on %s took %.3f sec", name, database, duration)
+    if error is not None:
+        # the plan of a query cancelled by its statement timeout would only
+        # be cut short by the explain timeout again
+        write_record(record)
+        return
+    if EXPLAINABLE_QUERY.match(query) and random.random() < slow_query_explain_rate:
+        _explain_executor.submit(write_record_with_plan, record, db_params, query)
+    else:
+        write_record(record)
@@ -19,6 +19,8 @@
 
 import json
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import lru_cache
 from typing import List, Union, Optional
 from pydantic import validator
 from datetime import datetime, date, timedelta
@@ -56,12 +58,46 @@ def to_camel(string: str) -> str:
         [split_string[0], *[w.capitalize() for w in split_string[1:]]])
 
 
+def to_date(value):
+    """Casts timestamps of trusted rows to the date fields expect"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+# casts applied by BaseModel.from_row to the values of scalar fields, the
+# values of other fields are kept as they are
+ROW_CASTS = {int: int, float: float, str: str, date: to_date}
+
+
 class BaseModel(PydanticModel):
     class Config:
         alias_generator = to_camel
         allow_population_by_field_name = True
         use_enum_values = True
 
+    @classmethod
+    def from_row(cls, row):
+        """Builds the model from a row our own SQL returned, without validating it
+
+        Scalar values are only cast to the type of their field ( numeric to int
+        or float, timestamp to date ) and keys that are not fields are left
+        out. Request parameters and other outside input go through the
+        validating constructor.
+        """
+        values = {}
+        for name, cast in row_fields(cls):
+            if name in row:
+                value = row[name]
+                values[name] = value if value is None or cast is None else cast(value)
+        return cls.construct(**values)
+
+
+@lru_cache(maxsize=None)
+def row_fields(model):
+    """Field names of model along with the cast from_row applies to their values"""
+    return [
+        (name, ROW_CASTS.get(field.outer_type_)) for name, field in model.__fields__.items()
+    ]
+
 
 class MappedFeature(BaseModel):
     feature: str
@@ -116,6 +152,62 @@ class MapathonDetail(BaseModel):
     mapped_features: List[MappedFeatureWithUser]
     contributors: List[MapathonContributor]
     tm_stats: List[TMUserStats]
+    next_page_token: Optional[str] = None
+
+
+def encode_page_token(key_values):
+    """Returns the continuation token of a report page following key_values"""
+    return urlsafe_b64encode(json.dumps(key_values).encode()).decode()
+
+
+class InvalidPageToken(ValueError):
+    """The page token of a request does not point in the report it asks for"""
+
+
+def decode_page_token(token, key_types=None):
+    """Returns the key values a continuation token points after, None for no
+    token, key_types are the types of the sort key the values must match"""
+    if token is None:
+        return None
+    try:
+        key_values = json.loads(urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise InvalidPageToken("Invalid page token")
+    if not isinstance(key_values, list) or not all(
+        isinstance(value, (int, float, str)) for value in key_values
+    ):
+        raise InvalidPageToken("Invalid page token")
+    if key_types is not None and (
+        len(key_values) != len(key_types)
+        or not all(
+            isinstance(value, key_type) and not isinstance(value, bool)
+            for value, key_type in zip(key_values, key_types)
+        )
+    ):
+        raise InvalidPageToken("The page token does not belong to this report")
+    return key_values
+
+
+class PageParams(BaseModel):
+    """Opt-in keyset pagination of a report, pages are asked for by giving
+    page_size, page_token or both, the token of the next page comes with
+    each page"""
+
+    page_size: Optional[int] = None
+    page_token: Optional[str] = None
+
+    @validator("page_size", allow_reuse=True)
+    def check_page_size(cls, value, **kwargs):
+        """Checks the page size is positive"""
+        if value is not None and value < 1:
+            raise ValueError("Page size must be greater than 0")
+        return value
+
+    @validator("page_token", allow_reuse=True)
+    def check_page_token(cls, value, **kwargs):
+        """Checks the page token can be decoded"""
+        decode_page_token(value)
+        return value
 
 
 class TimeStampParams(BaseModel):
@@ -145,7 +237,7 @@ class TimeStampParams(BaseModel):
 invalid_request_parameters = [" ", '"', '""', '" "']
 
 
-class MapathonRequestParams(TimeStampParams):
+class MapathonRequestParams(TimeStampParams, PageParams):
     '''validation class for mapathon request parameter provided by user '''
 
     project_ids: List[int]
@@ -238,7 +330,7 @@ class OutputType(Enum):
     GEOJSON = "geojson"
 
 
-class DataQuality_TM_RequestParams(BaseModel):
+class DataQuality_TM_RequestParams(PageParams):
     '''Request Parameteres validation for DataQuality Class Tasking Manager Project ID
 
     Parameters:
@@ -256,7 +348,7 @@ class DataQuality_TM_RequestParams(BaseModel):
     output_type: OutputType
 
 
-class DataQuality_username_RequestParams(DateStampParams):
+class DataQuality_username_RequestParams(DateStampParams, PageParams):
     '''Request Parameteres validation for DataQuality Class Username
 
     Parameters:
@@ -308,7 +400,7 @@ class DataQualityPointCollection(FeatureCollection):
     features: List[DataQualityPointFeature]
 
 
-class DataQualityHashtagParams(TimeStampParams):
+class DataQualityHashtagParams(TimeStampParams, PageParams):
     hashtags: Optional[List[str]]
     issue_type: List[IssueType]
     output_type: OutputType
@@ -518,3 +610,21 @@ class DataOutput(str, Enum):
 
 class DataRecencyParams(BaseModel):
     data_output: DataOutput
+
+
+class ReportJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class ReportJob(BaseModel):
+    job_id: str
+    report: str
+    status: ReportJobStatus
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    size: Optional[int]
+    error: Optional[str]
@@ -0,0 +1,214 @@
+# Copyright (C) 2021 Humanitarian OpenStreetmap Team
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Humanitarian OpenStreetmap Team
+# 1100 13th Street NW Suite 800 Washington, D.C. 20005
+# <info@hotosm.org>
+
+"""Keeps the reports of popular hashtags, live mapathons and users in the
+response cache of the API process
+
+The reports are listed in the json file of cache_warmer_file, each one with
+the request body its endpoint receives:
+
+    [
+        {"report": "organization_hashtags",
+         "params": {"hashtag": "missingmaps", "frequency": "w", "outputType": "json"}},
+        {"report": "mapathon_summary", "lastHours": 24,
+         "params": {"projectIds": [11224], "hashtags": ["mapandchathour2021"]}},
+        {"report": "user_statistics", "lastHours": 168,
+         "params": {"userId": 7004124, "hashtags": [], "projectIds": []}}
+    ]
+
+lastHours fills fromTimestamp and toTimestamp with the window that ends when
+the warmer last saw the changesets watermark move, such reports are shared
+with the requests whose timestamps fall in the same
+response_cache_timestamp_precision buckets. As soon as the watermark moves,
+the cache is emptied, the windows move to the current time and every listed
+report is computed again, the ones the cache evicted meanwhile are computed
+on the next check.
+"""
+import json
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+from .app import (
+    Database,
+    Mapathon,
+    OrganizationHashtags,
+    UserStats,
+    get_connection_pool,
+    response_cache,
+)
+from .config import cache_warmer_interval, get_db_connection_params
+from .config import logger as logging
+from .query_builder.builder import get_changesets_watermark_query
+from .validation.models import (
+    MapathonRequestParams,
+    OrganizationHashtagParams,
+    UserStatsParams,
+)
+
+
+def mapathon_summary(params):
+    with closing(Mapathon(params)) as mapathon:
+        return mapathon.get_summary()
+
+
+def organization_hashtags(params):
+    with closing(OrganizationHashtags(params)) as organization:
+        return organization.get_report()
+
+
+def user_statistics(params):
+    with closing(UserStats()) as user_stats:
+        if len(params.hashtags) > 0:
+            return user_stats.get_statistics_with_hashtags(params)
+        return user_stats.get_statistics(params)
+
+
+def user_statistics_cache_name(params):
+    if len(params.hashtags) > 0:
+        return "user_statistics_with_hashtags"
+    return "user_statistics"
+
+
+# request model, name in the response cache and report function of the
+# reports the warmer knows
+WARMED_REPORTS = {
+    "mapathon_summary": (
+        MapathonRequestParams, lambda params: "mapathon_summary", mapathon_summary
+    ),
+    "organization_hashtags": (
+        OrganizationHashtagParams,
+        lambda params: "organization_hashtags",
+        organization_hashtags,
+    ),
+    "user_statistics": (
+        UserStatsParams, user_statistics_cache_name, user_statistics
+    ),
+}
+
+
+def load_hot_reports(path):
+    """Reads the list of reports to keep warm, raises ValueError on reports
+    the warmer does not know"""
+    with open(path) as hot_reports_file:
+        hot_reports = json.load(hot_reports_file)
+    for hot_report in hot_reports:
+        if hot_report.get("report") not in WARMED_REPORTS:
+            raise ValueError(
+                f"Unsupported report in {path} : {hot_report.get('report')}, "
+                f"supported reports are {', '.join(WARMED_REPORTS)}"
+            )
+    return hot_reports
+
+
+def hot_report_params(hot_report, now=None):
+    """Returns the validated request model of a hot report, with the window
+    of its lastHours ending now"""
+    model = WARMED_REPORTS[hot_report["report"]][0]
+    params = dict(hot_report["params"])
+    if hot_report.get("lastHours"):
+        now = now or datetime.now(timezone.utc)
+        params["fromTimestamp"] = now - timedelta(hours=hot_report["lastHours"])
+        params["toTimestamp"] = now
+    return model(**params)
+
+
+class CacheWarmer:
+    """Thread computing the hot reports again once the changesets watermark
+    moves, or once the cache evicted them"""
+
+    def __init__(self, hot_reports, interval=None):
+        self.hot_reports = hot_reports
+        self.interval = interval or cache_warmer_interval
+        self.stopped = threading.Event()
+        self.thread = None
+        # watermark the lastHours windows end at, they keep their cache keys
+        # until it moves
+        self.watermark = None
+        self.window_end = None
+
+    def read_watermark(self):
+        """Returns the changesets watermark of Underpass"""
+        database = Database(
+            get_db_connection_params("UNDERPASS"), get_connection_pool("UNDERPASS")
+        )
+        database.connect()
+        try:
+            return database.executequery(get_changesets_watermark_query())[0]["updated_at"]
+        finally:
+            database.close_conn()
+
+    def warm(self):
+        """Computes the hot reports missing from the cache, returns how many"""
+        watermark = self.read_watermark()
+        response_cache.update_watermark(watermark)
+        if self.window_end is None or watermark != self.watermark:
+            self.watermark = watermark
+            self.window_end = datetime.now(timezone.utc)
+        warmed = 0
+        for hot_report in self.hot_reports:
+            if self.stopped.is_set():
+                break
+            _, cache_name, report = WARMED_REPORTS[hot_report["report"]]
+            try:
+                params = hot_report_params(hot_report, self.window_end)
+                if response_cache.key(cache_name(params), params) in response_cache:
+                    continue
+                start_time = time.monotonic()
+                report(params)
+                warmed += 1
+                logging.debug(
+                    "Warmed %s %s in %.3f sec",
+                    hot_report["report"],
+                    hot_report["params"],
+                    time.monotonic() - start_time,
+                )
+            except Exception as ex:
+                logging.error(
+                    "Cache warmer failed on %s %s: %s",
+                    hot_report["report"],
+                    hot_report["params"],
+                    ex,
+                )
+        return warmed
+
+    def run(self):
+        """Warms the cache every interval seconds until stopped"""
+        while not self.stopped.is_set():
+            try:
+                warmed = self.warm()
+                if warmed:
+                    logging.info("Cache warmer computed %s reports", warmed)
+            except Exception as ex:
+                logging.error("Cache warmer failed: %s", ex)
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        """Starts the warmer on a daemon thread"""
+        self.thread = threading.Thread(
+            target=self.run, name="cache-warmer", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """Stops the warmer and waits for its thread"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
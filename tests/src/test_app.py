@@ -17,13 +17,22 @@
 # 1100 13th Street NW Suite 800 Washington, D.C. 20005
 # <info@hotosm.org>
 
-from src.galaxy import app
+from src.galaxy import app, index_check, jobs, slow_queries, warmer
+import pytest
 import testing.postgresql
+from psycopg2.errors import QueryCanceled
+from psycopg2.pool import PoolError
 from src.galaxy.validation import models as mapathon_validation
 from src.galaxy.query_builder import builder as mapathon_query_builder
 from src.galaxy.query_builder.builder import check_last_updated_changesets, check_last_updated_validation, generate_organization_hashtag_reports, create_UserStats_get_statistics_query, create_userstats_get_statistics_with_hashtags_query, generate_data_quality_TM_query, generate_data_quality_username_query, generate_data_quality_hashtag_reports
 from src.galaxy.validation.models import OrganizationHashtagParams, UserStatsParams, DataQuality_TM_RequestParams, DataQuality_username_RequestParams, DataQualityHashtagParams
+import asyncio
+import json
+import geojson
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 import os.path
+import threading
 
 # Reference to testing.postgresql db instance
 postgresql = None
@@ -179,6 +188,39 @@ def test_mapathon_users_time_spent_mapping_and_validating_query_builder():
     assert result_time_validating_query == default_time_validating_query
 
 
+def test_mapathon_users_tm_stats_query_builder():
+    default_tm_stats_query = "\n        SELECT user_id,\n            COUNT(task_id) FILTER (WHERE action_text = 'MAPPED') AS tasks_mapped,\n            COUNT(task_id) FILTER (WHERE action_text = 'VALIDATED') AS tasks_validated,\n            SUM(CAST(TO_TIMESTAMP(action_text, 'HH24:MI:SS') AS TIME)) FILTER (\n                WHERE action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING')\n            ) AS time_spent_mapping,\n            SUM(CAST(TO_TIMESTAMP(action_text, 'HH24:MI:SS') AS TIME)) FILTER (\n                WHERE action = 'LOCKED_FOR_VALIDATION'\n            ) AS time_spent_validating,\n            COUNT(*) FILTER (\n                WHERE action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING')\n            ) AS mapping_locks,\n            COUNT(*) FILTER (\n                WHERE action = 'LOCKED_FOR_VALIDATION'\n            ) AS validating_locks\n        FROM public.task_history\n        WHERE action_date BETWEEN '2021-08-27 09:00:00' AND '2021-08-27 11:00:00'\n            AND project_id IN (11224,10042,9906,1381,11203,10681,8055,8732,11193,7305,11210,10985,10988,11190,6658,5644,10913,6495,4229)\n            AND (action_text IN ('MAPPED', 'VALIDATED')\n            OR action IN ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION'))\n        GROUP BY user_id;\n    "
+    params = mapathon_validation.MapathonRequestParams(**test_param)
+    result_tm_stats_query = mapathon_query_builder.create_user_tm_stats_query(
+        params.project_ids, params.from_timestamp, params.to_timestamp)
+
+    assert result_tm_stats_query == default_tm_stats_query
+
+
+def test_mapathon_users_tm_stats_null_lock_duration():
+    """Users whose locks have a NULL action_text spent 0 seconds"""
+    cur.execute("""
+        CREATE TABLE public.task_history (
+            user_id bigint, task_id integer, project_id integer,
+            action varchar, action_text varchar, action_date timestamp
+        );
+        INSERT INTO task_history VALUES
+            (1, 1, 11224, 'LOCKED_FOR_MAPPING', '00:10:00', '2021-08-27 10:00:00'),
+            (1, 1, 11224, 'STATE_CHANGE', 'MAPPED', '2021-08-27 10:10:00'),
+            (2, 2, 11224, 'LOCKED_FOR_MAPPING', NULL, '2021-08-27 10:00:00'),
+            (3, 1, 11224, 'LOCKED_FOR_VALIDATION', NULL, '2021-08-27 10:30:00');
+    """)
+    params = mapathon_validation.MapathonRequestParams(**test_param)
+    rows = database.executequery(mapathon_query_builder.create_user_tm_stats_query(
+        params.project_ids, params.from_timestamp, params.to_timestamp))
+    cur.execute("DROP TABLE public.task_history")
+
+    _, _, time_mapping, time_validating = app.TaskingManager.user_stats(rows)
+    assert sorted((s.user_id, s.time_spent_mapping) for s in time_mapping) == [
+        (1, 600.0), (2, 0.0)]
+    assert [(s.user_id, s.time_spent_validating) for s in time_validating] == [(3, 0.0)]
+
+
 def test_data_quality_TM_query():
     """Function to test data quality TM query generator of Data Quality Class """
     data_quality_params = {
@@ -189,8 +231,8 @@ def test_data_quality_TM_query():
         "output_type": "geojson"
     }
     validated_params = DataQuality_TM_RequestParams(**data_quality_params)
-    expected_result = """   with t1 as (\n        select id\n                From changesets\n                WHERE\n                  'hotosm-project-9928'=ANY(hashtags) OR 'hotosm-project-4730'=ANY(hashtags) OR 'hotosm-project-5663'=ANY(hashtags)\n            ),\n        t2 AS (\n             SELECT osm_id as Osm_id,\n                change_id as Changeset_id,\n                timestamp::text as Changeset_timestamp,\n                status::text as Issue_type,\n                ST_X(location::geometry) as lng,\n                ST_Y(location::geometry) as lat\n\n        FROM validation join t1 on change_id = t1.id\n        WHERE\n        'badgeom'=ANY(status) OR 'badvalue'=ANY(status)\n                )\n        select *\n        from t2\n        """
-    query_result = generate_data_quality_TM_query(validated_params)
+    expected_result = """   with t1 as (\n        select id\n                From changesets\n                WHERE\n                  hashtags && ARRAY['hotosm-project-9928','hotosm-project-4730','hotosm-project-5663']::text[]\n            ),\n        t2 AS (\n             SELECT osm_id as Osm_id,\n                change_id as Changeset_id,\n                timestamp::text as Changeset_timestamp,\n                status::text as Issue_type,\n                ST_X(location::geometry) as lng,\n                ST_Y(location::geometry) as lat\n\n        FROM validation join t1 on change_id = t1.id\n        WHERE\n        status && ARRAY['badgeom','badvalue']::status[]\n                )\n        select *\n        from t2\n        """
+    query_result = generate_data_quality_TM_query(validated_params, cur)
     assert query_result == expected_result
 
 
@@ -222,7 +264,7 @@ def test_data_quality_username_query():
         from
             users
         where
-            'Fadlilaa IRM-ED'=username OR 'Bert Araali'=username ),
+            username = ANY(ARRAY['Fadlilaa IRM-ED','Bert Araali']::text[]) ),
         t2 as (
         select
             osm_id,
@@ -265,7 +307,7 @@ def test_data_quality_username_query():
             t2.lon,
             t3.created_at,
             t2.change_id;"""
-    expected_hashtag_result = """with t1 as (\n        select\n            id,\n            username as username\n        from\n            users\n        where\n            'Riyadi IRM-ED'=username ),\n        t2 as (\n        select\n            osm_id,\n            change_id,\n            st_x(location) as lat,\n            st_y(location) as lon,\n            unnest(status) as unnest_status\n        from\n            validation,\n            t1\n        where\n            user_id = t1.id),\n        t3 as (\n        select\n            id,\n            created_at\n        from\n            changesets\n        where\n            (created_at between '2022-04-25 18:15:00.994000+00:00' and  '2022-04-30 18:14:59.994000+00:00') and 'Indonesia'=ANY(hashtags) )\n        select\n            t2.osm_id as Osm_id ,\n            t2.change_id as Changeset_id,\n            t3.created_at as Changeset_timestamp,\n            ARRAY_TO_STRING(ARRAY_AGG(t2.unnest_status), ',') as Issue_type,\n            t1.username as username,\n            t2.lat,\n            t2.lon as lng\n        from\n            t1,\n            t2,\n            t3\n        where\n            t2.change_id = t3.id\n            \n        group by\n            t2.osm_id,\n            t1.username,\n            t2.lat,\n            t2.lon,\n            t3.created_at,\n            t2.change_id;"""
+    expected_hashtag_result = """with t1 as (\n        select\n            id,\n            username as username\n        from\n            users\n        where\n            username = ANY(ARRAY['Riyadi IRM-ED']::text[]) ),\n        t2 as (\n        select\n            osm_id,\n            change_id,\n            st_x(location) as lat,\n            st_y(location) as lon,\n            unnest(status) as unnest_status\n        from\n            validation,\n            t1\n        where\n            user_id = t1.id),\n        t3 as (\n        select\n            id,\n            created_at\n        from\n            changesets\n        where\n            (created_at between '2022-04-25 18:15:00.994000+00:00' and  '2022-04-30 18:14:59.994000+00:00') and hashtags && ARRAY['Indonesia']::text[] )\n        select\n            t2.osm_id as Osm_id ,\n            t2.change_id as Changeset_id,\n            t3.created_at as Changeset_timestamp,\n            ARRAY_TO_STRING(ARRAY_AGG(t2.unnest_status), ',') as Issue_type,\n            t1.username as username,\n            t2.lat,\n            t2.lon as lng\n        from\n            t1,\n            t2,\n            t3\n        where\n            t2.change_id = t3.id\n            \n        group by\n            t2.osm_id,\n            t1.username,\n            t2.lat,\n            t2.lon,\n            t3.created_at,\n            t2.change_id;"""
 
     query_result = generate_data_quality_username_query(validated_params, cur)
     assert query_result.encode('utf-8') == expected_result.encode('utf-8')
@@ -289,7 +331,7 @@ def test_userstats_get_statistics_with_hashtags_query():
                        10985, 10988, 11190, 6658, 5644, 10913, 6495, 4229]
     }
     validated_params = UserStatsParams(**test_params)
-    expected_result = "\n    SELECT\n    sum((added->\'building\')::numeric) AS added_buildings,\n    sum((modified->\'building\')::numeric) AS modified_buildings,\n    sum((added->\'highway\')::numeric) AS added_highway,\n    sum((modified->\'highway\')::numeric) AS modified_highway,\n    sum((added->\'highway_km\')::numeric) AS added_highway_km,\n    sum((modified->\'highway_km\')::numeric) AS modified_highway_km\n    FROM changesets c\n    WHERE c.\"created_at\" between \'2021-08-27T09:00:00\'::timestamp AND \'2021-08-27T11:00:00\'::timestamp\n    AND user_id = 11593794\n    AND \'mapandchathour2021\'=ANY(hashtags);\n    "
+    expected_result = "\n    SELECT\n    sum((added->\'building\')::numeric) AS added_buildings,\n    sum((modified->\'building\')::numeric) AS modified_buildings,\n    sum((added->\'highway\')::numeric) AS added_highway,\n    sum((modified->\'highway\')::numeric) AS modified_highway,\n    sum((added->\'highway_km\')::numeric) AS added_highway_km,\n    sum((modified->\'highway_km\')::numeric) AS modified_highway_km\n    FROM changesets c\n    WHERE c.\"created_at\" between \'2021-08-27T09:00:00\'::timestamp AND \'2021-08-27T11:00:00\'::timestamp\n    AND user_id = 11593794\n    AND hashtags && ARRAY[\'mapandchathour2021\']::text[];\n    "
     query_result = create_userstats_get_statistics_with_hashtags_query(
         validated_params, con, cur)
     assert query_result.encode('utf-8') == expected_result.encode('utf-8')
@@ -350,3 +392,474 @@ def test_user_statistics_recency_query():
 def test_user_data_quality_recency_query():
     expected_underpass_query = 'SELECT (NOW() - MAX(timestamp)) AS "last_updated" FROM public.validation;'
     assert check_last_updated_validation() == expected_underpass_query
+
+
+def test_connection_pool_borrow_and_return():
+    pool = app.ConnectionPool(db_dict, minconn=1, maxconn=2, timeout=1)
+    pooled_database = app.Database(db_dict, pool)
+    pooled_database.connect()
+    assert pool.stats()["in_use"] == 1
+    assert pooled_database.executequery("select 1 as one")[0]["one"] == 1
+    pooled_database.close_conn()
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    assert stats["borrowed"] == 1
+    pool.closeall()
+
+
+def test_connection_pool_wait_timeout():
+    pool = app.ConnectionPool(db_dict, minconn=1, maxconn=1, timeout=0.2)
+    conn = pool.getconn()
+    with pytest.raises(PoolError):
+        pool.getconn()
+    pool.putconn(conn)
+    # connection is reused once returned
+    assert pool.getconn() is conn
+    pool.putconn(conn)
+    assert pool.stats()["max_wait_time"] < 0.2
+    pool.closeall()
+
+
+def test_async_database_with_pool():
+    async def run_queries():
+        pool = app.AsyncConnectionPool(db_dict, minconn=1, maxconn=1, timeout=0.2)
+        async_database = app.AsyncDatabase(db_dict, pool)
+        await async_database.connect()
+        result = await async_database.executequery(
+            cur.mogrify("select %s as hashtag", ("missingmaps",))
+        )
+        # the only connection is borrowed, a second caller has to wait
+        with pytest.raises(PoolError):
+            await pool.getconn()
+        async_database.close_conn()
+        stats = pool.stats()
+        pool.closeall()
+        return result, stats
+
+    result, stats = asyncio.run(run_queries())
+    assert result[0]["hashtag"] == "missingmaps"
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+
+def test_statement_timeout_query():
+    assert mapathon_query_builder.create_statement_timeout_query(1.5) == "SET statement_timeout TO 1500"
+    assert mapathon_query_builder.create_statement_timeout_query(None, local=True) == "SET LOCAL statement_timeout TO DEFAULT"
+
+
+def test_request_statement_timeout():
+    timed_database = app.Database(db_dict)
+    timed_database.connect()
+    token = app.request_queries.set(app.RequestQueries(statement_timeout=0.1))
+    try:
+        with pytest.raises(QueryCanceled):
+            timed_database.executequery("select pg_sleep(2)")
+    finally:
+        app.request_queries.reset(token)
+        timed_database.close_conn()
+
+
+def test_request_queries_cancel():
+    queries = app.RequestQueries()
+    token = app.request_queries.set(queries)
+    cancelled_database = app.Database(db_dict)
+    try:
+        cancelled_database.connect()
+        # the client disconnects while the query runs
+        threading.Timer(0.2, queries.cancel).start()
+        with pytest.raises(QueryCanceled):
+            cancelled_database.executequery("select pg_sleep(5)")
+        assert queries.cancelled
+    finally:
+        app.request_queries.reset(token)
+        cancelled_database.close_conn()
+
+
+def test_query_budget():
+    budget_database = app.Database(db_dict)
+    budget_database.connect()
+    query = "select i from generate_series(1, 1000) i"
+    plan = budget_database.executequery(mapathon_query_builder.create_explain_query(query))[0][0]
+    cost, scanned_rows = app.plan_estimates(plan)
+    assert scanned_rows == 1000
+    assert app.query_budget_excess(plan, (None, None)) is None
+    assert app.query_budget_excess(plan, (cost * 2, 1000)) is None
+    assert "rows" in app.query_budget_excess(plan, (None, 999))
+    assert "cost" in app.query_budget_excess(plan, (cost / 2, None))
+    token = app.request_queries.set(app.RequestQueries(query_budget=(None, 100)))
+    try:
+        with pytest.raises(app.QueryBudgetExceeded):
+            app.check_query_budget(budget_database, query)
+    finally:
+        app.request_queries.reset(token)
+        budget_database.close_conn()
+
+
+def test_executequery_stream():
+    query = "select i as id, i * 2 as double from generate_series(1, 25) i;"
+    rows = database.executequery_stream(query, itersize=10)
+    first = next(rows)
+    assert dict(first) == {"id": 1, "double": 2}
+    assert [r["id"] for r in rows][-1] == 25
+    # a partially consumed stream closes its server side cursor
+    rows = database.executequery_stream(query, itersize=10)
+    next(rows)
+    rows.close()
+    assert database.executequery("select 1 as one")[0]["one"] == 1
+
+
+def test_stream_csv():
+    rows = database.executequery_stream(
+        "select i as id, 'tag ' || i as hashtag from generate_series(1, 2) i")
+    assert "".join(app.stream_csv(rows)) == "id,hashtag\r\n1,tag 1\r\n2,tag 2\r\n"
+    assert "".join(app.stream_csv([])) == ""
+
+
+def test_stream_csv_chunks():
+    rows = [{"id": i, "hashtag": "missingmaps"} for i in range(100)]
+    chunks = list(app.stream_csv(rows, chunk_size=256))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 256 for chunk in chunks[:-1])
+    assert "".join(chunks) == "".join(app.stream_csv(rows))
+    assert list(app.stream_text("abcde", chunk_size=2)) == ["ab", "cd", "e"]
+
+
+def test_stream_geojson():
+    query = "select i as osm_id, 'badgeom' as issue_type, i * 1.5 as lat, i * 2.5 as lng from generate_series(1, 50) i"
+    features = app.point_features(database.executequery_stream(query), "lat", "lng")
+    chunks = list(app.stream_geojson(features, chunk_size=512))
+    assert len(chunks) > 1
+    streamed = json.loads("".join(chunks))
+    # same document as the in memory geojson report
+    assert streamed == json.loads(geojson.dumps(app.Output(query, con).to_GeoJSON("lat", "lng")))
+    assert json.loads("".join(app.stream_geojson([]))) == {"type": "FeatureCollection", "features": []}
+
+
+def test_model_from_row():
+    row = {"feature": "building", "action": "create", "count": Decimal("12"), "username": "mapper", "user_id": 7}
+    feature = mapathon_validation.MappedFeatureWithUser.from_row(row)
+    assert feature == mapathon_validation.MappedFeatureWithUser(**row)
+    assert feature.json(by_alias=True) == '{"feature": "building", "action": "create", "count": 12, "username": "mapper"}'
+    contributor = mapathon_validation.MapathonContributor.from_row({"user_id": 7, "username": "mapper", "total_buildings": 3, "editors": None})
+    assert contributor.editors is None
+    hashtag = mapathon_validation.OrganizationHashtag.from_row({"hashtag": "msf", "frequency": "w", "start_date": datetime(2020, 10, 23), "end_date": date(2020, 10, 30), "total_new_buildings": 1, "total_unique_contributors": 1, "total_new_road_km": 2.0, "total_new_amenities": 0, "total_new_places": 0})
+    assert hashtag.start_date == date(2020, 10, 23)
+    assert hashtag.total_new_road_km == 2 and isinstance(hashtag.total_new_road_km, int)
+
+
+def test_copy_csv_stream():
+    query = "select i as osm_id, 'badgeom' as issue_type, i * 1.5 as lat from generate_series(1, 100) i;"
+    chunks = list(database.copy_csv_stream(query, chunk_size=256))
+    assert len(chunks) > 1
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    lines = b"".join(chunks).decode().splitlines()
+    assert lines[0] == "osm_id,issue_type,lat"
+    assert lines[1] == "1,badgeom,1.5"
+    assert len(lines) == 101
+    # closing the stream early stops the copy and leaves the connection usable
+    stream = database.copy_csv_stream("select i from generate_series(1, 100000) i", chunk_size=64)
+    next(stream)
+    stream.close()
+    assert database.executequery("select 1 as one")[0]["one"] == 1
+    # the query is cancelled instead of running to its end
+    stream = database.copy_csv_stream(
+        "select repeat('x', 100), case when i = 1000 then pg_sleep(60) end from generate_series(1, 2000) i", chunk_size=64)
+    next(stream)
+    start = datetime.now()
+    stream.close()
+    assert datetime.now() - start < timedelta(seconds=30)
+    assert database.executequery("select 1 as one")[0]["one"] == 1
+    with pytest.raises(Exception):
+        list(database.copy_csv_stream("select * from missing_table"))
+    assert database.executequery("select 1 as one")[0]["one"] == 1
+    # columns of the data quality hashtag report
+    query = "select 7 as osm_id, 3 as changeset_id, 1.5 as lat, 2.5 as lon, '2020-12-10 10:00:00'::timestamp as created_at, 'badgeom,badvalue' as issues;"
+    lines = b"".join(database.copy_csv_stream(mapathon_query_builder.generate_data_quality_hashtag_reports_csv(query))).decode().splitlines()
+    assert lines == ["created_at,changeset_id,osm_id,issue_type,latitude,longitude", '2020-12-10 10:00:00,3,7,"{badgeom,badvalue}",2.5,1.5']
+
+
+def test_fetch_report_page():
+    query = "select i / 3 as changeset_id, i as osm_id from generate_series(1, 10) i;"
+    assert app.fetch_report_page(database, query, mapathon_query_builder.DATA_QUALITY_PAGE_KEY, mapathon_validation.PageParams()) == (None, None)
+    pages, page_token = [], None
+    while True:
+        params = mapathon_validation.PageParams(page_size=4, page_token=page_token)
+        rows, page_token = app.fetch_report_page(database, query, mapathon_query_builder.DATA_QUALITY_PAGE_KEY, params)
+        pages.append([row["osm_id"] for row in rows])
+        if page_token is None:
+            break
+    assert pages == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    assert mapathon_validation.decode_page_token(mapathon_validation.encode_page_token([3, 8])) == [3, 8]
+    with pytest.raises(ValueError):
+        mapathon_validation.PageParams(page_token="not a token")
+    with pytest.raises(ValueError):
+        mapathon_validation.PageParams(page_size=0)
+
+
+def test_fetch_report_page_username_key():
+    # every issue comes once per username, the username keeps the key unique
+    query = "select i / 2 as changeset_id, i as osm_id, u as username from generate_series(1, 5) i, (values ('a'), ('b')) users(u);"
+    rows, page_token = [], None
+    while True:
+        params = mapathon_validation.PageParams(page_size=3, page_token=page_token)
+        page, page_token = app.fetch_report_page(database, query, mapathon_query_builder.DATA_QUALITY_USERNAME_PAGE_KEY, params)
+        rows.extend((row["osm_id"], row["username"]) for row in page)
+        if page_token is None:
+            break
+    assert rows == [(i, u) for i in range(1, 6) for u in ("a", "b")]
+
+
+def test_fetch_report_page_token_of_another_report():
+    query = "select i / 3 as changeset_id, i as osm_id from generate_series(1, 10) i;"
+    for key_values in ([3], [3, 8, 1], [3, "8"], [3, True]):
+        params = mapathon_validation.PageParams(
+            page_size=4, page_token=mapathon_validation.encode_page_token(key_values))
+        with pytest.raises(mapathon_validation.InvalidPageToken):
+            app.fetch_report_page(database, query, mapathon_query_builder.DATA_QUALITY_PAGE_KEY, params)
+
+
+def test_output_to_geojson():
+    rows = [{"osm_id": 1, "lat": "1.5", "lng": 2.25, "status": "badgeom"}, {"osm_id": 2, "lat": 3, "lng": 4, "status": "orphan"}]
+    assert app.Output(rows).to_GeoJSON("lat", "lng") == geojson.FeatureCollection([
+        geojson.Feature(geometry=geojson.Point((2.25, 1.5)), properties={"osm_id": 1, "status": "badgeom"}),
+        geojson.Feature(geometry=geojson.Point((4.0, 3.0)), properties={"osm_id": 2, "status": "orphan"}),
+    ])
+    # features are kept when there is no column left for the properties
+    assert len(app.Output([{"lat": 1, "lng": 2}]).to_GeoJSON("lat", "lng")["features"]) == 1
+
+
+def test_validators_stats_csv():
+    def row(user, project, country, cnt, total_row=False, total_column=False):
+        return {"user_id": user, "username": user and f"user{user}", "mapping_level": user and "BEGINNER", "project_id": project, "country": country, "organisation_name": project and "HOT", "project_status": project and "PUBLISHED", "total_tasks": project and 10, "tasks_mapped": project and 5, "tasks_validated": project and 2, "cnt": cnt, "total_row": total_row, "total_column": total_column}
+
+    # in the order of generate_tm_validators_stats_query
+    rows = [
+        row(None, 1, "Nepal", 3, total_row=True), row(None, 2, "Kenya", 4, total_row=True), row(None, None, None, 7, total_row=True, total_column=True),
+        row(1, 1, "Nepal", 3), row(1, None, None, 3, total_column=True),
+        row(2, 2, "Kenya", 4), row(2, None, None, 4, total_column=True),
+    ]
+    assert "".join(app.TaskingManager.validators_stats_csv(rows, chunk_size=16)) == (
+        "project_id,username,user_id,mapping_level,1,2,Total\n"
+        "country,,,,Nepal,Kenya,\n"
+        "organisation_name,,,,HOT,HOT,\n"
+        "project_status,,,,PUBLISHED,PUBLISHED,\n"
+        "total_tasks,,,,10,10,\n"
+        "tasks_mapped,,,,5,5,\n"
+        "tasks_validated,,,,2,2,\n"
+        "0,,Total,,3,4,7\n"
+        "1,user1,1,BEGINNER,3,0,3\n"
+        "2,user2,2,BEGINNER,0,4,4\n"
+    )
+
+
+def test_find_missing_indexes():
+    cur.execute("create table index_check (id int, created_at timestamp, closed_at timestamp)")
+    cur.execute("create index on index_check (created_at, id)")
+    indexes = [
+        {"table": "index_check", "method": "btree", "columns": ["created_at"]},
+        {"table": "index_check", "method": "btree", "columns": ["closed_at"]},
+        {"table": "index_check", "method": "btree", "columns": ["id"]},
+    ]
+    missing = index_check.find_missing_indexes(cur, indexes)
+    assert [index["columns"] for index in missing] == [["closed_at"], ["id"]]
+    cur.execute("drop table index_check")
+
+
+def test_declared_indexes():
+    declared = index_check.declared_indexes(index_check.MIGRATIONS_DIRS["TM"])
+    assert {"name": "task_history_project_id_action_action_date_idx",
+            "table": "task_history",
+            "method": "btree",
+            "columns": ["project_id", "action", "action_date"]}.items() <= declared[0].items()
+
+
+def test_whole_day_window():
+    assert mapathon_query_builder.get_whole_day_window(
+        datetime(2021, 8, 27), datetime(2021, 8, 29)) == (date(2021, 8, 27), date(2021, 8, 28))
+    assert mapathon_query_builder.get_whole_day_window(
+        datetime(2021, 8, 27, 9), datetime(2021, 8, 29)) is None
+    assert mapathon_query_builder.get_whole_day_window(
+        datetime(2021, 8, 27), datetime(2021, 8, 27)) is None
+    # aware timestamps are aligned in UTC
+    assert mapathon_query_builder.get_whole_day_window(
+        datetime(2021, 8, 27, 5, 45, tzinfo=timezone(timedelta(hours=5, minutes=45))),
+        date(2021, 8, 28)) == (date(2021, 8, 27), date(2021, 8, 27))
+
+
+def test_whole_day_timestamp_filter(monkeypatch):
+    assert mapathon_query_builder.create_timestamp_filter_query(
+        "created_at", datetime(2021, 8, 27), datetime(2021, 8, 29), cur) == \
+        '"created_at" between \'2021-08-27T00:00:00\'::timestamp AND \'2021-08-29T00:00:00\'::timestamp'
+    # with the daily rollups, whole days leave their closing midnight out
+    monkeypatch.setattr(mapathon_query_builder, "use_daily_rollups", True)
+    assert mapathon_query_builder.create_timestamp_filter_query(
+        "created_at", datetime(2021, 8, 27), datetime(2021, 8, 29), cur, prefix=True) == \
+        'c."created_at" >= \'2021-08-27T00:00:00\'::timestamp AND c."created_at" < \'2021-08-29T00:00:00\'::timestamp'
+    assert mapathon_query_builder.create_timestamp_filter_query(
+        "created_at", datetime(2021, 8, 27, 9), datetime(2021, 8, 29), cur) == \
+        '"created_at" between \'2021-08-27T09:00:00\'::timestamp AND \'2021-08-29T00:00:00\'::timestamp'
+
+
+def test_mapathon_summary_rollup_query_builder():
+    params = mapathon_validation.MapathonRequestParams(
+        projectIds=[11224, 10042], fromTimestamp="2021-08-27T00:00:00",
+        toTimestamp="2021-08-29T00:00:00", hashtags=["mapandchathour2021"])
+    expected_summary_query = 'select feature, action, sum(count) as count\n        from changesets_daily\n        where (day BETWEEN \'2021-08-27\'::date AND \'2021-08-28\'::date) AND (hashtags && ARRAY[\'hotosm-project-11224\',\'hotosm-project-10042\',\'mapandchathour2021\']::text[])\n        group by feature, action\n        order by count desc '
+    expected_contributors_query = 'select COUNT(distinct user_id) as contributors_count\n        from changesets_daily_users\n        where (day BETWEEN \'2021-08-27\'::date AND \'2021-08-28\'::date) AND (hashtags && ARRAY[\'hotosm-project-11224\',\'hotosm-project-10042\',\'mapandchathour2021\']::text[])\n        '
+    window = mapathon_query_builder.get_whole_day_window(params.from_timestamp, params.to_timestamp)
+    summary_query, contributors_query = mapathon_query_builder.generate_mapathon_summary_rollup_query(
+        params, cur, *window)
+    assert summary_query == expected_summary_query
+    assert contributors_query == expected_contributors_query
+
+
+def test_response_cache_key():
+    cache = app.ResponseCache(maxsize=2, timestamp_precision=60)
+    first = mapathon_validation.MapathonRequestParams(
+        projectIds=[2, 1], fromTimestamp="2021-08-27T09:00:10", toTimestamp="2021-08-27T11:00:59",
+        hashtags=["msf", "missingmaps"])
+    second = mapathon_validation.MapathonRequestParams(
+        projectIds=[1, 2, 2], fromTimestamp="2021-08-27T09:00:40", toTimestamp="2021-08-27T11:00:00",
+        hashtags=["missingmaps", "msf"])
+    assert cache.key("mapathon_summary", first) == cache.key("mapathon_summary", second)
+    assert cache.key("mapathon_summary", first) != cache.key("mapathon_detail", first)
+
+
+def test_response_cache_eviction_and_invalidation():
+    cache = app.ResponseCache(maxsize=2)
+    cache.update_watermark(1)
+    for key in ("a", "b"):
+        cache.set(key, key.upper(), 1)
+    assert cache.get("a") == (True, "A")
+    cache.set("c", "C", 1)
+    # b was the least recently used entry
+    assert cache.get("b") == (False, None)
+    # reports computed before the watermark moved are not cached
+    cache.update_watermark(2)
+    cache.set("d", "D", 1)
+    assert cache.get("a") == (False, None)
+    assert cache.get("d") == (False, None)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 3, 1)
+
+
+def test_report_jobs(tmp_path):
+    report_jobs = jobs.ReportJobs(str(tmp_path), workers=1)
+
+    def report(params):
+        yield "id,hashtag\n"
+        yield f"1,{params}\n"
+
+    def failing_report(params):
+        raise jobs.NoReportData("No Data Found")
+
+    job = report_jobs.submit("hashtags", report, "missingmaps")
+    failed_job = report_jobs.submit("hashtags", failing_report, None)
+    report_jobs.executor.shutdown(wait=True)
+
+    job = report_jobs.get(job["job_id"])
+    assert job["status"] == "succeeded"
+    with open(report_jobs.result_path(job)) as result_file:
+        assert result_file.read() == "id,hashtag\n1,missingmaps\n"
+    assert job["size"] == len("id,hashtag\n1,missingmaps\n")
+    failed_job = report_jobs.get(failed_job["job_id"])
+    assert (failed_job["status"], failed_job["error"]) == ("failed", "No Data Found")
+    with pytest.raises(KeyError):
+        report_jobs.get("../config")
+
+
+def test_report_jobs_close(tmp_path):
+    report_jobs = jobs.ReportJobs(str(tmp_path), workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_report(params):
+        started.set()
+        release.wait()
+        yield "id\n"
+
+    running_job = report_jobs.submit("hashtags", slow_report, None)
+    queued_job = report_jobs.submit("hashtags", slow_report, None)
+    started.wait()
+    report_jobs.close()
+    release.set()
+    report_jobs.executor.shutdown(wait=True)
+
+    # the running job records its own result, the queued one is cancelled
+    assert report_jobs.get(running_job["job_id"])["status"] == "succeeded"
+    queued_job = report_jobs.get(queued_job["job_id"])
+    assert queued_job["status"] == "failed"
+    assert queued_job["error"] == "The API shut down before the report was done"
+
+
+def test_hot_report_params():
+    now = datetime(2021, 8, 27, 11, 0, tzinfo=timezone.utc)
+    params = warmer.hot_report_params(
+        {"report": "mapathon_summary", "lastHours": 2,
+         "params": {"projectIds": [11224], "hashtags": ["mapandchathour2021"]}},
+        now)
+    assert (params.from_timestamp, params.to_timestamp) == (now - timedelta(hours=2), now)
+    cache = app.ResponseCache()
+    key = cache.key("mapathon_summary", params)
+    assert key not in cache
+    cache.set(key, "report", None)
+    assert key in cache
+    assert cache.stats()["hits"] == 0
+
+
+def test_cache_warmer_windows_move_with_watermark(monkeypatch):
+    cache = app.ResponseCache(maxsize=8)
+    computed = []
+
+    def report(params):
+        computed.append(params.to_timestamp)
+        cache.set(cache.key("mapathon_summary", params), "report", cache.watermark)
+
+    monkeypatch.setattr(warmer, "response_cache", cache)
+    monkeypatch.setitem(warmer.WARMED_REPORTS, "mapathon_summary", (
+        mapathon_validation.MapathonRequestParams, lambda params: "mapathon_summary", report))
+    cache_warmer = warmer.CacheWarmer([
+        {"report": "mapathon_summary", "lastHours": 2,
+         "params": {"projectIds": [11224], "hashtags": ["mapandchathour2021"]}}])
+    watermark = datetime(2021, 8, 27, 11, 0)
+    monkeypatch.setattr(cache_warmer, "read_watermark", lambda: watermark)
+    assert cache_warmer.warm() == 1
+    # the window keeps its end, and its cache key, while the watermark stays
+    assert cache_warmer.warm() == 0
+    watermark = datetime(2021, 8, 27, 11, 5)
+    assert cache_warmer.warm() == 1
+    assert len(computed) == 2 and computed[0] < computed[1]
+
+
+def test_named_queries():
+    query = mapathon_query_builder.get_changesets_watermark_query()
+    assert mapathon_query_builder.query_name(query) == "get_changesets_watermark_query"
+    page_query = mapathon_query_builder.create_keyset_page_query(query, ["updated_at"], None, 10, cur)
+    assert mapathon_query_builder.query_name(page_query) == "get_changesets_watermark_query"
+    assert mapathon_query_builder.query_name("select 1") == "other"
+    params = UserStatsParams(userId=1, fromTimestamp="2021-08-27T09:00:00",
+                             toTimestamp="2021-08-27T11:00:00", hashtags=[])
+    # queries built with mogrify stay bytes
+    query = create_UserStats_get_statistics_query(params, con, cur)
+    assert isinstance(query, bytes)
+    assert mapathon_query_builder.query_name(query) == "create_UserStats_get_statistics_query"
+
+
+def test_failed_query_recorded(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(app, "observe_query", lambda name, database, duration, rows=None: recorded.append((name, rows)))
+    with pytest.raises(Exception):
+        database.executequery("select 1 / 0")
+    con.rollback()
+    assert recorded == [("other", None)]
+
+
+def test_slow_query_explain_analyze():
+    assert slow_queries.EXPLAINABLE_QUERY.match("\n  with t1 as (select 1) select * from t1")
+    assert not slow_queries.EXPLAINABLE_QUERY.match("INSERT INTO changesets_daily SELECT 1")
+    plan = slow_queries.explain_analyze(db_dict, "select i from generate_series(1, 10) i;")
+    assert plan[0]["Plan"]["Actual Rows"] == 10
+    # the plan is captured in a read only transaction
+    with pytest.raises(Exception):
+        slow_queries.explain_analyze(db_dict, "with t as (insert into users values (1) returning *) select * from t")
+